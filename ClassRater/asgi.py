@@ -9,8 +9,23 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ClassRater.settings')
 
-application = get_asgi_application()
+ASGI_URLCONF = 'ClassRater.asgi_urls'  # the URLs of the WSGI entry point, with the async versions of the read views
+
+
+# resolves the requests against ASGI_URLCONF, so the read views run as async views (homepage.async_views)
+class AsyncViewsASGIHandler(ASGIHandler):
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = AsyncViewsASGIHandler()
@@ -0,0 +1,20 @@
+from django.urls import URLPattern
+
+from ClassRater.urls import urlpatterns as wsgi_urlpatterns
+from homepage import async_views
+
+
+# the URL configuration of the ASGI entry point: the read views are served by their async versions,
+# every other URL is the same as in ClassRater.urls
+ASYNC_VIEWS = {
+    'landing': async_views.landing,
+    'courses': async_views.courses,
+    'reviews': async_views.reviews,
+    'course': async_views.course,
+}
+
+urlpatterns = [
+    URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+    if isinstance(pattern, URLPattern) and pattern.name in ASYNC_VIEWS else pattern
+    for pattern in wsgi_urlpatterns
+]
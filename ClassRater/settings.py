@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'homepage.instrumentation.SQLInstrumentationMiddleware',  # first, so it sees the queries of all the others
+    'homepage.routers.ReplicaRoutingMiddleware',  # before the sessions, whose saves pin the client to the primary
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +66,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'homepage.context_processors.notifications',
             ],
         },
     },
@@ -82,6 +85,113 @@ DATABASES = {
     }
 }
 
+# every SQLite connection is set up with these PRAGMAs (see homepage.database): with the write-ahead log the readers
+# don't block the writer or each other, and a writer waits up to 'busy_timeout' milliseconds for the database lock
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',  # safe with the write-ahead log, which is synced on checkpoints only
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # in KiB when negative
+    'busy_timeout': 5000,
+}
+# a write transaction failing on a locked database is run again this many times, after a growing delay (seconds)
+DATABASE_WRITE_RETRIES = 4
+DATABASE_WRITE_RETRY_DELAY = 0.05
+
+# read replicas: the aliases of DATABASES the reads of the read views are sent to by homepage.routers, while the
+# writes, and the reads of a client for REPLICA_PIN_SECONDS after it wrote, go to the default database
+# a copy of the database is enough as a local stand-in:
+#     DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'replica.sqlite3'}
+#     REPLICA_DATABASES = ['replica']
+DATABASE_ROUTERS = ['homepage.routers.ReplicaRouter']
+REPLICA_DATABASES = []
+REPLICA_READ_VIEWS = ['courses', 'reviews', 'more_reviews', 'course']
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# the view cache versions, the unread notification counts and the signed in users are changed by one process (a web
+# server process or the run_tasks worker) and read by the others, so every process serving the database has to share
+# the cache (see homepage.checks) - the file based cache is shared by the processes of a single host, like those of the
+# SQLite database, memcached or redis by several hosts
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+VIEW_CACHE_TIMEOUT = 300  # seconds a cached part of the landing, courses and course pages is kept
+
+# the sessions are read from the cache and written through to the database, and the user of a signed in request
+# (with its app user) is read from the cache by the authentication backend (see homepage.auth_backends)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['homepage.auth_backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 300  # seconds a signed in user is kept in the cache
+
+
+# SQL instrumentation
+# every request is recorded per view, shown on the staff SQL stats page, and logged when over these thresholds
+
+SQL_SLOW_REQUEST_MS = 500
+SQL_SLOW_REQUEST_QUERIES = 50
+SQL_STATS_WINDOW = 200  # number of recent requests the per-view figures are computed over
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'homepage.sql': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+        'homepage.thumbnails': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+        'homepage.tasks': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+        'homepage.database': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+    },
+}
+
+
+# Task queue
+# the deferred work of the views is queued in the database and run by the 'run_tasks' worker command
+
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10  # seconds before the first retry of a failed task, doubled on every retry
+TASK_LOCK_TIMEOUT = 300  # seconds after which a task claimed by a stopped worker is run again
+
+
+# Password hashing
+# the first hasher hashes the passwords, the others only verify the passwords hashed before they were replaced;
+# a password hashed by another hasher, or with other parameters, is hashed again by the first one when its user
+# signs in - the benchmark_hashers command measures the sign ins per second per core of each of them
+
+PASSWORD_HASHERS = [
+    'homepage.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = 260000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -124,4 +234,8 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = 'homepage/media'
 
+# the uploaded review images are resized in the background into these variants, by their longest side
+THUMBNAIL_VARIANTS = {'small': 480, 'large': 1600}
+THUMBNAIL_WORKERS = 2  # threads resizing the images, 0 resizes them in the request saving them
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
@@ -15,7 +15,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from homepage import views
+from homepage import views, api
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -24,14 +24,24 @@ urlpatterns = [
     path('', views.landing, name='landing'),
     path('courses/', views.courses, name='courses'),
     path('reviews/', views.reviews, name='reviews'),
+    path('reviews/more/', views.more_reviews, name='more_reviews'),
     path('course/<int:id>/', views.course, name='course'),
     path('add_review/<course_id>', views.add_review, name='add_review'),
     path('add_review_search/', views.add_review_search, name='add_review_search'),
+    path('courses/autocomplete/', views.courses_autocomplete, name='courses_autocomplete'),
+    path('courses/eligible/', views.eligible_courses, name='eligible_courses'),
     path('users/sign_up/', views.sign_up, name='sign_up'),
     path('users/sign_in/', views.sign_in, name='sign_in'),
     path('users/sign_out/', views.sign_out, name='sign_out'),
     path('like/<user_id>/<review_id>/', views.like_review, name='like_review'),
     path('users/my_profile/', views.my_profile, name='my_profile'),
+    path('users/notifications/', views.notifications, name='notifications'),
     path('course/<course_id>/follow_course_action', views.follow_course_action, name='follow_course_action'),
+    path('staff/sql/', views.sql_stats, name='sql_stats'),
+    path('staff/export/<name>.<export_format>', views.export, name='export'),
+    path('api/courses/', api.courses, name='api_courses'),
+    path('api/courses/<int:id>/', api.course, name='api_course'),
+    path('api/reviews/', api.reviews, name='api_reviews'),
 
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) \
+  + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
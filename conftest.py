@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+
+
+# the tests use a cache of their own, in a temporary directory, rather than the one of the project
+# it is set as pytest starts, since collecting the test modules importing the cache already opens it
+def pytest_configure(config):
+    config.test_cache = tempfile.mkdtemp(prefix='cache')
+    settings.CACHES = {'default': {**settings.CACHES['default'], 'LOCATION': config.test_cache}}
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config.test_cache, ignore_errors=True)
+
+
+# the benchmarks assert timings, which depend on the machine, so they run only when asked for
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', help='run the tests marked as benchmarks too')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmark'):
+        return
+    skip = pytest.mark.skip(reason='a benchmark, run with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+# the cache outlives the rolled back database of each test, so every test starts with an empty one
+@pytest.fixture(autouse=True)
+def clear_cache():
+    caches['default'].clear()
+    yield
+    caches['default'].clear()
+
+
+# the in-memory indexes aren't reset by the rollback of a test either
+# the search index checks the catalog version on every search, so the tests see a change at once
+@pytest.fixture(autouse=True)
+def reset_indexes(monkeypatch):
+    from homepage import search
+    from homepage.prerequisites import prerequisite_graph
+    from homepage.eligibility import eligibility_index
+    monkeypatch.setattr(search, 'SEARCH_VERSION_CHECK_INTERVAL', 0)
+    indexes = [search.course_index, prerequisite_graph, eligibility_index]
+    for index in indexes:
+        index.reset()
+    yield
+    for index in indexes:
+        index.reset()
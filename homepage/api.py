@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+from hashlib import sha1
+from urllib.parse import urlencode
+
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_safe
+
+from homepage import caching
+from homepage.forms import FilterAndSortForm
+from homepage.models import Course, Prerequisites, Review
+from homepage.prerequisites import prerequisite_graph
+
+
+API_VERSION = 1  # part of every ETag, so a change of the response format never matches an old one
+COURSES_API_PAGE_SIZE = 100  # number of courses in a page of the course list
+
+
+# --- the view decorator answering conditional GETs from the versions of the data scopes the response shows
+# 'scopes' returns the scopes of a request, the ETag and Last-Modified come from their version stamps in the cache,
+# so a '304 Not Modified' costs a cache lookup, and no query or rendering
+def conditional(name, scopes):
+    def etag(request, *args, **kwargs):
+        query = urlencode(sorted(request.GET.lists()), doseq=True)
+        versions = caching.get_versions(scopes(request, *args, **kwargs))
+        return sha1(f'{API_VERSION}:{name}:{versions}:{args}:{sorted(kwargs.items())}:{query}'.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return datetime.fromtimestamp(caching.get_last_modified(scopes(request, *args, **kwargs)), timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def course_json(course):
+    return {
+        'course_id': course.course_id,
+        'name': course.name,
+        'mandatory': course.mandatory,
+        'credit_points': course.credit_points,
+        'syllabi': course.syllabi,
+        'avg_rating': float(course.avg_rating) if course.avg_rating is not None else None,
+        'avg_load': float(course.avg_load) if course.avg_load is not None else None,
+        'num_of_raters': course.num_of_raters,
+        'num_of_reviewers': course.num_of_reviewers,
+        'url': reverse('api_course', args=[course.course_id]),
+    }
+
+
+def review_json(review):
+    return {
+        'id': review.id,
+        'course_id': review.course_id,
+        'course_name': review.course.name,
+        'user': review.user.user.username,
+        'rate': review.rate,
+        'course_load': review.course_load,
+        'content': review.content,
+        'date': review.date.isoformat(),
+        'likes_num': review.likes_num,
+        'professor': review.professor.name if review.professor else None,
+        'image': review.image.url if review.image else None,
+        'thumbnails': review.thumbnails,
+    }
+
+
+def not_found(message):
+    return JsonResponse({'error': message}, status=404)
+
+
+# --- the course list, filtered and sorted by the 'filter_by' and 'sort_by' parameters of the courses page,
+# continued by 'cursor'
+@require_safe
+@conditional('courses', lambda request: caching.COURSES_SCOPES)
+def courses(request):
+    data = request.GET.copy()
+    data.setdefault('sort_by', 'id')
+    form = FilterAndSortForm(data)
+    if not form.is_valid():
+        return JsonResponse({'errors': dict(form.errors)}, status=400)
+
+    result = Course.get_filtered_and_sorted_courses(form.cleaned_data['filter_by'], form.cleaned_data['sort_by'])
+    cursor = request.GET.get('cursor')
+    if cursor and Course.decode_cursor(cursor, Course.sort_field(result['result'])) is None:
+        return JsonResponse({'errors': {'cursor': ['Enter the cursor of a page of this sorting.']}}, status=400)
+    page = Course.get_courses_page(result['result'], COURSES_API_PAGE_SIZE, cursor)
+    results = []
+    for course in page['courses']:
+        course_data = course_json(course)
+        course_data['has_prerequisites'] = course.preqs_exist
+        results.append(course_data)
+    return JsonResponse({
+        'filters': result['filters'],
+        'sort': result['sort'],
+        'next_cursor': page['next_cursor'],
+        'results': results,
+    })
+
+
+# --- a course with its rating and load histograms and its prerequisites
+@require_safe
+@conditional('course', lambda request, id: caching.course_scopes(id))
+def course(request, id):
+    try:
+        course = Course.objects.get(pk=id)
+    except Course.DoesNotExist:
+        return not_found('course not found')
+
+    course_data = course_json(course)
+    course_data.update({
+        'has_prerequisites': prerequisite_graph.has_prerequisites(id),
+        'rating_histogram': course.rating_histogram(),
+        'load_histogram': course.load_histogram(),
+        'rating_median': course.rating_median(),
+        'load_median': course.load_median(),
+        'prerequisites': [{'course_id': req_course_id, 'req_code': Prerequisites.Req_Code(req_code).name}
+                          for req_course_id, req_code in prerequisite_graph.direct_prerequisites(id)],
+        'prerequisite_chain': prerequisite_graph.sort_topologically(prerequisite_graph.prerequisite_chain(id)),
+        'unlocks': sorted(prerequisite_graph.unlocks(id)),
+    })
+    return JsonResponse(course_data)
+
+
+def reviews_scopes(request):
+    course_id = request.GET.get('course')
+    if course_id:
+        return caching.course_scopes(course_id)
+    return ['catalog', 'reviews', 'likes']
+
+
+# --- a page of the review feed, of a single course if 'course' is given, continued by 'cursor'
+@require_safe
+@conditional('reviews', reviews_scopes)
+def reviews(request):
+    course_id = request.GET.get('course')
+    course = None
+    if course_id:
+        try:
+            course = Course.objects.get(pk=course_id)
+        except (Course.DoesNotExist, ValueError):
+            return not_found('course not found')
+    feed = Review.course_feed(course) if course else Review.main_feed()
+    page = Review.get_feed_page(feed, request.GET.get('cursor'))
+    return JsonResponse({
+        'next_cursor': page['next_cursor'],
+        'results': [review_json(review) for review in page['reviews']],
+    })
@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class HomepageConfig(AppConfig):
     name = 'homepage'
+
+    def ready(self):
+        # connects the signal receivers of the view cache (which the in-memory course indexes follow too), the image
+        # variants, the notifications, the set up of the database connections and the cached users, and registers
+        # the checks
+        import homepage.caching  # noqa: F401
+        import homepage.thumbnails  # noqa: F401
+        import homepage.notifications  # noqa: F401
+        import homepage.database  # noqa: F401
+        import homepage.auth_backends  # noqa: F401
+        import homepage.checks  # noqa: F401
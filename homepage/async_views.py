@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import close_old_connections, connections
+from django.shortcuts import redirect, render
+
+from homepage import caching
+from homepage.forms import FilterAndSortForm
+from homepage.instrumentation import record_thread_queries
+from homepage.models import Course, FollowedUserCourses, Review
+from homepage.views import get_course_prerequisites, get_followed_course_ids
+
+
+# the async versions of the read views, served in place of the ones in homepage.views by the ASGI entry point
+# (ClassRater.asgi_urls), rendering the same templates from the same context
+# Django 3.2 has no async ORM, so every lookup runs in a thread of the executor (sync_to_async) with the database
+# connection of that thread; the lookups that don't depend on each other are started together and awaited with
+# asyncio.gather, so a request waits for the slowest of them instead of their sum, and holds no thread in between
+
+EXECUTOR_CONN_MAX_AGE = getattr(settings, 'EXECUTOR_CONN_MAX_AGE', 60)  # seconds an executor thread keeps a connection
+
+
+# --- runs the blocking 'function' in a thread of the executor, recording its queries for the request
+# the request signals only close the connections of the thread serving the request, so the executor thread closes
+# its own connections once the function returned (or failed), like a request does: an unusable connection, or one
+# past its age - the connections opened in the executor threads are kept at least EXECUTOR_CONN_MAX_AGE seconds,
+# rather than opened (and set up with the PRAGMAs) for every lookup when CONN_MAX_AGE is 0, as the size of the
+# executor bounds their number
+def run_sync(function, *args, **kwargs):
+    def run():
+        opened = [conn for conn in connections.all() if conn.connection is None]
+        try:
+            with record_thread_queries():
+                return function(*args, **kwargs)
+        finally:
+            for conn in opened:
+                if conn.connection is not None and conn.close_at is not None:
+                    conn.close_at = max(conn.close_at, time.monotonic() + EXECUTOR_CONN_MAX_AGE)
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+# --- returns the user of the request, evaluating the lazy user (the session and the user lookups) in a thread,
+# after which it can be read in the event loop
+def get_user(request):
+    def load_user():
+        request.user.is_authenticated
+        return request.user
+    return run_sync(load_user)
+
+
+def render_async(request, template_name, context):
+    return run_sync(render, request, template_name, context)
+
+
+# the previews are rendered into a cached fragment, so the feed is only queried on a cache miss
+async def landing(request):
+    user, cache_version = await asyncio.gather(get_user(request),
+                                               run_sync(caching.get_shared_versions, caching.LANDING_SCOPES))
+    return await render_async(request, 'homepage/landing/landing.html', {
+        'reviews': Review.landing_page_feed(),
+        'cache_version': cache_version,
+        'cache_timeout': caching.VIEW_CACHE_TIMEOUT
+    })
+
+
+# the courses table is rendered into a cached fragment keyed by the filters and sorting,
+# so the courses queryset is only evaluated on a cache miss
+async def courses(request):
+    all_courses = Course.get_courses()
+    filters_active = []
+    sort_active = ''
+    cache_parts = 'all'
+    form = FilterAndSortForm(request.GET)
+    if form.is_valid():
+        filters = form.cleaned_data.get('filter_by')
+        sort_val = form.cleaned_data.get('sort_by')
+        result = Course.get_filtered_and_sorted_courses(filters, sort_val)
+        all_courses = result['result']
+        filters_active = result['filters']
+        sort_active = result['sort']
+        cache_parts = f"{','.join(filters)}:{sort_val}"
+
+    user, cache_version = await asyncio.gather(get_user(request),
+                                               run_sync(caching.get_shared_versions, caching.COURSES_SCOPES))
+    followed_course_ids = await run_sync(get_followed_course_ids, user)
+    return await render_async(request, 'homepage/courses/courses.html', {
+        'all_courses': all_courses,
+        'filters': filters_active,
+        'sort': sort_active,
+        'form': form,
+        'followed_course_ids': followed_course_ids,
+        'cache_version': cache_version,
+        'cache_parts': cache_parts,
+        'cache_timeout': caching.VIEW_CACHE_TIMEOUT
+    })
+
+
+# the page of the feed is fetched while the user is loaded, the likes of the page need both
+async def reviews(request):
+    user, page = await asyncio.gather(get_user(request),
+                                      run_sync(Review.get_feed_page, Review.main_feed(), request.GET.get('cursor')))
+    reviews = await run_sync(Review.load_feed, page['reviews'], user)
+    return await render_async(request, 'homepage/reviews/reviews.html', {
+        'reviews': reviews,
+        'next_cursor': page['next_cursor']
+    })
+
+
+# --- returns the shared part of the course page, cached like in the sync view (under the same key)
+# on a miss the course, the page of its reviews, their count and the prerequisites are fetched concurrently
+async def get_course_page(id, cursor):
+    key = await run_sync(caching.cache_key, 'course', caching.course_scopes(id), [id, cursor])
+    course_page = await run_sync(cache.get, key)
+    if course_page is None:
+        course, page, reviews_count, prerequisites = await asyncio.gather(
+            run_sync(Course.objects.get, pk=id),
+            run_sync(Review.get_feed_page, Review.course_feed(id), cursor),
+            run_sync(Review.objects.filter(course=id).count),
+            run_sync(get_course_prerequisites, id))
+        course_page = {'course': course, 'page': page, 'reviews_count': reviews_count, **prerequisites}
+        await run_sync(cache.set, key, course_page, caching.VIEW_CACHE_TIMEOUT)
+    return course_page
+
+
+def is_following_course(user, course):
+    return user.is_authenticated and FollowedUserCourses.is_following_course(user, course)
+
+
+# the shared part of the page is fetched while the user is loaded, then the liked reviews and the follow state
+# of the user are fetched concurrently
+async def course(request, id):
+    cursor = request.GET.get('cursor')
+    if Review.decode_cursor(cursor) is None:
+        cursor = None
+
+    try:
+        user, course_page = await asyncio.gather(get_user(request), get_course_page(id, cursor))
+    except ObjectDoesNotExist:
+        return redirect('courses')
+
+    course = course_page['course']
+    reviews, is_following = await asyncio.gather(run_sync(Review.load_feed, course_page['page']['reviews'], user),
+                                                 run_sync(is_following_course, user, course))
+    return await render_async(request, 'homepage/courses/course.html', {
+        'id': id,
+        'course': course,
+        'reviews': reviews,
+        'next_cursor': course_page['page']['next_cursor'],
+        'reviews_count': course_page['reviews_count'],
+        'is_following': is_following,
+        'preq': course_page['preq'],
+        'preq_chain': course_page['preq_chain'],
+        'unlocks': course_page['unlocks']
+    })
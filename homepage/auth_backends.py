@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from homepage.models import AppUser, User
+
+
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 300)  # seconds a signed in user is kept in the cache
+
+
+def user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+# --- the cache entry of a user (loaded with its app user): the values of its fields but the password hash, which is
+# left out of the cache (stored on disk by the file based cache), and the session hash derived from it instead, which
+# is all a signed in request needs of it
+def cached_user(user):
+    app_user = getattr(user, 'appuser', None)
+    return {
+        'user': {field.attname: getattr(user, field.attname) for field in User._meta.concrete_fields
+                 if field.attname != 'password'},
+        'session_auth_hash': user.get_session_auth_hash(),
+        'appuser': None if app_user is None else {field.attname: getattr(app_user, field.attname)
+                                                  for field in AppUser._meta.concrete_fields},
+    }
+
+
+# --- the user of a cache entry, with its app user (or its absence) already loaded
+# the password is a deferred field, loaded from the database when used (checking or changing the password), and left
+# alone when the user is saved
+def user_from_cache(entry):
+    user = User.from_db(DEFAULT_DB_ALIAS, list(entry['user']), list(entry['user'].values()))
+    user.get_session_auth_hash = lambda: entry['session_auth_hash']
+    app_user = None
+    if entry['appuser'] is not None:
+        app_user = AppUser.from_db(DEFAULT_DB_ALIAS, list(entry['appuser']), list(entry['appuser'].values()))
+        AppUser.user.field.set_cached_value(app_user, user)
+    User.appuser.related.set_cached_value(user, app_user)
+    return user
+
+
+# the authentication backend of the project: signs users in like the model backend, and loads the user of every
+# signed in request from the cache - the user together with its app user (request.user.appuser), so a page of a
+# signed in user costs no query for either in the common case
+# the cache holds the fields of the user but its password hash (see cached_user)
+# a change of a user or of its app user - changing the password too - removes it from the cache, once committed
+# (see the receivers below)
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            user = User.objects.select_related('appuser').filter(pk=user_id).first()
+            if user is None:
+                return None
+            # a user without an app user (like an admin) is cached with its absence, which costs no query either
+            cache.set(key, cached_user(user), USER_CACHE_TIMEOUT)
+        else:
+            user = user_from_cache(entry)
+        return user if self.user_can_authenticate(user) else None
+
+
+def forget_user(user_id):
+    transaction.on_commit(lambda: cache.delete(user_key(user_id)))
+
+
+# signing in saves the time of the sign in to the user, so the first request after it loads the user again
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_changed_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+def forget_user_of_changed_app_user(sender, instance, **kwargs):
+    forget_user(instance.user_id)
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+import time
+
+from homepage import routers
+from homepage.models import Course, Prerequisites, Review, UserLikes
+
+
+VIEW_CACHE_TIMEOUT = getattr(settings, 'VIEW_CACHE_TIMEOUT', 300)  # seconds a cached view part is kept
+PROCESS_LOCAL_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}  # the backends no other process sees
+
+# the shared (not per-user) parts of the cached views are keyed by the versions of the scopes of data they show:
+#   'catalog'           - any Course row
+#   'reviews'           - any Review row, including the course aggregates a new review updates
+#   'prerequisites'     - any Prerequisites row
+#   'likes'             - any UserLikes row, changing the likes number of a review
+#   'course:<id>'       - the reviews and likes of a single course
+# a change bumps the versions of its scopes, so only the entries showing the changed data become unreachable
+# the in-memory course indexes (homepage.search, homepage.prerequisites and homepage.eligibility) reload once the
+# versions of the scopes they hold change
+LANDING_SCOPES = ['catalog', 'reviews']
+COURSES_SCOPES = ['catalog', 'reviews', 'prerequisites']
+
+
+def course_scopes(course_id):
+    # a course page shows the prerequisite chains through other courses, so any prerequisite change affects it
+    return ['catalog', 'prerequisites', f'course:{course_id}']
+
+
+# --- whether the other processes serving the database (the web server processes and the run_tasks worker) see the
+# entries of the cache, and its invalidations
+def is_shared_cache():
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def version_key(scope):
+    return f'view_cache:version:{scope}'
+
+
+def modified_key(scope):
+    return f'view_cache:modified:{scope}'
+
+
+# --- returns the values of 'keys', adding 'default' for the missing ones
+def get_stamps(keys, default):
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, default, None)
+            stamps[key] = cache.get(key, default)
+    return stamps
+
+
+# --- returns a string of the current versions of 'scopes', to be part of a cache key
+# a missing version starts from the current time, so it never repeats a version an evicted one had
+def get_versions(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = get_stamps(keys, time.time_ns())
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+# --- returns the last time (in seconds since the epoch) the data of any of 'scopes' changed
+# a missing time starts from the current time, as nothing is known about the changes before it
+def get_last_modified(scopes):
+    return max(get_stamps([modified_key(scope) for scope in scopes], time.time()).values())
+
+
+def bump_versions(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.set(version_key(scope), time.time_ns(), None)
+    cache.set_many({modified_key(scope): time.time() for scope in scopes}, None)
+
+
+# --- bumps the versions right away, for reads in the same transaction, and again once the transaction commits,
+# so a concurrent request can't cache the data from before the commit under the new versions
+def invalidate(scopes):
+    bump_versions(scopes)
+    transaction.on_commit(lambda: bump_versions(scopes))
+
+
+# --- returns the current versions of 'scopes' for the key of a part cached for every client, like get_versions
+# the part is read from the primary while a replica may lag behind the last change of its data, see
+# routers.read_primary_after
+def get_shared_versions(scopes):
+    routers.read_primary_after(get_last_modified(scopes))
+    return get_versions(scopes)
+
+
+# --- returns the key of the cached value of 'name' for the current versions of 'scopes' and the 'parts' it varies on
+def cache_key(name, scopes, parts):
+    return ':'.join(['view_cache', name, get_shared_versions(scopes)] + [str(part) for part in parts])
+
+
+# --- returns the cached value of 'name' for the current versions of 'scopes' and the 'parts' it varies on,
+# computing and caching it on a miss
+def get_or_compute(name, scopes, parts, compute):
+    key = cache_key(name, scopes, parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, VIEW_CACHE_TIMEOUT)
+    return value
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course(sender, instance, **kwargs):
+    invalidate(['catalog'])
+
+
+@receiver([post_save, post_delete], sender=Prerequisites)
+def invalidate_prerequisites(sender, instance, **kwargs):
+    invalidate(['prerequisites'])
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review(sender, instance, **kwargs):
+    invalidate(['reviews', f'course:{instance.course_id}'])
+
+
+# a like only changes the likes number of a review, shown on the page of its course and in the review feeds
+@receiver([post_save, post_delete], sender=UserLikes)
+def invalidate_user_like(sender, instance, **kwargs):
+    course_id = Review.objects.filter(pk=instance.review_id_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        invalidate(['likes', f'course:{course_id}'])
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from homepage.caching import is_shared_cache
+
+
+# the view cache versions and the unread notification counts are changed by one process and read by the others,
+# so with a cache of its own every process would keep serving what the others invalidated
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if is_shared_cache():
+        return []
+    return [Error(
+        'The default cache is local to each process, so the processes serving the database miss the changes of the '
+        'others, like the view cache invalidations and the unread notification counts of the run_tasks worker.',
+        hint='Use a cache shared by the web server processes and the run_tasks worker, like the file based cache, '
+             'memcached or redis.',
+        id='homepage.E001',
+    )]
+
+
+# the signed in users (see homepage.auth_backends) and the sessions are read from the default cache, and dropped from
+# it by the process changing them, so with a cache of each process a user deactivated, signed out or whose password
+# changed would stay signed in on the other processes
+@register(Tags.caches, Tags.security)
+def check_cached_sign_ins(app_configs, **kwargs):
+    cached = ('homepage.auth_backends.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS
+              or settings.SESSION_ENGINE == 'django.contrib.sessions.backends.cached_db')
+    if not cached or is_shared_cache():
+        return []
+    return [Error(
+        'The signed in users and the sessions are cached in a cache local to each process, so a user deactivated, '
+        'signed out or whose password changed stays signed in on the other processes.',
+        hint='Use a cache shared by the web server processes, or the default authentication backend and session '
+             'engine.',
+        id='homepage.E002',
+    )]
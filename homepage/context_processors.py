@@ -0,0 +1,9 @@
+from homepage.notifications import get_unread_count
+
+
+# --- the number of unread notifications of the signed in user, for the badge of the navigation bar
+def notifications(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_notifications': get_unread_count(user.id)}
@@ -0,0 +1,56 @@
+from functools import wraps
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+logger = logging.getLogger('homepage.database')
+
+SQLITE_PRAGMAS = getattr(settings, 'SQLITE_PRAGMAS', {})
+WRITE_RETRIES = getattr(settings, 'DATABASE_WRITE_RETRIES', 4)  # runs of a locked write after the first one
+WRITE_RETRY_DELAY = getattr(settings, 'DATABASE_WRITE_RETRY_DELAY', 0.05)  # seconds, doubled on every retry
+
+# the messages of the errors SQLite raises when the lock of the database (or of a table of a shared cache database,
+# like the test database) is held by another connection
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+# --- sets up every new SQLite connection with the PRAGMAs of the settings
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def is_locked_error(error):
+    return isinstance(error, OperationalError) and str(error).startswith(LOCKED_MESSAGES)
+
+
+# --- runs the write transaction 'function' again when the database is locked, after a delay doubled on every retry
+# (with some jitter, so the writers that collided don't collide again)
+# when the busy timeout doesn't help - a transaction which read before writing can't wait for a writer which changed
+# the database since, it has to start over - the whole transaction is run again, which is safe as it was rolled back
+# within an outer transaction nothing is retried, as only the outer transaction can start over - so the retry is
+# owned by the transaction boundary: the functions of homepage.views running a write transaction of a request are
+# decorated, and the model methods they call within it are not
+def retry_on_locked(function):
+    @wraps(function)
+    def retrying(*args, **kwargs):
+        for retry in range(WRITE_RETRIES + 1):
+            try:
+                return function(*args, **kwargs)
+            except OperationalError as error:
+                if not is_locked_error(error) or retry == WRITE_RETRIES or connections['default'].in_atomic_block:
+                    raise
+                delay = WRITE_RETRY_DELAY * 2 ** retry * random.uniform(0.5, 1.5)
+                logger.info('%s found the database locked, retrying in %.3fs', function.__qualname__, delay)
+                time.sleep(delay)
+    return retrying
@@ -0,0 +1,113 @@
+from threading import RLock
+
+from homepage import caching
+from homepage.models import Course, Prerequisites
+
+
+# decodes a bitset into the indexes of its set bits, lowest first
+def bit_indexes(bits):
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+# evaluates which courses a student can take given the courses they completed
+# every course gets a bit in a dense index, and for every required course and requirement code the index keeps
+# the bitset of the courses requiring it, so a whole catalog is evaluated with a few big integer operations per
+# required course instead of a query per course:
+#   BEFORE  - a course is blocked while any of the courses it requires is not completed
+#   CANT    - a course is blocked once any of the courses it excludes is completed
+#   SIMU    - a course is blocked while any of the courses it requires is neither completed nor eligible,
+#             as those can be taken at the same time
+# completed courses are never eligible again
+# the index loads lazily from the database, and loads again once the view cache version of 'scopes' (the courses
+# and the prerequisites) changed, whichever process changed them - an index without 'scopes' is loaded (or built) once
+class EligibilityIndex:
+
+    def __init__(self, scopes=None):
+        self.scopes = scopes
+        self.lock = RLock()  # reentrant, so an evaluation can load the index it then holds
+        self.reset()
+
+    # --- drops the index, the next evaluation reloads it from the database
+    def reset(self):
+        with self.lock:
+            self.loaded = False
+            self.version = None  # the versions of the courses and prerequisites the index was loaded at
+            self.course_ids = []  # bit index -> course_id
+            self.names = []  # bit index -> course name
+            self.bits = {}  # course_id -> bit index
+            self.all_courses = 0
+            self.required_by = {}  # req_code -> {bit index of the required course: bitset of the requiring courses}
+
+    def load(self):
+        version = caching.get_versions(self.scopes) if self.scopes else None
+        with self.lock:
+            if self.loaded and self.version == version:
+                return
+            self._build(Course.objects.order_by('course_id').values_list('course_id', 'name'),
+                        Prerequisites.objects.values_list('course_id', 'req_course_id', 'req_code'))
+            self.version = version
+
+    # --- builds the index from (course_id, name) pairs and (course_id, req_course_id, req_code) triples
+    def build(self, courses, prerequisites):
+        with self.lock:
+            self._build(courses, prerequisites)
+
+    def _build(self, courses, prerequisites):
+        courses = sorted(courses)
+        self.course_ids = [course_id for course_id, name in courses]
+        self.names = [name for course_id, name in courses]
+        self.bits = {course_id: index for index, course_id in enumerate(self.course_ids)}
+        self.all_courses = (1 << len(self.course_ids)) - 1
+        required_by = {Prerequisites.Req_Code.BEFORE: {}, Prerequisites.Req_Code.SIMU: {},
+                       Prerequisites.Req_Code.CANT: {}}
+        for course_id, req_course_id, req_code in prerequisites:
+            if req_code in required_by and course_id in self.bits and req_course_id in self.bits:
+                required = self.bits[req_course_id]
+                required_by[req_code][required] = required_by[req_code].get(required, 0) | 1 << self.bits[course_id]
+        self.required_by = required_by
+        self.loaded = True
+
+    # --- returns the bitset of the courses requiring, by 'req_code', a course in (or out of) 'bitset'
+    def _requiring(self, req_code, bitset, inside):
+        requiring = 0
+        for required, courses in self.required_by[req_code].items():
+            if (bitset >> required & 1) == inside:
+                requiring |= courses
+        return requiring
+
+    # --- returns the bit indexes of the courses that can be taken after completing 'completed_ids'
+    # ids of courses missing from the catalog are ignored
+    def _eligible_indexes(self, completed_ids):
+        completed = 0
+        for course_id in completed_ids:
+            if course_id in self.bits:
+                completed |= 1 << self.bits[course_id]
+
+        eligible = self.all_courses & ~completed
+        eligible &= ~self._requiring(Prerequisites.Req_Code.BEFORE, completed, False)
+        eligible &= ~self._requiring(Prerequisites.Req_Code.CANT, completed, True)
+        # a simultaneous requirement may itself turn out blocked, so narrow down until nothing changes
+        while True:
+            narrowed = eligible & ~self._requiring(Prerequisites.Req_Code.SIMU, completed | eligible, False)
+            if narrowed == eligible:
+                break
+            eligible = narrowed
+        return bit_indexes(eligible)
+
+    # --- returns the ids of the courses that can be taken after completing 'completed_ids', in id order
+    def eligible_course_ids(self, completed_ids):
+        with self.lock:
+            self.load()
+            return [self.course_ids[index] for index in self._eligible_indexes(completed_ids)]
+
+    # --- returns the (course_id, name) pairs of the courses that can be taken after completing 'completed_ids'
+    def eligible_courses(self, completed_ids):
+        with self.lock:
+            self.load()
+            return [(self.course_ids[index], self.names[index]) for index in self._eligible_indexes(completed_ids)]
+
+
+eligibility_index = EligibilityIndex(scopes=['catalog', 'prerequisites'])
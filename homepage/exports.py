@@ -0,0 +1,105 @@
+from datetime import datetime, time
+from decimal import Decimal
+import csv
+import json
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from homepage.models import Course, Review, UserLikes, RATING_VALUES
+
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)  # rows fetched from the database at once
+EXPORT_FORMATS = ['csv', 'ndjson']
+
+
+def reviews_since(since):
+    return Review.objects.filter(date__gte=since) if since else Review.objects.all()
+
+
+def likes_since(since):
+    return UserLikes.objects.filter(date__gte=since) if since else UserLikes.objects.all()
+
+
+# the aggregates of a course only change with its reviews, so the courses with new reviews are the changed ones
+def courses_since(since):
+    if not since:
+        return Course.objects.all()
+    return Course.objects.filter(Exists(Review.objects.filter(course=OuterRef('pk'), date__gte=since)))
+
+
+# the exports: the rows of each are selected by the function of the 'since' timestamp, with these columns
+EXPORTS = {
+    'reviews': (reviews_since, ['id', 'course_id', 'user_id', 'professor_id', 'rate', 'course_load', 'content',
+                                'likes_num', 'date']),
+    'likes': (likes_since, ['id', 'user_id_id', 'review_id_id', 'date']),
+    'courses': (courses_since, ['course_id', 'name', 'mandatory', 'credit_points', 'avg_rating', 'avg_load',
+                                'num_of_raters', 'num_of_reviewers', 'rating_sum', 'load_sum']
+                + [f'rating_count_{value}' for value in RATING_VALUES]
+                + [f'load_count_{value}' for value in RATING_VALUES]),
+}
+# the names of the columns in the exported files
+COLUMN_NAMES = {'user_id_id': 'user_id', 'review_id_id': 'review_id'}
+
+
+# --- returns the timestamp of a 'since' value, an ISO date and time or a date (from its midnight), or None
+# a time without a time zone is in the time zone of the project
+# a well formed but impossible date or time (like 2021-02-30) is invalid too
+def parse_since(value):
+    try:
+        since = parse_datetime(value)
+        date = parse_date(value) if since is None else None
+    except ValueError:
+        return None
+    if since is None:
+        if date is None:
+            return None
+        since = datetime.combine(date, time())
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def export_columns(name):
+    return [COLUMN_NAMES.get(column, column) for column in EXPORTS[name][1]]
+
+
+# --- yields the rows of the export as tuples, fetched in chunks so the memory doesn't grow with the table
+def export_rows(name, since=None):
+    select, columns = EXPORTS[name]
+    return select(since).order_by('pk').values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+# a file-like object that returns what is written to it, so the csv writer formats a single line at a time
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps({column: json_value(value) for column, value in zip(columns, row)}) + '\n'
+
+
+# --- yields the lines of the export in 'export_format', of the rows from 'since' (or all the rows)
+def export_lines(name, export_format, since=None):
+    lines = csv_lines if export_format == 'csv' else ndjson_lines
+    return lines(export_columns(name), export_rows(name, since))
@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+# the PBKDF2 hasher of Django with the number of iterations of the settings (PASSWORD_PBKDF2_ITERATIONS), the cost
+# of a sign in - see the benchmark_hashers command
+# the hashes keep the algorithm name of Django's hasher, so the existing passwords are verified as they are, and a
+# password hashed with another number of iterations is hashed again with this one when its user signs in
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
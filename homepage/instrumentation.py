@@ -0,0 +1,220 @@
+from collections import deque, Counter
+from contextlib import ExitStack, nullcontext
+from contextvars import ContextVar
+from threading import Lock
+import asyncio
+import json
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('homepage.sql')
+
+SLOW_REQUEST_MS = getattr(settings, 'SQL_SLOW_REQUEST_MS', 500)  # a request taking longer is logged
+SLOW_REQUEST_QUERIES = getattr(settings, 'SQL_SLOW_REQUEST_QUERIES', 50)  # a request running more queries is logged
+ROLLING_WINDOW = getattr(settings, 'SQL_STATS_WINDOW', 200)  # number of recent requests kept per view
+LOGGED_DUPLICATES = 5  # number of duplicated query shapes written in a log line
+UNRESOLVED_VIEW = 'unresolved'  # the group of requests that didn't resolve to a view (e.g. 404)
+
+IN_PARAMS = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+# --- the shape of a query: its SQL with the parameters left out, and any IN list collapsed,
+# so a query repeated with different values (an N+1 pattern) has a single shape
+def query_shape(sql):
+    return IN_PARAMS.sub('IN (...)', sql)
+
+
+# records the queries run by a request, on every database, through the connections' execute wrappers
+# the wrappers see every query whatever DEBUG is, so it works in production too
+# the queries of an async view run in several threads at once, so the counts are updated under a lock
+class QueryRecorder:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.shapes = Counter()
+        self.lock = Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.db_time += elapsed
+                self.queries += 1
+                self.shapes[query_shape(sql)] += 1
+
+    def record(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    # --- the number of queries repeating a shape already run by the request
+    def duplicates(self):
+        return sum(count - 1 for count in self.shapes.values())
+
+    def duplicated_shapes(self):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > 1]
+
+
+# rolling per-view aggregates of the recorded requests, kept in the memory of the process
+class RequestStats:
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.views = {}  # view name -> totals and the deque of the recent requests
+
+    def record(self, view, queries, db_ms, duration_ms, duplicates, slow):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = {'requests': 0, 'slow': 0, 'recent': deque(maxlen=self.window)}
+            stats['requests'] += 1
+            stats['slow'] += 1 if slow else 0
+            stats['recent'].append((queries, db_ms, duration_ms, duplicates))
+
+    # --- returns a dict of the figures of every view over its recent requests, by total DB time first
+    def summary(self):
+        with self.lock:
+            views = [(view, stats['requests'], stats['slow'], list(stats['recent']))
+                     for view, stats in self.views.items()]
+        summary = []
+        for view, requests, slow, recent in views:
+            queries, db_times, durations, duplicates = zip(*recent)
+            durations = sorted(durations)
+            summary.append({
+                'view': view,
+                'requests': requests,
+                'slow': slow,
+                'window': len(recent),
+                'avg_queries': sum(queries) / len(recent),
+                'max_queries': max(queries),
+                'avg_db_ms': sum(db_times) / len(recent),
+                'total_db_ms': sum(db_times),
+                'avg_duplicates': sum(duplicates) / len(recent),
+                'p50_ms': durations[(len(durations) - 1) // 2],
+                'p95_ms': durations[int(0.95 * (len(durations) - 1))],
+                'max_ms': durations[-1],
+            })
+        return sorted(summary, key=lambda stats: -stats['total_db_ms'])
+
+
+request_stats = RequestStats()
+
+# the recorder of the request being served, seen by the threads the async views run their queries in
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+# --- records the queries of the current thread for the request being served, as the connections are per thread
+def record_thread_queries():
+    recorder = current_recorder.get()
+    return recorder.record() if recorder is not None else nullcontext()
+
+
+# records the queries of every request, grouped by the name of the view it resolved to:
+#   - in debug mode the figures are added to the response as X-DB-* headers
+#   - a request over SQL_SLOW_REQUEST_MS or SQL_SLOW_REQUEST_QUERIES is logged as a JSON line
+#     to the 'homepage.sql' logger, with its most duplicated query shapes
+#   - the rolling per-view aggregates are shown on the staff SQL stats page
+#   - a streaming response (the exports) is reported when its content is consumed, with the queries run while streaming
+# under ASGI it stays async, so the async views aren't run through a thread by the middleware chain
+class SQLInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # served as a coroutine, as MiddlewareMixin does
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            with recorder.record():
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.process_recorded(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            with recorder.record():
+                response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.process_recorded(request, response, recorder, start)
+
+    # --- a streaming response runs the queries of its content while it streams, after the view returned,
+    # so the streamed content is recorded too and the request is reported once it is consumed
+    def process_recorded(self, request, response, recorder, start):
+        if response.streaming:
+            content = iter(response.streaming_content)
+            response.streaming_content = self.record_streaming(content, request, response, recorder, start)
+            return response
+        self.report(request, response, recorder, start)
+        return response
+
+    # the recording is entered around each chunk only, so the wrappers aren't left on the connections
+    # of the thread between the chunks, where the server may serve another request
+    def record_streaming(self, content, request, response, recorder, start):
+        try:
+            while True:
+                with recorder.record():
+                    try:
+                        chunk = next(content)
+                    except StopIteration:
+                        return
+                yield chunk
+        finally:
+            self.report(request, response, recorder, start)
+
+    # the debug headers of a streaming response are already sent when it's reported, so it's left without them
+    def report(self, request, response, recorder, start):
+        duration_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.db_time * 1000
+
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED_VIEW
+        duplicates = recorder.duplicates()
+        slow = duration_ms > SLOW_REQUEST_MS or recorder.queries > SLOW_REQUEST_QUERIES
+        request_stats.record(view, recorder.queries, db_ms, duration_ms, duplicates, slow)
+
+        if settings.DEBUG and not response.streaming:
+            response['X-DB-Queries'] = recorder.queries
+            response['X-DB-Time-Ms'] = f'{db_ms:.2f}'
+            response['X-DB-Duplicate-Queries'] = duplicates
+        if slow:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 2),
+                'queries': recorder.queries,
+                'db_ms': round(db_ms, 2),
+                'duplicates': duplicates,
+                'duplicated_shapes': [{'sql': shape, 'count': count}
+                                      for shape, count in recorder.duplicated_shapes()[:LOGGED_DUPLICATES]],
+            }))
@@ -0,0 +1,22 @@
+from itertools import islice
+
+from homepage import caching
+
+
+DEFAULT_BATCH_SIZE = 1000  # number of rows written to the database at once
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# --- invalidates the cached views and the in-memory indexes of the data changed by 'scopes', in every process
+# serving the database: they all follow the versions of the shared cache
+# bulk operations send no model signals, so the commands writing in bulk call it once they are done
+def reset_after_bulk_changes(scopes):
+    caching.invalidate(scopes)
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ClassRater.asgi import AsyncViewsASGIHandler
+from ClassRater.asgi_urls import ASYNC_VIEWS
+from homepage.management.commands.benchmark_views import USERS, benchmark_host, percentile
+from homepage.models import AppUser, Course
+
+
+# compares the throughput of the read views under concurrent load, served by the WSGI handler (the sync views,
+# a thread per request) and by the ASGI handler (the async views, homepage.async_views, on an event loop)
+# both handlers are called in this process, without a server, with 'concurrency' requests in flight at any time:
+# WSGI from a pool of that many threads, ASGI from that many tasks of a single event loop
+# every view is requested once before it is timed, so both are measured with a warm cache
+class Command(BaseCommand):
+    help = 'Benchmarks the throughput of the read views under concurrent load, over WSGI and over ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='number of timed requests of every view')
+        parser.add_argument('--concurrency', type=int, default=20, help='number of requests in flight at once')
+        parser.add_argument('--view', action='append', dest='views', choices=list(ASYNC_VIEWS),
+                            help='benchmark only this view, repeatable')
+        parser.add_argument('--output', help='the file the JSON results are written to, by default the output')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('The number of requests and the concurrency must be positive')
+        app_user = AppUser.objects.annotate(reviews_num=Count('review')).order_by('-reviews_num', 'pk').first()
+        course = Course.objects.order_by('-num_of_raters', 'pk').first()
+        if app_user is None or course is None:
+            raise CommandError('The database needs users and courses, see the generate_data command')
+
+        # the views run with a cache of their own, so the project cache (and the sessions in it) is left untouched
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                CACHES={'default': {**settings.CACHES['default'], 'LOCATION': os.path.join(directory, 'cache')}}):
+            results = self.run_views(app_user, course, options)
+
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        else:
+            json.dump(report, self.stdout, indent=2)
+            self.stdout.write('')
+
+    # --- returns the results of every view, for an anonymous and for a signed in user
+    def run_views(self, app_user, course, options):
+        # a session of the signed in user, sent as a cookie by both handlers
+        client = Client()
+        client.force_login(app_user.user)
+        self.cookies = {'anonymous': '', 'signed_in': f'{settings.SESSION_COOKIE_NAME}='
+                                                      f'{client.cookies[settings.SESSION_COOKIE_NAME].value}'}
+        self.host = benchmark_host()
+        self.wsgi = WSGIHandler()
+        self.asgi = AsyncViewsASGIHandler()
+        url_kwargs = {'course': {'id': course.course_id}}
+
+        results = []
+        try:
+            for name in options['views'] or list(ASYNC_VIEWS):
+                path = reverse(name, kwargs=url_kwargs.get(name))
+                for user in USERS:
+                    wsgi = self.run_wsgi(path, user, options['requests'], options['concurrency'])
+                    asgi = self.run_asgi(path, user, options['requests'], options['concurrency'])
+                    results.append({'name': name, 'path': path, 'user': user, 'wsgi': wsgi, 'asgi': asgi,
+                                    'speedup': round(asgi['requests_per_s'] / wsgi['requests_per_s'], 3)})
+        finally:
+            client.logout()
+        return results
+
+    # --- returns the status and the milliseconds of a request to the WSGI handler
+    def wsgi_request(self, path, user):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': self.host, 'SERVER_PORT': '80', 'HTTP_HOST': self.host, 'HTTP_COOKIE': self.cookies[user],
+            'REMOTE_ADDR': '127.0.0.1', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(), 'wsgi.errors': BytesIO(), 'wsgi.multithread': True,
+            'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        status = []
+        start = time.perf_counter()
+        response = self.wsgi(environ, lambda response_status, headers: status.append(response_status))
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return int(status[0].split()[0]), (time.perf_counter() - start) * 1000
+
+    # --- returns the status and the milliseconds of a request to the ASGI handler
+    async def asgi_request(self, path, user):
+        url = urlsplit(path)
+        headers = [(b'host', self.host.encode())]
+        if self.cookies[user]:
+            headers.append((b'cookie', self.cookies[user].encode()))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': url.path, 'raw_path': url.path.encode(), 'query_string': url.query.encode(), 'root_path': '',
+            'headers': headers, 'client': ('127.0.0.1', 0), 'server': (self.host, 80),
+        }
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        start = time.perf_counter()
+        await self.asgi(scope, receive, send)
+        return status[0], (time.perf_counter() - start) * 1000
+
+    def run_wsgi(self, path, user, requests, concurrency):
+        self.wsgi_request(path, user)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            responses = list(executor.map(lambda _: self.wsgi_request(path, user), range(requests)))
+            elapsed = time.perf_counter() - start
+        return self.summarize(responses, elapsed)
+
+    def run_asgi(self, path, user, requests, concurrency):
+        async def run():
+            await self.asgi_request(path, user)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def limited():
+                async with semaphore:
+                    return await self.asgi_request(path, user)
+
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(limited() for _ in range(requests)))
+            return responses, time.perf_counter() - start
+        return self.summarize(*asyncio.run(run()))
+
+    @staticmethod
+    def summarize(responses, elapsed):
+        statuses = sorted({status for status, ms in responses})
+        timings = sorted(ms for status, ms in responses)
+        return {
+            'statuses': statuses,
+            'requests_per_s': round(len(responses) / elapsed, 1),
+            'latency_ms': {'p50': round(percentile(timings, 0.5), 3), 'p90': round(percentile(timings, 0.9), 3),
+                           'p99': round(percentile(timings, 0.99), 3), 'max': round(timings[-1], 3)},
+        }
@@ -0,0 +1,96 @@
+import json
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# the timing processes import this module, so the modules importing the models are imported in the functions using them
+
+PASSWORD = 'correct horse battery staple'
+
+
+# --- hashes the password with the hasher 'path', or returns None when the library of the hasher isn't installed
+def hash_password(path):
+    hasher = import_string(path)()
+    try:
+        return hasher.encode(PASSWORD, hasher.salt())
+    except (ImportError, ValueError):
+        return None
+
+
+# --- verifies the password against 'encoded' 'logins' times with the hasher 'path', as signing in does, and returns
+# the milliseconds of every verification
+def time_logins(path, encoded, logins):
+    hasher = import_string(path)()
+    timings = []
+    for _ in range(logins):
+        start = time.perf_counter()
+        if not hasher.verify(PASSWORD, encoded):
+            raise CommandError(f'{path} did not verify its own hash')
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+# measures the cost of a sign in with every hasher of PASSWORD_HASHERS: the time of a password verification, and the
+# sign ins per second a core serves (a sign in verifies the password once); with --processes the verifications run
+# in that many processes at once, one per core, and the total rate is reported too
+# the hashers whose library isn't installed (like argon2 or bcrypt) are reported as unavailable
+class Command(BaseCommand):
+    help = 'Benchmarks the sign ins per second per core of every configured password hasher, as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='number of timed verifications of every process')
+        parser.add_argument('--processes', type=int, default=1, help='number of processes verifying at once')
+        parser.add_argument('--hasher', action='append', dest='hashers', choices=settings.PASSWORD_HASHERS,
+                            help='benchmark only this hasher, repeatable')
+        parser.add_argument('--output', help='the file the JSON results are written to, by default the output')
+
+    def handle(self, *args, **options):
+        if options['logins'] < 1 or options['processes'] < 1:
+            raise CommandError('The number of logins and of processes must be positive')
+
+        results = [self.benchmark(path, options['logins'], options['processes'])
+                   for path in options['hashers'] or settings.PASSWORD_HASHERS]
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'logins': options['logins'],
+            'processes': options['processes'],
+            'preferred': settings.PASSWORD_HASHERS[0],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        else:
+            json.dump(report, self.stdout, indent=2)
+            self.stdout.write('')
+
+    @staticmethod
+    def benchmark(path, logins, processes):
+        from homepage.management.commands.benchmark_views import percentile
+        hasher = import_string(path)()
+        result = {'hasher': path, 'algorithm': hasher.algorithm, 'iterations': getattr(hasher, 'iterations', None)}
+        encoded = hash_password(path)
+        if encoded is None:
+            return {**result, 'available': False}
+
+        if processes == 1:
+            runs = [time_logins(path, encoded, logins)]
+        else:
+            with multiprocessing.get_context('spawn').Pool(processes) as pool:
+                runs = pool.starmap(time_logins, [(path, encoded, logins)] * processes)
+
+        timings = sorted(timing for run in runs for timing in run)
+        return {
+            **result,
+            'available': True,
+            'verify_ms': {'p50': round(percentile(timings, 0.5), 3), 'p90': round(percentile(timings, 0.9), 3),
+                          'max': round(timings[-1], 3)},
+            # a core verifies one password at a time, so its rate is the inverse of the mean verification time,
+            # and the processes together serve the sum of their rates
+            'logins_per_s_per_core': round(1000 * len(timings) / sum(timings), 1),
+            'logins_per_s': round(sum(1000 * len(run) / sum(run) for run in runs), 1),
+        }
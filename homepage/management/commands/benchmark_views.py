@@ -0,0 +1,182 @@
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+
+from homepage import database
+from homepage.eligibility import eligibility_index
+from homepage.management.commands.benchmark_writes import copy_database
+from homepage.models import AppUser, Course, FollowedUserCourses, Prerequisites, Review, UserLikes
+from homepage.prerequisites import prerequisite_graph
+from homepage.routers import REPLICA_DATABASES
+from homepage.search import course_index
+
+
+USERS = ['anonymous', 'signed_in']  # every view is timed for an anonymous and for a signed in user
+
+
+# --- a host the project accepts, the 'testserver' host of the test client is only allowed in tests
+def benchmark_host():
+    hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+    return hosts[0] if hosts else 'localhost'
+
+
+# --- the value at 'fraction' of the sorted values, by the nearest rank
+def percentile(sorted_values, fraction):
+    return sorted_values[max(ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+# times every named view of the project URLs against the current database, and writes the results as JSON
+# each view is requested once with an empty cache (cold) and then 'runs' more times (warm), recording the status,
+# the query counts and the latency percentiles
+# the URL arguments are taken from the data: the most rated course, the most liked review and the signed in user,
+# who is the user with the most reviews
+# the views run as in production - their transactions commit, with their on-commit work and their retries - on a copy
+# of the database in a temporary directory, so the views that change data (liking, following) leave no trace, and
+# with a cache of their own there, so emptying it doesn't sign out the users of the project cache
+class Command(BaseCommand):
+    help = 'Benchmarks the latency and query counts of every view, writing the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20, help='number of timed requests of every view')
+        parser.add_argument('--output', help='the file the JSON results are written to, by default the output')
+        parser.add_argument('--compare', help='a previous results file to print the changes against')
+        parser.add_argument('--view', action='append', dest='views', help='benchmark only this view, repeatable')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('The number of runs must be positive')
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark runs on a copy of the SQLite database, the database is not SQLite')
+        app_user = AppUser.objects.annotate(reviews_num=Count('review')).order_by('-reviews_num', 'pk').first()
+        course = Course.objects.order_by('-num_of_raters', 'pk').first()
+        review = Review.objects.order_by('-likes_num', 'pk').first()
+        if app_user is None or course is None or review is None:
+            raise CommandError('The database needs users, courses and reviews, see the generate_data command')
+        self.user = app_user.user
+        self.url_kwargs = {'id': course.course_id, 'course_id': course.course_id, 'review_id': review.id,
+                           'user_id': self.user.id, 'name': 'courses', 'export_format': 'csv'}
+
+        patterns = self.get_patterns(options['views'])
+        with tempfile.TemporaryDirectory() as directory, self.on_copy(directory):
+            results = [self.benchmark(pattern, user, options['runs']) for pattern in patterns for user in USERS]
+
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'runs': options['runs'],
+            'database': {
+                'courses': Course.objects.count(),
+                'prerequisites': Prerequisites.objects.count(),
+                'users': AppUser.objects.count(),
+                'reviews': Review.objects.count(),
+                'likes': UserLikes.objects.count(),
+                'follows': FollowedUserCourses.objects.count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        else:
+            json.dump(report, self.stdout, indent=2)
+            self.stdout.write('')
+        if options['compare']:
+            # kept apart from the JSON when it is written to the output
+            self.compare(options['compare'], results, self.stdout if options['output'] else self.stderr)
+
+    # --- runs the block on a copy of the database (read from the replicas too) and with a cache in 'directory'
+    # the in-memory indexes loaded from the copy are dropped after it
+    @staticmethod
+    @contextmanager
+    def on_copy(directory):
+        path = os.path.join(directory, 'db.sqlite3')
+        copy_database(path, database.SQLITE_PRAGMAS.get('journal_mode'))
+        aliases = [DEFAULT_DB_ALIAS, *REPLICA_DATABASES]
+        originals = {alias: connections[alias] for alias in aliases}
+        cache_settings = {**settings.CACHES['default'], 'LOCATION': os.path.join(directory, 'cache')}
+        try:
+            for alias, original in originals.items():
+                connections[alias] = type(original)({**original.settings_dict, 'NAME': path}, alias)
+            with override_settings(CACHES={'default': cache_settings}):
+                yield
+        finally:
+            for alias, original in originals.items():
+                connections[alias].close()
+                connections[alias] = original
+            for index in (course_index, prerequisite_graph, eligibility_index):
+                index.reset()
+
+    # --- returns the named views of the project URLs, included URL configurations (the admin site) are skipped
+    def get_patterns(self, views):
+        patterns = [pattern for pattern in get_resolver().url_patterns
+                    if isinstance(pattern, URLPattern) and pattern.name and (not views or pattern.name in views)]
+        if views and len(patterns) < len(set(views)):
+            names = ', '.join(pattern.name for pattern in self.get_patterns(None))
+            raise CommandError(f'Unknown views, the views are {names}')
+        return patterns
+
+    def benchmark(self, pattern, user, runs):
+        name = pattern.name
+        path = reverse(name, kwargs={key: self.url_kwargs[key] for key in pattern.pattern.regex.groupindex})
+        client = Client(HTTP_HOST=benchmark_host())
+        cache.clear()
+        cold_ms, cold_queries, status = self.request(client, user, path)
+        timings = []
+        queries = []
+        for _ in range(runs):
+            elapsed, queries_num, status = self.request(client, user, path)
+            timings.append(elapsed)
+            queries.append(queries_num)
+        timings.sort()
+        return {
+            'name': name,
+            'path': path,
+            'user': user,
+            'status': status,
+            'cold': {'ms': cold_ms, 'queries': cold_queries},
+            'queries': {'min': min(queries), 'max': max(queries)},
+            'latency_ms': {'mean': round(sum(timings) / len(timings), 3), 'p50': percentile(timings, 0.5),
+                           'p90': percentile(timings, 0.9), 'p99': percentile(timings, 0.99), 'max': timings[-1]},
+        }
+
+    # --- returns the milliseconds, the number of queries and the status of a request
+    # the session is set before every request, as some views (signing out) change it
+    def request(self, client, user, path):
+        if user == 'signed_in':
+            client.force_login(self.user)
+        else:
+            client.logout()
+        connection.queries_log.clear()  # the log is bounded, and the captured queries are counted off its length
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(path, HTTP_REFERER='/')
+            elapsed = time.perf_counter() - start
+        return round(elapsed * 1000, 3), len(queries), response.status_code
+
+    # --- prints the change of the median latency and of the queries of every view from a previous run
+    def compare(self, path, results, out):
+        try:
+            with open(path) as previous_file:
+                previous = {(result['name'], result['user']): result for result in json.load(previous_file)['results']}
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Cannot read {path}: {error}')
+        for result in results:
+            before = previous.get((result['name'], result['user']))
+            if before is None:
+                continue
+            p50_change = result['latency_ms']['p50'] - before['latency_ms']['p50']
+            queries_change = result['queries']['max'] - before['queries']['max']
+            out.write(f"{result['name']:<22} {result['user']:<10} p50 {result['latency_ms']['p50']:>9.3f}ms "
+                      f"({p50_change:+.3f}) queries {result['queries']['max']:>3} ({queries_change:+d})")
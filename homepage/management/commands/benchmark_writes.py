@@ -0,0 +1,210 @@
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from homepage import database
+
+# the writer processes import this module before they set up Django, so the models (and the modules importing them)
+# are imported in the functions using them
+
+# the connection profiles compared: SQLite as Django sets it up (a rollback journal, every commit synced, and the
+# 5 seconds busy timeout of the sqlite3 module), and the profile of the settings (SQLITE_PRAGMAS) with the retries
+# of homepage.database
+PROFILES = {
+    'default': {'pragmas': {'journal_mode': 'delete', 'synchronous': 'full'}, 'retries': 0},
+    'configured': {'pragmas': None, 'retries': None},
+}
+SAMPLE_SIZE = 20  # number of users, reviews and courses the writers pick from, so their writes collide
+SETUP_ATTEMPTS = 5  # times a writer tries to connect and load its samples while the database is locked
+WRITER_TIMEOUT = 600  # seconds the command waits for the writers to be ready, and then to finish
+
+
+# --- copies the current database to 'path' with the backup API of SQLite, which copies a database in memory too
+# the 'journal_mode' of the copy is set before other connections open it, as switching it takes the database for a
+# single connection
+def copy_database(path, journal_mode=None):
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+        if journal_mode is not None:
+            target.execute(f'PRAGMA journal_mode = {journal_mode}')
+    finally:
+        target.close()
+
+
+# --- the write paths of the hot actions, chosen at random: toggling a like, following and unfollowing a course
+# they run through the transactions of the views, which own the retries of the locked writes
+def run_write(generator, users, reviews, courses):
+    from homepage import views
+    action = generator.choice(['like', 'follow', 'unfollow'])
+    if action == 'like':
+        views.toggle_review_like(generator.choice(users), generator.choice(reviews))
+    elif action == 'follow':
+        views.follow_course(generator.choice(users), generator.choice(courses))
+    else:
+        views.unfollow_course(generator.choice(users), generator.choice(courses))
+
+
+# --- connects to the database and loads the users, reviews and courses the writes pick from
+# another writer may hold the lock of the database meanwhile, so a locked attempt is counted in 'result' and made
+# again on a new connection (the PRAGMAs of a connection are set as it connects)
+def load_samples(result):
+    from homepage.models import Course, Review, User
+    for attempt in range(1, SETUP_ATTEMPTS + 1):
+        try:
+            return (list(User.objects.order_by('pk')[:SAMPLE_SIZE]), list(Review.objects.order_by('pk')[:SAMPLE_SIZE]),
+                    list(Course.objects.order_by('pk')[:SAMPLE_SIZE]))
+        except Exception as error:
+            if not database.is_locked_error(error) or attempt == SETUP_ATTEMPTS:
+                raise
+            result['setup_errors'] += 1
+            connection.close()
+            time.sleep(database.WRITE_RETRY_DELAY * attempt)
+
+
+# --- a writer process: sets up Django on the copy of the database at 'path' with the connection 'profile', waits
+# for the other writers at 'barrier', and runs 'writes' writes, putting its counts and latencies in 'results'
+# the writers measure the database alone, so they use a dummy cache, leaving the cache of the project untouched
+def run_writer(path, profile, writes, seed, barrier, results):
+    import django
+    from django.conf import settings
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    django.setup()
+    from django.db import OperationalError
+
+    result = {'writes': 0, 'errors': 0, 'setup_errors': 0, 'latencies': []}
+    try:
+        if profile['pragmas'] is not None:
+            database.SQLITE_PRAGMAS = profile['pragmas']
+        connection.settings_dict['NAME'] = path
+        users, reviews, courses = load_samples(result)
+        if profile['retries'] is not None:
+            database.WRITE_RETRIES = profile['retries']
+        generator = random.Random(seed)
+        barrier.wait(timeout=WRITER_TIMEOUT)
+        for _ in range(writes):
+            start = time.perf_counter()
+            try:
+                run_write(generator, users, reviews, courses)
+                result['writes'] += 1
+            except OperationalError:
+                result['errors'] += 1
+            result['latencies'].append((time.perf_counter() - start) * 1000)
+    except Exception as error:
+        result['failure'] = repr(error)
+        barrier.abort()
+    finally:
+        connection.close()
+        results.put(result)
+
+
+# measures the write throughput of concurrent processes on SQLite, with the default connection set up and with the
+# configured one (the write-ahead log, the busy timeout and the retries of the locked writes)
+# every profile runs on a copy of the current database, in a temporary directory, so the data is left untouched
+# the writers toggle likes and follow and unfollow courses of a few users, reviews and courses, so they contend
+class Command(BaseCommand):
+    help = 'Benchmarks the write throughput of concurrent processes on SQLite, by connection profile, as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='number of concurrent writer processes')
+        parser.add_argument('--writes', type=int, default=200, help='number of writes of every process')
+        parser.add_argument('--profile', action='append', dest='profiles', choices=list(PROFILES),
+                            help='benchmark only this connection profile, repeatable')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='the file the JSON results are written to, by default the output')
+
+    def handle(self, *args, **options):
+        from homepage.models import Course, Review, User
+        if options['processes'] < 1 or options['writes'] < 1:
+            raise CommandError('The number of processes and of writes must be positive')
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark compares SQLite connection profiles, the database is not SQLite')
+        if not (User.objects.exists() and Review.objects.exists() and Course.objects.exists()):
+            raise CommandError('The database needs users, reviews and courses, see the generate_data command')
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['profiles'] or list(PROFILES):
+                path = os.path.join(directory, f'{name}.sqlite3')
+                pragmas = PROFILES[name]['pragmas']
+                copy_database(path, (pragmas if pragmas is not None else database.SQLITE_PRAGMAS).get('journal_mode'))
+                results[name] = self.run_profile(path, PROFILES[name], options['processes'], options['writes'],
+                                                 options['seed'])
+
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'processes': options['processes'],
+            'writes': options['writes'],
+            'results': results,
+        }
+        if 'default' in results and 'configured' in results:
+            report['speedup'] = round(results['configured']['writes_per_s'] / results['default']['writes_per_s'], 3)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        else:
+            json.dump(report, self.stdout, indent=2)
+            self.stdout.write('')
+
+    @staticmethod
+    def run_profile(path, profile, processes, writes, seed):
+        from homepage.management.commands.benchmark_views import percentile
+        context = multiprocessing.get_context('spawn')  # the writers set up Django, and their connections, anew
+        barrier = context.Barrier(processes + 1)
+        results = context.Queue()
+        writers = [context.Process(target=run_writer, args=(path, profile, writes, seed + index, barrier, results))
+                   for index in range(processes)]
+        for writer in writers:
+            writer.start()
+        try:
+            barrier.wait(timeout=WRITER_TIMEOUT)
+        except Exception:
+            pass  # a writer failed, and is reported below
+        start = time.perf_counter()
+        counts = Command.collect_results(writers, results)
+        elapsed = time.perf_counter() - start
+        for writer in writers:
+            writer.join()
+
+        failures = [count['failure'] for count in counts if 'failure' in count]
+        if failures:
+            raise CommandError(f'A writer failed: {failures[0]}')
+        timings = sorted(latency for count in counts for latency in count['latencies'])
+        completed = sum(count['writes'] for count in counts)
+        return {
+            'pragmas': profile['pragmas'] if profile['pragmas'] is not None else database.SQLITE_PRAGMAS,
+            'retries': profile['retries'] if profile['retries'] is not None else database.WRITE_RETRIES,
+            'writes': completed,
+            'errors': sum(count['errors'] for count in counts),
+            'setup_errors': sum(count['setup_errors'] for count in counts),
+            'writes_per_s': round(completed / elapsed, 1),
+            'latency_ms': {'p50': round(percentile(timings, 0.5), 3), 'p90': round(percentile(timings, 0.9), 3),
+                           'p99': round(percentile(timings, 0.99), 3), 'max': round(timings[-1], 3)},
+        }
+
+    # --- returns the results of the 'writers', failing when a writer exited without putting its results (killed, or
+    # failing to start) rather than waiting for them forever
+    @staticmethod
+    def collect_results(writers, results):
+        counts = []
+        deadline = time.monotonic() + WRITER_TIMEOUT
+        while len(counts) < len(writers):
+            try:
+                counts.append(results.get(timeout=1))
+            except queue.Empty:
+                if time.monotonic() > deadline:
+                    raise CommandError(f'The writers didn\'t finish in {WRITER_TIMEOUT} seconds')
+                exited = sum(writer.exitcode is not None for writer in writers)
+                if exited > len(counts) and results.empty():
+                    raise CommandError('A writer exited without its results')
+        return counts
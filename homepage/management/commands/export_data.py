@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from homepage.exports import EXPORTS, EXPORT_FORMATS, export_lines, parse_since
+
+
+# writes an export line by line, so dumping a table of any size takes the memory of a chunk of rows
+class Command(BaseCommand):
+    help = 'Exports the reviews, likes or course aggregates as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--since', help='export only the rows from this ISO date or time')
+        parser.add_argument('--output', help='the file written, by default the output')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_since(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since {options['since']}, use an ISO date or time")
+
+        lines = export_lines(options['name'], options['format'], since)
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(lines)
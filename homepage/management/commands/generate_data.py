@@ -0,0 +1,206 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from homepage.management.bulk import DEFAULT_BATCH_SIZE, reset_after_bulk_changes
+from homepage.models import AppUser, Course, FollowedUserCourses, Prerequisites, Review, User, UserLikes, \
+    RATING_VALUES
+
+
+SUBJECTS = ['Algebra', 'Calculus', 'Logic', 'Algorithms', 'Data Structures', 'Databases', 'Compilers', 'Networks',
+            'Operating Systems', 'Statistics', 'Probability', 'Geometry', 'Topology', 'Physics', 'Chemistry',
+            'Biology', 'Economics', 'Philosophy', 'Linguistics', 'Graphics', 'Security', 'Cryptography',
+            'Machine Learning', 'Optimization', 'Signal Processing', 'Robotics', 'Ethics', 'Psychology']
+LEVELS = ['Introduction to', 'Advanced', 'Topics in', 'Applied', 'Foundations of', 'Seminar in', 'Numerical',
+          'Computational', 'Theoretical', 'Modern']
+REVIEW_SENTENCES = ['Great lecturer.', 'The exams were hard.', 'Lots of homework.', 'Very interesting material.',
+                    'Would take it again.', 'The tutorials helped a lot.', 'Boring at times.',
+                    'Make sure you know the prerequisites.', 'Fair grading.', 'Start the projects early.']
+REQ_CODE_WEIGHTS = {Prerequisites.Req_Code.BEFORE: 70, Prerequisites.Req_Code.SIMU: 15,
+                    Prerequisites.Req_Code.CANT: 10, Prerequisites.Req_Code.NONE: 5}
+CONTENT_PROBABILITY = 0.7  # share of the reviews with a written content
+MAX_LIKES_PER_REVIEW = 30000  # likes_num is a small integer
+
+
+# --- returns Zipf weights (1, 1/2^s, 1/3^s ...) in a random order, so popularity doesn't follow the ids
+def zipf_weights(generator, num, skew):
+    weights = [1 / rank ** skew for rank in range(1, num + 1)]
+    generator.shuffle(weights)
+    return weights
+
+
+# --- returns up to 'num' distinct (a, b) index pairs, each side drawn by its weights
+# stops early once the draws keep hitting pairs it already has, so it ends even when 'num' can't be reached
+def sample_pairs(generator, num, weights_a, weights_b):
+    pairs = {}
+    if not weights_a or not weights_b:
+        return []
+    cum_weights_a = list(accumulate(weights_a))
+    cum_weights_b = list(accumulate(weights_b))
+    misses = 0
+    while len(pairs) < num and misses < 10:
+        draws = num - len(pairs)
+        before = len(pairs)
+        pairs.update(dict.fromkeys(zip(
+            generator.choices(range(len(weights_a)), cum_weights=cum_weights_a, k=draws),
+            generator.choices(range(len(weights_b)), cum_weights=cum_weights_b, k=draws))))
+        misses = misses + 1 if len(pairs) - before < draws / 10 else 0
+    return list(pairs)
+
+
+def clamp_rating(value):
+    return min(max(round(value), RATING_VALUES[0]), RATING_VALUES[-1])
+
+
+# generates a synthetic data set for load testing: courses with prerequisites, users, reviews, likes and follows
+# popularity is skewed like real usage - a few courses get most of the reviews and follows, a few users write
+# most of them, and a few reviews get most of the likes
+# the course aggregates are computed from the generated reviews, and the rows are written in bulk
+class Command(BaseCommand):
+    help = 'Generates synthetic courses, prerequisites, users, reviews, likes and follows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=1000)
+        parser.add_argument('--prerequisites', type=float, default=1.5,
+                            help='the average number of prerequisites of a course')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=10000)
+        parser.add_argument('--likes', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=3000)
+        parser.add_argument('--skew', type=float, default=1.0, help='the exponent of the Zipf popularity')
+        parser.add_argument('--days', type=int, default=365, help='the reviews are spread over this many days')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--first-course-id', type=int, default=100000)
+        parser.add_argument('--username-prefix', default='synthetic_user_')
+        parser.add_argument('--password', default='password123', help='the password of all the generated users')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.generator = random.Random(options['seed'])
+        self.options = options
+        first_course_id = options['first_course_id']
+        if Course.objects.filter(pk__range=(first_course_id, first_course_id + options['courses'] - 1)).exists():
+            raise CommandError(f'Courses already exist from id {first_course_id}, use --first-course-id')
+        if User.objects.filter(username__startswith=options['username_prefix']).exists():
+            raise CommandError(f"Users named {options['username_prefix']}... already exist, use --username-prefix")
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            courses = self.generate_courses()
+            prerequisites = self.generate_prerequisites(courses)
+            users = self.generate_users()
+            reviews = self.generate_reviews(courses, users)
+            likes = self.generate_likes(reviews, users)
+            follows = self.generate_follows(courses, users)
+            self.set_course_aggregates(courses, reviews)
+
+            batch_size = options['batch_size']
+            Course.objects.bulk_create(courses, batch_size=batch_size)
+            Prerequisites.objects.bulk_create(prerequisites, batch_size=batch_size)
+            User.objects.bulk_create(users, batch_size=batch_size)
+            AppUser.objects.bulk_create([AppUser(user_id=user.id) for user in users], batch_size=batch_size)
+            Review.objects.bulk_create(reviews, batch_size=batch_size)
+            UserLikes.objects.bulk_create(likes, batch_size=batch_size)
+            FollowedUserCourses.objects.bulk_create(follows, batch_size=batch_size)
+            # the ids were set explicitly, so the sequences of the databases that have them are moved past them
+            with connection.cursor() as cursor:
+                for statement in connection.ops.sequence_reset_sql(no_style(), [User, Review]):
+                    cursor.execute(statement)
+        reset_after_bulk_changes(['catalog', 'prerequisites', 'reviews'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(courses)} courses, {len(prerequisites)} prerequisites, {len(users)} users, '
+            f'{len(reviews)} reviews, {len(likes)} likes and {len(follows)} follows '
+            f'in {time.perf_counter() - start:.2f}s'))
+
+    def generate_courses(self):
+        courses = []
+        for index in range(self.options['courses']):
+            course_id = self.options['first_course_id'] + index
+            name = f'{self.generator.choice(LEVELS)} {self.generator.choice(SUBJECTS)} {index + 1}'
+            courses.append(Course(course_id=course_id, name=name, mandatory=self.generator.random() < 0.3,
+                                  credit_points=self.generator.randint(1, 6)))
+        self.course_weights = zipf_weights(self.generator, len(courses), self.options['skew'])
+        # every course has a typical rating and load its reviews are drawn around
+        self.course_quality = [(self.generator.uniform(1.5, 5), self.generator.uniform(1, 4.5)) for _ in courses]
+        return courses
+
+    # --- a course only requires courses with smaller ids, so the BEFORE and SIMU requirements have no cycles
+    def generate_prerequisites(self, courses):
+        codes = list(REQ_CODE_WEIGHTS.keys())
+        code_weights = list(REQ_CODE_WEIGHTS.values())
+        average = self.options['prerequisites']
+        prerequisites = []
+        for index, course in enumerate(courses[1:], start=1):
+            num = min(index, int(self.generator.expovariate(1 / average) + 0.5) if average > 0 else 0)
+            for required in self.generator.sample(courses[:index], num):
+                prerequisites.append(Prerequisites(course_id=course, req_course_id=required,
+                                                   req_code=self.generator.choices(codes, code_weights)[0]))
+        return prerequisites
+
+    def generate_users(self):
+        first_id = (User.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        password = make_password(self.options['password'])
+        users = [User(id=first_id + index, username=f"{self.options['username_prefix']}{index + 1}",
+                      email=f"{self.options['username_prefix']}{index + 1}@example.com", password=password)
+                 for index in range(self.options['users'])]
+        self.user_weights = zipf_weights(self.generator, len(users), self.options['skew'])
+        return users
+
+    # --- a user reviews a course at most once, drawn by the popularity of the course and the activity of the user
+    def generate_reviews(self, courses, users):
+        first_id = (Review.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        now = timezone.now()
+        pairs = sample_pairs(self.generator, self.options['reviews'], self.course_weights, self.user_weights)
+        reviews = []
+        for index, (course_index, user_index) in enumerate(pairs):
+            rating, load = self.course_quality[course_index]
+            content = None
+            if self.generator.random() < CONTENT_PROBABILITY:
+                content = ' '.join(self.generator.sample(REVIEW_SENTENCES, self.generator.randint(1, 4)))
+            date = now - timedelta(seconds=self.generator.uniform(0, self.options['days'] * 24 * 3600))
+            reviews.append(Review(id=first_id + index, course=courses[course_index], user_id=users[user_index].id,
+                                  rate=clamp_rating(self.generator.gauss(rating, 0.8)),
+                                  course_load=clamp_rating(self.generator.gauss(load, 0.8)),
+                                  content=content, date=date))
+        return reviews
+
+    def generate_likes(self, reviews, users):
+        review_weights = zipf_weights(self.generator, len(reviews), self.options['skew'])
+        pairs = sample_pairs(self.generator, self.options['likes'], review_weights, self.user_weights)
+        likes = []
+        for review_index, user_index in pairs:
+            review = reviews[review_index]
+            if review.likes_num < MAX_LIKES_PER_REVIEW:
+                review.likes_num += 1
+                likes.append(UserLikes(review_id=review, user_id=users[user_index]))
+        return likes
+
+    def generate_follows(self, courses, users):
+        pairs = sample_pairs(self.generator, self.options['follows'], self.course_weights, self.user_weights)
+        return [FollowedUserCourses(course=courses[course_index], user_id=users[user_index].id)
+                for course_index, user_index in pairs]
+
+    # --- sets the sums, histograms and averages of the courses from their reviews
+    def set_course_aggregates(self, courses, reviews):
+        for review in reviews:
+            course = review.course
+            course.num_of_raters += 1
+            course.num_of_reviewers += 1 if review.content else 0
+            course.rating_sum += review.rate
+            course.load_sum += review.course_load
+            setattr(course, f'rating_count_{review.rate}', getattr(course, f'rating_count_{review.rate}') + 1)
+            setattr(course, f'load_count_{review.course_load}', getattr(course, f'load_count_{review.course_load}') + 1)
+        for course in courses:
+            if course.num_of_raters:
+                course.avg_rating = round(Decimal(course.rating_sum) / course.num_of_raters, 5)
+                course.avg_load = round(Decimal(course.load_sum) / course.num_of_raters, 5)
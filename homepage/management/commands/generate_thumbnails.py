@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from homepage.models import Review
+from homepage.thumbnails import process_review_image
+
+
+# makes the variants of the review images uploaded before the pipeline existed, or of every image with --force
+# the images are resized in this process one at a time, so it doesn't compete with the pool of the web server
+class Command(BaseCommand):
+    help = 'Makes the resized WebP and JPEG variants of the review images that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='remake the variants of every image')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        reviews = Review.objects.exclude(image='').exclude(image=None).values_list('pk', 'image', 'image_variants')
+        made = failed = 0
+        for review_id, image, image_variants in reviews.order_by('pk').iterator():
+            if not options['force'] and image_variants.get('source') == image:
+                continue
+            if process_review_image(review_id) is None:
+                failed += 1
+            else:
+                made += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Made the variants of {made} images in {time.perf_counter() - start:.2f}s, {failed} failed'))
@@ -0,0 +1,237 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.exceptions import ValidationError, NON_FIELD_ERRORS
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from homepage.management.bulk import DEFAULT_BATCH_SIZE, batched, reset_after_bulk_changes
+from homepage.models import Course, Prerequisites, Professor, Professor_to_Course
+
+
+CATALOG_FIELDS = ['name', 'mandatory', 'credit_points', 'syllabi']  # set on new courses, overwritten on existing ones
+RATING_FIELDS = ['avg_load', 'avg_rating', 'num_of_raters', 'num_of_reviewers']  # only set on new courses
+LIST_SEPARATOR = ';'  # separates the prerequisites and the professors in a CSV cell
+PREQ_SEPARATOR = ':'  # separates the required course and the requirement code of a CSV prerequisite
+BOOLEAN_VALUES = {'true': True, 't': True, 'yes': True, 'y': True, '1': True,
+                  'false': False, 'f': False, 'no': False, 'n': False, '0': False}
+
+
+# --- yields the (line number, row) pairs of the file, a JSONL line that isn't a JSON object is yielded as None
+def read_rows(stream, file_format):
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+# --- returns a validated, unsaved Course of the row, validated by the same rules as Course.save
+# a JSONL value of the wrong type (a list or an object) is invalid, rather than converted to a string
+# the sums behind the averages of a new course are the totals implied by its averages
+def parse_course(row):
+    course = Course()
+    for field_name in ['course_id'] + CATALOG_FIELDS + RATING_FIELDS:
+        value = row.get(field_name)
+        if value is None or value == '':
+            continue
+        if field_name == 'mandatory' and isinstance(value, str):
+            value = BOOLEAN_VALUES.get(value.strip().lower(), value)
+        try:
+            if isinstance(value, (list, dict)):
+                raise ValidationError(f'invalid value {json.dumps(value)}')
+            setattr(course, field_name, Course._meta.get_field(field_name).to_python(value))
+        except (ValidationError, TypeError, ValueError) as error:
+            messages = error.messages if isinstance(error, ValidationError) else [f'invalid value {value}']
+            raise ValidationError({field_name: messages})
+    course.full_clean(validate_unique=False)
+    if course.num_of_raters:
+        course.rating_sum = round(course.avg_rating * course.num_of_raters)
+        course.load_sum = round(course.avg_load * course.num_of_raters)
+    return course
+
+
+def error_message(error):
+    if not hasattr(error, 'error_dict'):
+        return ' '.join(error.messages)
+    return ' '.join(message if field == NON_FIELD_ERRORS else f'{field}: {message}'
+                    for field, messages in error.message_dict.items() for message in messages)
+
+
+def parse_req_code(value):
+    if isinstance(value, str) and not value.lstrip('-').isdigit():
+        try:
+            return Prerequisites.Req_Code[value.strip().upper()].value
+        except KeyError:
+            raise ValidationError(f'unknown requirement code {value}')
+    if int(value) not in Prerequisites.Req_Code.values:
+        raise ValidationError(f'unknown requirement code {value}')
+    return int(value)
+
+
+# --- returns the (req_course_id, req_code) pairs of the prerequisites of a row
+# a CSV cell holds 'req_course_id:req_code' items, a JSONL row a list of {'req_course_id', 'req_code'} objects
+def parse_prerequisites(value):
+    try:
+        if isinstance(value, str):
+            items = [item.split(PREQ_SEPARATOR) for item in value.split(LIST_SEPARATOR) if item.strip()]
+        else:
+            items = [(item['req_course_id'], item['req_code']) for item in value]
+        return [(int(req_course_id), parse_req_code(req_code)) for req_course_id, req_code in items]
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError(f'invalid prerequisites {value}')
+
+
+# --- returns the names of the professors of a row, separated by ';' in a CSV cell or listed in a JSONL row
+def parse_professors(value):
+    names = value.split(LIST_SEPARATOR) if isinstance(value, str) else value
+    if not isinstance(names, list):
+        raise ValidationError(f'invalid professors {value}')
+    names = [str(name).strip() for name in names if str(name).strip()]
+    max_length = Professor._meta.get_field('name').max_length
+    if any(len(name) > max_length for name in names):
+        raise ValidationError(f'professor names are limited to {max_length} characters')
+    return names
+
+
+# imports a catalog of courses from a CSV or JSONL file, streaming it in batches:
+#   - a row has the Course fields, and optionally 'prerequisites' and 'professors'
+#   - new courses are created and existing ones get their catalog fields updated, with bulk_create / bulk_update -
+#     only the catalog fields of the row (the columns of a CSV file, the keys of a JSONL row) are updated
+#   - a row with 'prerequisites' or 'professors' replaces the prerequisites or professors of the course,
+#     they are linked once all the courses are in, so a row may require a course that comes after it
+#   - invalid rows are reported and skipped
+class Command(BaseCommand):
+    help = 'Imports courses, with their prerequisites and professors, from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="the catalog file, or '-' for the standard input")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='the format of the file, by default taken from its extension')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError('Unknown file format, use --format csv or --format jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be positive')
+        self.batch_size = options['batch_size']
+
+        start = time.perf_counter()
+        self.counts = dict.fromkeys(['rows', 'invalid', 'created', 'updated', 'prerequisites', 'professors'], 0)
+        self.prerequisites = {}  # course_id -> (req_course_id, req_code) pairs replacing its prerequisites
+        self.professors = {}  # course_id -> names of the professors replacing its professors
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as error:
+            raise CommandError(f'Cannot open {path}: {error}')
+        with stream:
+            for batch in batched(read_rows(stream, file_format), self.batch_size):
+                self.import_courses(batch)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{self.counts['rows']} rows read")
+        self.import_prerequisites()
+        self.import_professors()
+        reset_after_bulk_changes(['catalog', 'prerequisites'])
+
+        elapsed = time.perf_counter() - start
+        rate = self.counts['rows'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.counts['rows']} rows in {elapsed:.2f}s ({rate:.0f} rows/s): "
+            f"{self.counts['created']} courses created, {self.counts['updated']} updated, "
+            f"{self.counts['invalid']} invalid, {self.counts['prerequisites']} prerequisites, "
+            f"{self.counts['professors']} professor links"))
+
+    def report_invalid(self, line_number, message):
+        self.counts['invalid'] += 1
+        self.stderr.write(f'line {line_number}: {message}')
+
+    def import_courses(self, batch):
+        courses = {}
+        update_fields = {}  # course_id -> the catalog fields of its row, updated on an existing course
+        for line_number, row in batch:
+            self.counts['rows'] += 1
+            if row is None:
+                self.report_invalid(line_number, 'not a JSON object')
+                continue
+            try:
+                course = parse_course(row)
+                prerequisites = parse_prerequisites(row['prerequisites']) if 'prerequisites' in row else None
+                professors = parse_professors(row['professors']) if 'professors' in row else None
+            except (ValidationError, TypeError, ValueError) as error:
+                message = error_message(error) if isinstance(error, ValidationError) else f'invalid row: {error}'
+                self.report_invalid(line_number, message)
+                continue
+            # a course listed twice is imported as its last row
+            courses[course.course_id] = course
+            update_fields[course.course_id] = tuple(field_name for field_name in CATALOG_FIELDS if field_name in row)
+            if prerequisites is not None:
+                self.prerequisites[course.course_id] = prerequisites
+            if professors is not None:
+                self.professors[course.course_id] = professors
+
+        with transaction.atomic():
+            existing = set(Course.objects.filter(pk__in=courses.keys()).values_list('pk', flat=True))
+            Course.objects.bulk_create([course for course_id, course in courses.items() if course_id not in existing])
+            updates = {}  # catalog fields -> the existing courses whose rows have them
+            for course_id in existing:
+                updates.setdefault(update_fields[course_id], []).append(courses[course_id])
+            for fields, updated_courses in updates.items():
+                if fields:
+                    Course.objects.bulk_update(updated_courses, fields)
+        self.counts['created'] += len(courses) - len(existing)
+        self.counts['updated'] += len(existing)
+
+    def import_prerequisites(self):
+        course_ids = set(Course.objects.values_list('pk', flat=True))
+        prerequisites = []
+        for course_id, course_prerequisites in self.prerequisites.items():
+            for req_course_id, req_code in course_prerequisites:
+                if req_course_id not in course_ids:
+                    self.stderr.write(f'course {course_id}: unknown required course {req_course_id}')
+                    continue
+                prerequisites.append(Prerequisites(course_id_id=course_id, req_course_id_id=req_course_id,
+                                                   req_code=req_code))
+
+        with transaction.atomic():
+            for course_ids_batch in batched(self.prerequisites.keys(), self.batch_size):
+                Prerequisites.objects.filter(course_id__in=course_ids_batch).delete()
+            Prerequisites.objects.bulk_create(prerequisites, batch_size=self.batch_size)
+        self.counts['prerequisites'] = len(prerequisites)
+
+    # --- links the professors by name, creating the missing ones
+    def import_professors(self):
+        names = {name for course_names in self.professors.values() for name in course_names}
+        with transaction.atomic():
+            professor_ids = self.get_professor_ids(names)
+            missing = names - professor_ids.keys()
+            Professor.objects.bulk_create([Professor(name=name) for name in missing], batch_size=self.batch_size)
+            professor_ids.update(self.get_professor_ids(missing))
+
+            for course_ids_batch in batched(self.professors.keys(), self.batch_size):
+                Professor_to_Course.objects.filter(course_id__in=course_ids_batch).delete()
+            links = [Professor_to_Course(course_id_id=course_id, professor_id_id=professor_ids[name])
+                     for course_id, course_names in self.professors.items() for name in dict.fromkeys(course_names)]
+            Professor_to_Course.objects.bulk_create(links, batch_size=self.batch_size)
+        self.counts['professors'] = len(links)
+
+    # --- returns the id of the professor of each name, the first one if the name is shared
+    def get_professor_ids(self, names):
+        professor_ids = {}
+        for names_batch in batched(names, self.batch_size):
+            for name, professor_id in Professor.objects.filter(name__in=names_batch).order_by('-id').values_list(
+                    'name', 'id'):
+                professor_ids[name] = professor_id
+        return professor_ids
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from homepage.tasks import TASK_BATCH_SIZE, purge_done_tasks, run_due_tasks
+
+
+# the worker running the tasks queued in the database (homepage.tasks), polling for due tasks until it is stopped
+# several workers can run at once, each task is claimed by a single one
+class Command(BaseCommand):
+    help = 'Runs the queued tasks, polling the database for due tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help='stop once no task is due')
+        parser.add_argument('--sleep', type=float, default=1.0, help='seconds between polls when no task is due')
+        parser.add_argument('--batch-size', type=int, default=TASK_BATCH_SIZE)
+        parser.add_argument('--purge-days', type=int, default=7,
+                            help='delete the tasks done more than this many days ago, on start')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be positive')
+        purged = purge_done_tasks(options['purge_days'])
+        if purged:
+            self.stdout.write(f'Purged {purged} done tasks')
+
+        total = 0
+        try:
+            while True:
+                run = run_due_tasks(options['batch_size'])
+                total += run
+                if run:
+                    continue
+                if options['burst']:
+                    break
+                close_old_connections()  # a worker lives long, the connection is renewed like in a request
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} tasks'))
@@ -8,8 +8,8 @@ class Migration(migrations.Migration):
     ]
 
     def generate_user_test_data(apps, schema_editor):
-        from homepage.models import AppUser
-        from django.contrib.auth.models import User
+        AppUser = apps.get_model('homepage', 'AppUser')
+        User = apps.get_model('auth', 'User')
 
         users_test_data = [
             ('testUser1', 'user1@mta.ac.il', 'password123'),
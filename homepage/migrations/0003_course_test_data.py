@@ -8,8 +8,8 @@ class Migration(migrations.Migration):
     ]
 
     def generate_data(apps, schema_editor):
-        from homepage.models import Course
-        from homepage.models import Prerequisites
+        Course = apps.get_model('homepage', 'Course')
+        Prerequisites = apps.get_model('homepage', 'Prerequisites')
 
         test_data_course = [
             (10231, 'UnFogging the Future', True, 4, 'Currently Unavailable', 3.25, 1.5, 12, 12),
@@ -9,9 +9,9 @@ class Migration(migrations.Migration):
     ]
 
     def generate_data(apps, schema_editor):
-        from homepage.models import Course
-        from homepage.models import AppUser
-        from homepage.models import FollowedUserCourses
+        Course = apps.get_model('homepage', 'Course')
+        AppUser = apps.get_model('homepage', 'AppUser')
+        FollowedUserCourses = apps.get_model('homepage', 'FollowedUserCourses')
 
         # testUser1 follows Grammatica in Arithmancy
         # testUser2 follows Numerology & UnFogging the Future
@@ -10,9 +10,9 @@ class Migration(migrations.Migration):
     ]
 
     def generate_data(apps, schema_editor):
-        from homepage.models import Course
-        from homepage.models import Professor
-        from homepage.models import Professor_to_Course
+        Course = apps.get_model('homepage', 'Course')
+        Professor = apps.get_model('homepage', 'Professor')
+        Professor_to_Course = apps.get_model('homepage', 'Professor_to_Course')
 
         professor_test_data = [
             ('Septima Vector'),
@@ -2,6 +2,9 @@ from django.db import migrations, transaction
 IMAGES_DIR = 'images'
 IMAGE_FILE = 'test_image.jpg'
 NEW_IMAGE_FILE = 'new_test_image.jpg'
+# the order of the values in each test data review
+REVIEW_FIELDS = ('id', 'course_id', 'user_id', 'rate', 'date', 'content', 'course_load', 'likes_num', 'professor_id',
+                 'image')
 
 
 class Migration(migrations.Migration):
@@ -14,10 +17,10 @@ class Migration(migrations.Migration):
     ]
 
     def generate_data(apps, schema_editor):
-        from homepage.models import AppUser
-        from homepage.models import Course
-        from homepage.models import Review
-        from homepage.models import Professor
+        AppUser = apps.get_model('homepage', 'AppUser')
+        Course = apps.get_model('homepage', 'Course')
+        Review = apps.get_model('homepage', 'Review')
+        Professor = apps.get_model('homepage', 'Professor')
         from django.core.files.uploadedfile import SimpleUploadedFile
         from os import path
         from django.conf import settings
@@ -60,7 +63,7 @@ class Migration(migrations.Migration):
 
         with transaction.atomic():
             for tdr in test_data_review:
-                Review(*tdr).save()
+                Review(**dict(zip(REVIEW_FIELDS, tdr))).save()
 
     operations = [
         migrations.RunPython(generate_data),
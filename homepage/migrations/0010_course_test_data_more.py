@@ -9,8 +9,8 @@ class Migration(migrations.Migration):
     ]
 
     def generate_data(apps, schema_editor):
-        from homepage.models import Course
-        from homepage.models import Prerequisites
+        Course = apps.get_model('homepage', 'Course')
+        Prerequisites = apps.get_model('homepage', 'Prerequisites')
 
         test_data_course = [
             (10340, 'No Return - through the Lense', True, 4, None),
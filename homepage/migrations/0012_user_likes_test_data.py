@@ -12,9 +12,9 @@ class Migration(migrations.Migration):
     ]
 
     def generate_data(apps, schema_editor):
-        from homepage.models import UserLikes
-        from homepage.models import Review
-        from homepage.models import User
+        UserLikes = apps.get_model('homepage', 'UserLikes')
+        Review = apps.get_model('homepage', 'Review')
+        User = apps.get_model('auth', 'User')
 
         likes_test_data = [
             (User.objects.get(pk=1), Review.objects.get(pk=1)),
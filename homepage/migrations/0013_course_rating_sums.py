@@ -0,0 +1,46 @@
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0012_user_likes_test_data'),
+    ]
+
+    # sets the rating and load sums of every course from its Review rows
+    # courses whose raters are not all backed by Review rows (seeded aggregates) get the totals implied
+    # by their stored averages instead, so their averages stay the same
+    def backfill_sums(apps, schema_editor):
+        Course = apps.get_model('homepage', 'Course')
+
+        courses = Course.objects.annotate(
+            num_of_reviews=Count('review'),
+            reviews_rating_sum=Sum('review__rate'),
+            reviews_load_sum=Sum('review__course_load'))
+
+        for course in courses:
+            if course.num_of_raters == 0:
+                continue
+            if course.num_of_reviews == course.num_of_raters:
+                course.rating_sum = course.reviews_rating_sum
+                course.load_sum = course.reviews_load_sum
+            else:
+                course.rating_sum = round(course.avg_rating * course.num_of_raters)
+                course.load_sum = round(course.avg_load * course.num_of_raters)
+            course.save(update_fields=['rating_sum', 'load_sum'])
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='load_sum',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.RunPython(backfill_sums, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0013_course_rating_sums'),
+    ]
+
+    # removes duplicate likes of the same review by the same user, keeping the first one,
+    # and takes the removed likes off the likes number of the review
+    def remove_duplicate_likes(apps, schema_editor):
+        UserLikes = apps.get_model('homepage', 'UserLikes')
+        Review = apps.get_model('homepage', 'Review')
+
+        duplicates = (UserLikes.objects.values('user_id', 'review_id')
+                      .annotate(first_id=Min('id'), likes=Count('id'))
+                      .filter(likes__gt=1))
+
+        for duplicate in duplicates:
+            UserLikes.objects.filter(user_id=duplicate['user_id'], review_id=duplicate['review_id']) \
+                .exclude(id=duplicate['first_id']).delete()
+            Review.objects.filter(pk=duplicate['review_id']).update(
+                likes_num=F('likes_num') - (duplicate['likes'] - 1))
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userlikes',
+            constraint=models.UniqueConstraint(fields=('user_id', 'review_id'), name='unique_user_review_like'),
+        ),
+    ]
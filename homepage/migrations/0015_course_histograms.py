@@ -0,0 +1,91 @@
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0014_user_likes_unique'),
+    ]
+
+    # counts the ratings and loads of every course from its Review rows, and adds its raters which have no Review
+    # row (seeded aggregates) from the same figures as the sums of 0013: their share of the sum is spread over them
+    # as evenly as the values 1 to 5 allow, so the counts add up to the number of raters and the counted values to
+    # the sum, and the medians and distributions agree with the averages
+    def backfill_histograms(apps, schema_editor):
+        Course = apps.get_model('homepage', 'Course')
+
+        courses = Course.objects.annotate(num_of_reviews=Count('review'))
+        for course in courses:
+            seeded_raters = course.num_of_raters - course.num_of_reviews
+            for field, prefix, total in (('rate', 'rating_count_', course.rating_sum),
+                                         ('course_load', 'load_count_', course.load_sum)):
+                counts = dict.fromkeys(range(1, 6), 0)
+                for bucket in course.review_set.values(field).annotate(count=Count('id')):
+                    counts[bucket[field]] = bucket['count']
+                if seeded_raters > 0:
+                    seeded_total = total - sum(value * count for value, count in counts.items())
+                    seeded_total = min(max(seeded_total, seeded_raters), 5 * seeded_raters)
+                    value, higher = divmod(seeded_total, seeded_raters)
+                    counts[value] += seeded_raters - higher
+                    if higher:
+                        counts[value + 1] += higher
+                for value, count in counts.items():
+                    setattr(course, f'{prefix}{value}', count)
+            course.save(update_fields=[f'{prefix}{value}' for prefix in ('rating_count_', 'load_count_')
+                                       for value in range(1, 6)])
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_count_1',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count_2',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count_3',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count_4',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count_5',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='load_count_1',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='load_count_2',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='load_count_3',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='load_count_4',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='load_count_5',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.RunPython(backfill_histograms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0015_course_histograms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlikes',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0016_userlikes_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
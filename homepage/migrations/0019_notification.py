@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0018_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('read', models.BooleanField(default=False)),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='homepage.review')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='homepage.appuser')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-date', '-id'], name='notification_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read'], name='notification_unread_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('user', 'review'), name='unique_user_review_notification'),
+        ),
+    ]
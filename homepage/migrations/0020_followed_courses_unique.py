@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0019_notification'),
+    ]
+
+    # removes duplicate follows of the same course by the same user, keeping the first one
+    def remove_duplicate_follows(apps, schema_editor):
+        FollowedUserCourses = apps.get_model('homepage', 'FollowedUserCourses')
+
+        duplicates = (FollowedUserCourses.objects.values('user_id', 'course_id')
+                      .annotate(first_id=Min('id'), follows=Count('id'))
+                      .filter(follows__gt=1))
+
+        for duplicate in duplicates:
+            FollowedUserCourses.objects.filter(user_id=duplicate['user_id'], course_id=duplicate['course_id']) \
+                .exclude(id=duplicate['first_id']).delete()
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='followedusercourses',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_user_course_follow'),
+        ),
+    ]
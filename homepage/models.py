@@ -1,9 +1,20 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Exists, OuterRef, Q, F, FloatField, DecimalField
+from django.db.models.functions import Cast
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.contrib.auth.models import User
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from itertools import accumulate
+import json
+
+
+REVIEWS_PAGE_SIZE = 10  # number of review cards in a single feed page
+NOTIFICATIONS_PAGE_SIZE = 20  # number of notifications in a single inbox page
+RATING_VALUES = range(1, 6)  # the values a rating or a course load can get
 
 
 class Course(models.Model):
@@ -25,6 +36,40 @@ class Course(models.Model):
                                         default=0)  # number of raters for course rating and course load
     num_of_reviewers = models.IntegerField(validators=[MinValueValidator(0)],
                                            default=0)  # number of reviewers
+    rating_sum = models.IntegerField(validators=[MinValueValidator(0)],
+                                     default=0)  # sum of all the ratings, the source of avg_rating
+    load_sum = models.IntegerField(validators=[MinValueValidator(0)],
+                                   default=0)  # sum of all the course loads, the source of avg_load
+    rating_count_1 = models.IntegerField(validators=[MinValueValidator(0)],
+                                         default=0)  # number of raters who rated the course 1
+    rating_count_2 = models.IntegerField(validators=[MinValueValidator(0)],
+                                         default=0)  # number of raters who rated the course 2
+    rating_count_3 = models.IntegerField(validators=[MinValueValidator(0)],
+                                         default=0)  # number of raters who rated the course 3
+    rating_count_4 = models.IntegerField(validators=[MinValueValidator(0)],
+                                         default=0)  # number of raters who rated the course 4
+    rating_count_5 = models.IntegerField(validators=[MinValueValidator(0)],
+                                         default=0)  # number of raters who rated the course 5
+    load_count_1 = models.IntegerField(validators=[MinValueValidator(0)],
+                                       default=0)  # number of raters who rated the course load 1
+    load_count_2 = models.IntegerField(validators=[MinValueValidator(0)],
+                                       default=0)  # number of raters who rated the course load 2
+    load_count_3 = models.IntegerField(validators=[MinValueValidator(0)],
+                                       default=0)  # number of raters who rated the course load 3
+    load_count_4 = models.IntegerField(validators=[MinValueValidator(0)],
+                                       default=0)  # number of raters who rated the course load 4
+    load_count_5 = models.IntegerField(validators=[MinValueValidator(0)],
+                                       default=0)  # number of raters who rated the course load 5
+
+    class Meta:
+        # the sortings of the courses page, which read the courses in the order of the index instead of sorting them
+        indexes = [
+            models.Index(fields=['name'], name='course_name_idx'),
+            models.Index(fields=['-avg_rating'], name='course_rating_idx'),
+            models.Index(fields=['avg_load'], name='course_load_idx'),
+            models.Index(fields=['-num_of_reviewers'], name='course_reviewers_idx'),
+            models.Index(fields=['-num_of_raters'], name='course_raters_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -57,29 +102,69 @@ class Course(models.Model):
         super().save(*args, **kwargs)
 
     # updates the course according to review output
+    # all counters are incremented by a single UPDATE statement, so concurrent reviews are never lost,
+    # and the averages are recomputed from the exact integer sums rather than from the rounded averages
     def update_course_per_review(self, reviewer_rating, reviewer_load, has_content):
-        curr_raters = self.num_of_raters
-        curr_reviewers = self.num_of_reviewers
-        curr_avg_load = self.avg_load
-        curr_avg_rating = self.avg_rating
-        if curr_avg_load is None:
-            self.avg_load = reviewer_load
-            self.avg_rating = reviewer_rating
-            self.num_of_raters = 1
-        else:
-            total_rating = curr_avg_rating * curr_raters
-            total_rating += reviewer_rating
-            total_load = curr_avg_load * curr_raters
-            total_load += reviewer_load
+        Course.objects.filter(pk=self.pk).update(
+            rating_sum=F('rating_sum') + reviewer_rating,
+            load_sum=F('load_sum') + reviewer_load,
+            num_of_raters=F('num_of_raters') + 1,
+            num_of_reviewers=F('num_of_reviewers') + (1 if has_content else 0),
+            avg_rating=Course.average_after_rating('rating_sum', reviewer_rating),
+            avg_load=Course.average_after_rating('load_sum', reviewer_load),
+            **{f'rating_count_{reviewer_rating}': F(f'rating_count_{reviewer_rating}') + 1,
+               f'load_count_{reviewer_load}': F(f'load_count_{reviewer_load}') + 1})
+        self.refresh_from_db()
+
+    # --- the average of the 'sum_field' sum after adding 'value' to it by one more rater
+    @staticmethod
+    def average_after_rating(sum_field, value):
+        average = Cast(F(sum_field) + value, FloatField()) / Cast(F('num_of_raters') + 1, FloatField())
+        return Cast(average, DecimalField(max_digits=6, decimal_places=5))
+
+    # --- rating and load histograms: the number of raters who gave each of the values 1 to 5
+    def rating_histogram(self):
+        return [getattr(self, f'rating_count_{value}') for value in RATING_VALUES]
 
-            self.num_of_raters = curr_raters + 1
-            self.avg_rating = total_rating / self.num_of_raters
-            self.avg_load = total_load / self.num_of_raters
+    def load_histogram(self):
+        return [getattr(self, f'load_count_{value}') for value in RATING_VALUES]
 
-        if has_content:
-            self.num_of_reviewers = curr_reviewers + 1
+    def rating_distribution(self):
+        return Course.histogram_distribution(self.rating_histogram())
 
-        self.save(update_fields=['avg_load', 'avg_rating', 'num_of_raters', 'num_of_reviewers'])
+    def load_distribution(self):
+        return Course.histogram_distribution(self.load_histogram())
+
+    def rating_median(self):
+        return Course.histogram_median(self.rating_histogram())
+
+    def load_median(self):
+        return Course.histogram_median(self.load_histogram())
+
+    # --- returns a dict of the value, count and percentage of raters for each histogram bucket
+    @staticmethod
+    def histogram_distribution(histogram):
+        total = sum(histogram)
+        return [{'value': value, 'count': count, 'percent': round(100 * count / total) if total else 0}
+                for value, count in zip(RATING_VALUES, histogram)]
+
+    # --- returns the median value of the histogram (the mean of the two middle values for an even count),
+    # or None if it is empty
+    @staticmethod
+    def histogram_median(histogram):
+        total = sum(histogram)
+        if total == 0:
+            return None
+        lower = Course.histogram_value_at(histogram, (total - 1) // 2)
+        upper = Course.histogram_value_at(histogram, total // 2)
+        return (lower + upper) / 2
+
+    # --- returns the value at 'position' of the values counted by the histogram, in ascending order
+    @staticmethod
+    def histogram_value_at(histogram, position):
+        for value, seen in zip(RATING_VALUES, accumulate(histogram)):
+            if position < seen:
+                return value
 
     def print_details(self):
         mandatory = 'yes' if self.mandatory else 'no'
@@ -103,10 +188,28 @@ class Course(models.Model):
     def has_preqs(self):
         return Prerequisites.does_course_have_prerequisites(self)
 
-    # --- returns all Course objects - the main 'courses' source for the view
+    # --- returns all Course objects - the main 'courses' source for the view, by their identifiers unless sorted
+    # each course is annotated with 'preqs_exist', so listing prerequisites state costs no extra queries
     @staticmethod
     def get_courses():
-        return Course.objects.all()
+        return Course.annotate_preqs(Course.objects.order_by('course_id'))
+
+    @staticmethod
+    def annotate_preqs(courses):
+        return courses.annotate(preqs_exist=Exists(Course.preqs_subquery()))
+
+    # --- correlated EXISTS subquery on the prerequisites of the outer course
+    @staticmethod
+    def preqs_subquery():
+        return Prerequisites.objects.filter(course_id=OuterRef('pk'))
+
+    # --- compiles the filter and sort form values into a single queryset
+    # returns the result with the active filters and sorting descriptions
+    @staticmethod
+    def get_filtered_and_sorted_courses(filters, sort_val):
+        sort_result = Course.get_sorted_courses(Course.get_courses(), sort_val)
+        filter_result = Course.get_filtered_courses(sort_result['result'], filters)
+        return {'result': filter_result['result'], 'filters': filter_result['active'], 'sort': sort_result['active']}
 
     # --- filters 'curr_courses' and returns the result according to 'filters'
     @staticmethod
@@ -187,22 +290,20 @@ class Course(models.Model):
     @staticmethod
     def get_courses_with_preqs(courses):
         # gets all courses that have prerequisites
-        have_preqs = Course.get_courses_with_preqs_ids(courses)
-        return courses.filter(course_id__in=have_preqs)
+        return courses.filter(Exists(Course.preqs_subquery()))
 
     @staticmethod
     def get_courses_with_preqs_ids(courses):
-        return [course.course_id for course in courses if course.has_preqs()]
+        return list(Course.get_courses_with_preqs(courses).values_list('course_id', flat=True))
 
     @staticmethod
     def get_courses_without_preqs(courses):
         # gets all courses that don't have prerequisites
-        no_preqs = Course.get_courses_without_preqs_ids(courses)
-        return courses.filter(course_id__in=no_preqs)
+        return courses.filter(~Exists(Course.preqs_subquery()))
 
     @staticmethod
     def get_courses_without_preqs_ids(courses):
-        return [course.course_id for course in courses if not course.has_preqs()]
+        return list(Course.get_courses_without_preqs(courses).values_list('course_id', flat=True))
 
     @staticmethod
     def get_courses_with_ratings(courses, num_of_ratings):
@@ -233,6 +334,65 @@ class Course(models.Model):
     def sort_by_num_raters(courses):
         return courses.order_by('-num_of_raters')
 
+    # --- keyset pagination over a course list sorted by one of the sortings above, like the review feeds
+    # returns the next 'page_size' courses after 'cursor' and the cursor of the following page (None if last page)
+    # the primary key breaks the ties of the sort, and a null average sorts below any value, as in the indexes
+    # of SQLite, so every page is read from the index of its sorting and costs the same
+    @staticmethod
+    def get_courses_page(courses, page_size, cursor=None):
+        name = Course.sort_field(courses)
+        descending = courses.query.order_by[0].startswith('-')
+        field = Course._meta.get_field(name)
+        courses = courses.order_by(F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_first=True), 'pk')
+        isnull = f'{name}__isnull'
+        # the rest of the list after the position: the rest of its segment (the null or the valued averages),
+        # then the following segment, each scanned by a single range of the index
+        position = Course.decode_cursor(cursor, name)
+        if position is None:
+            segments = [courses]
+        elif position[0] is None:
+            segments = [courses.filter(**{isnull: True, 'pk__gt': position[1]})]
+            if not descending:
+                segments.append(courses.filter(**{isnull: False}))
+        else:
+            value, pk = position
+            segments = [courses.filter(Q(**{f'{name}__{"lt" if descending else "gt"}': value}) |
+                                       Q(**{name: value, 'pk__gt': pk}))]
+            if descending and field.null:
+                segments.append(courses.filter(**{isnull: True}))
+        page_courses = []
+        for segment in segments:
+            page_courses += segment[:page_size + 1 - len(page_courses)]
+            if len(page_courses) > page_size:
+                break
+        next_cursor = Course.encode_cursor(page_courses[page_size - 1], name) if len(page_courses) > page_size else None
+        return {'courses': page_courses[:page_size], 'next_cursor': next_cursor}
+
+    # --- the name of the field 'courses' are sorted by
+    @staticmethod
+    def sort_field(courses):
+        return courses.query.order_by[0].lstrip('-')
+
+    @staticmethod
+    def encode_cursor(course, name):
+        value = getattr(course, name)
+        position = json.dumps([name, None if value is None else str(value), course.pk])
+        return urlsafe_b64encode(position.encode()).decode()
+
+    # returns the (value, primary key) position encoded in 'cursor' for the sorting by 'name',
+    # or None if it is missing, malformed or of another sorting
+    @staticmethod
+    def decode_cursor(cursor, name):
+        if not cursor:
+            return None
+        try:
+            cursor_name, value, pk = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+            if cursor_name != name or not isinstance(pk, int) or not isinstance(value, (str, type(None))):
+                return None
+            return Course._meta.get_field(name).to_python(value), pk
+        except (ValueError, TypeError, ValidationError):
+            return None
+
     # --- search methods:
     @staticmethod
     def get_courses_ordered_by_name(name):
@@ -313,28 +473,45 @@ class FollowedUserCourses(models.Model):
     user = models.ForeignKey(AppUser, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_user_course_follow'),
+        ]
+
     def __str__(self):
         return f'user = {self.user}, course = {self.course}'
 
     @staticmethod
     def get_courses_followed_by_app_user(app_user):
-        pairs = FollowedUserCourses.objects.filter(user=app_user)
+        pairs = FollowedUserCourses.objects.filter(user=app_user).select_related('course')
         # get only 'course' elements from user_course_pair elements
         return [user_course_pair.course for user_course_pair in pairs]
 
+    # the app user of a django user has the same primary key, so 'user' is used without loading its app user
     @classmethod
     def is_following_course(cls, user, course):
-        return course in cls.get_courses_followed_by_app_user(user.appuser)
+        return cls.objects.filter(user_id=user.pk, course=course).exists()
 
+    # returns the set of the ids of the courses in 'course_ids' followed by 'user', or of all the courses it follows
+    @classmethod
+    def get_followed_course_ids(cls, user, course_ids=None):
+        follows = cls.objects.filter(user_id=user.pk)
+        if course_ids is not None:
+            follows = follows.filter(course_id__in=list(course_ids))
+        return set(follows.values_list('course_id', flat=True))
+
+    # following a followed course (or unfollowing a course which isn't followed) changes nothing - the unique
+    # constraint ignores a concurrent duplicate follow
     @classmethod
     def follow_course(cls, user, course):
-        if not cls.is_following_course(user, course):
-            cls(user=user.appuser, course=course).save()
+        cls.objects.bulk_create([cls(user_id=user.pk, course=course)], ignore_conflicts=True)
 
+    # returns the ids of the deleted follows (none when the course wasn't followed), which key the tasks of the unfollow
     @classmethod
     def unfollow_course(cls, user, course):
-        if cls.is_following_course(user, course):
-            cls.objects.filter(user=user.appuser, course=course).delete()
+        follow_ids = list(cls.objects.filter(user_id=user.pk, course=course).values_list('pk', flat=True))
+        cls.objects.filter(pk__in=follow_ids).delete()
+        return follow_ids
 
 
 class Professor(models.Model):
@@ -377,6 +554,19 @@ class Review(models.Model):
     likes_num = models.SmallIntegerField(default=0)
     professor = models.ForeignKey(Professor, on_delete=models.CASCADE, null=True, blank=True)
     image = models.ImageField(null=True, blank=True, upload_to="images/")
+    # the resized copies of the image made by homepage.thumbnails once it is uploaded, as
+    # {'source': <name of the image>, 'variants': {<variant>: {'width', 'height', 'jpeg', 'webp'}}}
+    image_variants = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        # the access paths of the feeds - the main feed, a course feed and the feed of a user, all newest first -
+        # and of the most liked reviews of a course; each is read from its index in order, without a sort
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='review_feed_idx'),
+            models.Index(fields=['course', '-date', '-id'], name='review_course_feed_idx'),
+            models.Index(fields=['user', '-date', '-id'], name='review_user_feed_idx'),
+            models.Index(fields=['course', '-likes_num'], name='review_course_likes_idx'),
+        ]
 
     def __str__(self):
         MAX_WORDS_PREVIEW = 5
@@ -400,61 +590,214 @@ class Review(models.Model):
 
         print(message)
 
+    # --- returns the sizes and URLs of the variants of the image by variant name ('small', 'large')
+    # empty until the variants of the current image are made, so a page never falls back to the full-size upload
+    @property
+    def thumbnails(self):
+        if not self.image or self.image_variants.get('source') != self.image.name:
+            return {}
+        storage = self.image.storage
+        return {name: {'width': variant['width'], 'height': variant['height'],
+                       'jpeg': storage.url(variant['jpeg']), 'webp': storage.url(variant['webp'])}
+                for name, variant in self.image_variants['variants'].items()}
+
     @classmethod
     def main_feed(cls):
-        return cls.objects.order_by('-date')
+        return cls.with_card_relations(cls.objects.order_by('-date', '-id'))
+
+    @classmethod
+    def course_feed(cls, course):
+        return cls.with_card_relations(cls.objects.filter(course=course).order_by('-date', '-id'))
+
+    # --- keyset pagination over a feed ordered by ('-date', '-id')
+    # returns the next 'page_size' reviews after 'cursor' and the cursor of the following page (None if last page)
+    # the feed is filtered past the cursor instead of using OFFSET, so every page costs the same
+    @staticmethod
+    def get_feed_page(feed, cursor=None, page_size=REVIEWS_PAGE_SIZE):
+        position = Review.decode_cursor(cursor)
+        if position is not None:
+            date, id = position
+            feed = feed.filter(Q(date__lt=date) | Q(date=date, id__lt=id))
+        reviews = list(feed[:page_size + 1])
+        next_cursor = Review.encode_cursor(reviews[page_size - 1]) if len(reviews) > page_size else None
+        return {'reviews': reviews[:page_size], 'next_cursor': next_cursor}
+
+    @staticmethod
+    def encode_cursor(review):
+        position = f'{review.date.isoformat()}|{review.id}'
+        return urlsafe_b64encode(position.encode()).decode()
+
+    # returns the (date, id) position encoded in 'cursor', or None if it is missing or malformed
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            date, id = urlsafe_b64decode(cursor.encode()).decode().split('|')
+            date = parse_datetime(date)
+            id = int(id)
+        except ValueError:
+            return None
+        if date is None:
+            return None
+        return date, id
 
     @classmethod
     def landing_page_feed(cls):
-        return cls.objects.all().order_by('-date')[:3]
+        return cls.with_card_relations(cls.objects.all().order_by('-date'))[:3]
 
     @classmethod
     def profile_page_feed(cls, user):
         try:
             app_user = user.appuser
-            return cls.objects.filter(user=app_user).order_by('-date')[:3]
+            return cls.with_card_relations(cls.objects.filter(user=app_user).order_by('-date'))[:3]
         except ObjectDoesNotExist:
             return None
 
+    # --- joins every relation a review card displays (author, course and professor)
+    @staticmethod
+    def with_card_relations(reviews):
+        return reviews.select_related('user__user', 'course', 'professor')
+
+    # --- evaluates 'reviews' and sets 'is_liked' on each review according to the likes of 'user'
+    # the likes of all the reviews are fetched with a single query
+    @staticmethod
+    def load_feed(reviews, user=None):
+        reviews = list(reviews)
+        liked_ids = set()
+        if user is not None and user.is_authenticated:
+            liked_ids = UserLikes.get_liked_review_ids_by_user(user, reviews)
+        for review in reviews:
+            review.is_liked = review.id in liked_ids
+        return reviews
+
     @staticmethod
     def user_already_posted_review(user_id, course_id):
         return True if Review.objects.filter(user=user_id, course=course_id) else False
 
+    # likes_num is changed by the database (not from the value read into this instance), so concurrent likes add up
     def add_like(self):
-        self.likes_num += 1
-        self.save(update_fields=['likes_num'])
+        self.change_likes_num(1)
 
     def remove_like(self):
-        self.likes_num -= 1
-        self.save(update_fields=['likes_num'])
+        self.change_likes_num(-1)
+
+    def change_likes_num(self, amount):
+        Review.objects.filter(pk=self.pk).update(likes_num=F('likes_num') + amount)
+        self.refresh_from_db(fields=['likes_num'])
 
 
 class UserLikes(models.Model):
     user_id = models.ForeignKey(User, on_delete=models.CASCADE)
     review_id = models.ForeignKey(Review, on_delete=models.CASCADE)
+    date = models.DateTimeField(default=timezone.now)  # when the like was given, for incremental exports
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'review_id'], name='unique_user_review_like'),
+        ]
 
     @staticmethod  # returns a list of Review objects
     def get_liked_reviews_by_user(user):
-        user_likes_list = UserLikes.objects.filter(user_id=user)
+        user_likes_list = UserLikes.objects.filter(user_id=user).select_related('review_id')
         return [arg.review_id for arg in user_likes_list]
 
     @staticmethod  # returns a list of Review objects
     def get_liked_reviews_by_user_for_course(user, course):
-        user_likes_list = UserLikes.objects.filter(user_id=user)
-        return [arg.review_id for arg in user_likes_list if arg.review_id.course == course]
+        user_likes_list = UserLikes.objects.filter(user_id=user, review_id__course=course).select_related('review_id')
+        return [arg.review_id for arg in user_likes_list]
+
+    @staticmethod  # returns a set of the ids of the reviews in 'reviews' liked by 'user'
+    def get_liked_review_ids_by_user(user, reviews):
+        user_likes_list = UserLikes.objects.filter(user_id=user, review_id__in=[review.id for review in reviews])
+        return set(user_likes_list.values_list('review_id', flat=True))
 
     @staticmethod  # returns a list of User objects
     def get_users_who_liked_review(review):
         user_likes_list = UserLikes.objects.filter(review_id=review)
         return [arg.user_id for arg in user_likes_list]
 
+    # likes 'review' if 'user' doesn't like it yet, otherwise removes the like
+    # the like row is deleted or inserted conditionally, and the unique constraint rejects a concurrent duplicate
+    # like, which then changes nothing - so the likes and likes_num always agree
     @staticmethod
     def toggle_like(user, review):
-        user_like = UserLikes.objects.filter(user_id=user, review_id=review)
-        if user_like:
-            user_like.delete()
-            review.remove_like()
-        else:
-            user_like = UserLikes(user_id=user, review_id=review)
-            user_like.save()
+        with transaction.atomic():
+            deleted, _ = UserLikes.objects.filter(user_id=user, review_id=review).delete()
+            if deleted:
+                review.change_likes_num(-deleted)
+                return
+            try:
+                with transaction.atomic():
+                    UserLikes.objects.create(user_id=user, review_id=review)
+            except IntegrityError:
+                review.refresh_from_db(fields=['likes_num'])
+                return
             review.add_like()
+
+
+# a notification to a follower of a course about a new review of it, written by homepage.notifications
+class Notification(models.Model):
+    user = models.ForeignKey(AppUser, on_delete=models.CASCADE)
+    review = models.ForeignKey(Review, on_delete=models.CASCADE)
+    date = models.DateTimeField(default=timezone.now)
+    read = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            # a retried fan-out doesn't notify twice
+            models.UniqueConstraint(fields=['user', 'review'], name='unique_user_review_notification'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='notification_inbox_idx'),
+            models.Index(fields=['user', 'read'], name='notification_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f'user = {self.user}, review = {self.review_id}, read = {self.read}'
+
+    # --- a page of the inbox of the user 'user_id', newest first, paginated by (date, id) like the review feeds
+    @staticmethod
+    def get_inbox_page(user_id, cursor=None, page_size=NOTIFICATIONS_PAGE_SIZE):
+        inbox = Notification.objects.filter(user_id=user_id).select_related('review__course', 'review__user__user')
+        return Review.get_feed_page(inbox.order_by('-date', '-id'), cursor, page_size)
+
+    @staticmethod
+    def count_unread(user_id):
+        return Notification.objects.filter(user_id=user_id, read=False).count()
+
+    @staticmethod
+    def mark_all_read(user_id):
+        return Notification.objects.filter(user_id=user_id, read=False).update(read=True)
+
+
+# a unit of deferred work, run by the 'run_tasks' worker command (see homepage.tasks)
+# the row is written in the transaction of the change that needs the work, so the work is never lost or run for a
+# change that was rolled back; 'idempotency_key' makes enqueueing the same work twice add a single task
+class Task(models.Model):
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # not run before, moved later by the retries
+    locked_at = models.DateTimeField(null=True, blank=True)  # when a worker claimed it
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}({self.payload}) - {self.status}'
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from homepage.models import FollowedUserCourses, Notification, Review
+from homepage.tasks import enqueue, task
+
+
+# the unread counts are kept in the cache, so the badge of the navigation bar costs no query; a count is updated
+# in place by the fan-out and reset when the inbox is read, and expires after this many seconds, which bounds any drift
+# the fan-out runs in the run_tasks worker, so the cache has to be shared with it (see homepage.checks)
+UNREAD_COUNT_TIMEOUT = getattr(settings, 'NOTIFICATIONS_UNREAD_COUNT_TIMEOUT', 3600)
+
+
+def unread_count_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+# --- the number of unread notifications of the user 'user_id', counted only when it isn't cached
+def get_unread_count(user_id):
+    key = unread_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.count_unread(user_id)
+        cache.set(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+# --- adds a notification to the cached counts of 'user_ids', the users with no cached count are counted when needed
+def add_unread(user_ids):
+    for user_id in user_ids:
+        try:
+            cache.incr(unread_count_key(user_id))
+        except ValueError:
+            pass
+
+
+def mark_all_read(user_id):
+    Notification.mark_all_read(user_id)
+    transaction.on_commit(lambda: cache.set(unread_count_key(user_id), 0, UNREAD_COUNT_TIMEOUT))
+
+
+# writes a notification to every follower of the course of a new review (but its author) with a single bulk insert
+@task
+def notify_followers(review_id):
+    review = Review.objects.filter(pk=review_id).values('course_id', 'user_id').first()
+    if review is None:
+        return  # deleted since
+    follower_ids = list(FollowedUserCourses.objects.filter(course_id=review['course_id'])
+                        .exclude(user_id=review['user_id']).values_list('user_id', flat=True).distinct())
+    Notification.objects.bulk_create([Notification(user_id=user_id, review_id=review_id) for user_id in follower_ids],
+                                     ignore_conflicts=True)
+    transaction.on_commit(lambda: add_unread(follower_ids))
+
+
+# marks the unread notifications of a course its follower unfollowed read, so they no longer count on the badge
+@task
+def forget_course_notifications(user_id, course_id):
+    Notification.objects.filter(user_id=user_id, review__course_id=course_id, read=False).update(read=True)
+    transaction.on_commit(lambda: cache.delete(unread_count_key(user_id)))
+
+
+# the fan-out is queued in the transaction creating the review, so posting a review costs a single insert for it
+@receiver(post_save, sender=Review)
+def enqueue_follower_notifications(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue('notify_followers', key=f'notify_followers:{instance.pk}', review_id=instance.pk)
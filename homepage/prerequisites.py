@@ -0,0 +1,163 @@
+from threading import Lock
+
+from homepage import caching
+from homepage.models import Prerequisites
+
+
+# the requirement codes that get a graph of their own, a NONE row only counts as a listed prerequisite
+GRAPH_REQ_CODES = (Prerequisites.Req_Code.BEFORE, Prerequisites.Req_Code.SIMU, Prerequisites.Req_Code.CANT)
+
+
+# --- returns the strongly connected components of the graph (Tarjan's algorithm, without recursion)
+# every component comes after all the components it has edges to, and its nodes are sorted
+def strongly_connected_components(nodes, edges):
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(edges.get(root, ())))]
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = low[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(edges.get(successor, ()))))
+                    break
+                if successor in on_stack:
+                    low[node] = min(low[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(tuple(sorted(component)))
+    return components
+
+
+# --- returns the set of nodes reachable from every node, given components ordered as above
+# the nodes of a component share a single frozenset, so a cycle is stored once
+def transitive_closure(components, edges):
+    closure = {}
+    for component in components:
+        reachable = set()
+        for node in component:
+            for successor in edges.get(node, ()):
+                reachable.add(successor)
+                reachable.update(closure.get(successor, ()))
+        reachable = frozenset(reachable)
+        for node in component:
+            closure[node] = reachable
+    return closure
+
+
+# the courses related by a single requirement code, an edge goes from a course to a course it requires
+class RequirementGraph:
+
+    def __init__(self, edges):
+        self.requires = {}  # course_id -> the ids of the courses it directly requires
+        self.required_by = {}  # course_id -> the ids of the courses directly requiring it
+        for course_id, req_course_id in edges:
+            self.requires.setdefault(course_id, set()).add(req_course_id)
+            self.required_by.setdefault(req_course_id, set()).add(course_id)
+        nodes = sorted(self.requires.keys() | self.required_by.keys())
+
+        components = strongly_connected_components(nodes, self.requires)
+        self.chains = transitive_closure(components, self.requires)
+        self.unlocked = transitive_closure(reversed(components), self.required_by)
+        # the required courses come first, the courses of a cycle are kept next to each other
+        self.order = tuple(course_id for component in components for course_id in component)
+        self.position = {course_id: position for position, course_id in enumerate(self.order)}
+        self.cycles = tuple(component for component in components
+                            if len(component) > 1 or component[0] in self.requires.get(component[0], ()))
+
+
+# in-memory graph of all the prerequisites, with a graph per requirement code
+# the transitive closures, topological orders and cycles are computed once when the graph loads,
+# so the queries cost a dictionary lookup
+# the graph loads lazily from the database in a single query, and loads again once the view cache version of
+# 'scopes' (the prerequisites) changed, whichever process changed them - a graph without 'scopes' is loaded once
+class PrerequisiteGraph:
+
+    def __init__(self, scopes=None):
+        self.scopes = scopes
+        self.lock = Lock()
+        self.reset()
+
+    # --- drops the graph, the next query reloads it from the database
+    def reset(self):
+        with self.lock:
+            self.loaded = False
+            self.version = None  # the version of the prerequisites the graph was loaded at
+            self.direct = {}  # course_id -> tuple of (req_course_id, req_code) of its prerequisites rows
+            self.graphs = {}  # req_code -> RequirementGraph
+
+    def load(self):
+        version = caching.get_versions(self.scopes) if self.scopes else None
+        with self.lock:
+            if self.loaded and self.version == version:
+                return
+            direct = {}
+            edges = {req_code: [] for req_code in GRAPH_REQ_CODES}
+            rows = Prerequisites.objects.order_by('id').values_list('course_id', 'req_course_id', 'req_code')
+            for course_id, req_course_id, req_code in rows:
+                direct.setdefault(course_id, []).append((req_course_id, req_code))
+                if req_code in edges:
+                    edges[req_code].append((course_id, req_course_id))
+            self.direct = {course_id: tuple(preqs) for course_id, preqs in direct.items()}
+            self.graphs = {req_code: RequirementGraph(edges[req_code]) for req_code in GRAPH_REQ_CODES}
+            self.loaded = True
+            self.version = version
+
+    def graph(self, req_code):
+        self.load()
+        return self.graphs[req_code]
+
+    # --- returns the (req_course_id, req_code) pairs of the prerequisites rows of the course
+    def direct_prerequisites(self, course_id):
+        self.load()
+        return self.direct.get(course_id, ())
+
+    def has_prerequisites(self, course_id):
+        self.load()
+        return course_id in self.direct
+
+    # --- returns the ids of all the courses required, directly or not, before taking the course
+    def prerequisite_chain(self, course_id, req_code=Prerequisites.Req_Code.BEFORE):
+        return self.graph(req_code).chains.get(course_id, frozenset())
+
+    # --- returns the ids of all the courses requiring the course, directly or not
+    def unlocks(self, course_id, req_code=Prerequisites.Req_Code.BEFORE):
+        return self.graph(req_code).unlocked.get(course_id, frozenset())
+
+    # --- returns the ids of the related courses, each after all the courses it requires (unless on a cycle)
+    def topological_order(self, req_code=Prerequisites.Req_Code.BEFORE):
+        return self.graph(req_code).order
+
+    # --- returns the given course ids in topological order
+    def sort_topologically(self, course_ids, req_code=Prerequisites.Req_Code.BEFORE):
+        position = self.graph(req_code).position
+        return sorted(course_ids, key=lambda course_id: (position.get(course_id, len(position)), course_id))
+
+    # --- returns the cycles of courses requiring each other, as tuples of course ids
+    def cycles(self, req_code=Prerequisites.Req_Code.BEFORE):
+        return self.graph(req_code).cycles
+
+
+prerequisite_graph = PrerequisiteGraph(scopes=['prerequisites'])
@@ -0,0 +1,119 @@
+from contextvars import ContextVar
+import asyncio
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_DATABASES = getattr(settings, 'REPLICA_DATABASES', [])  # the aliases of the read replicas of the database
+REPLICA_READ_VIEWS = getattr(settings, 'REPLICA_READ_VIEWS', [])  # the names of the views reading from the replicas
+REPLICA_PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 10)  # reads after a write go to the primary this long
+REPLICA_APPS = {'homepage'}  # the sessions and the users are always read from the primary, like after signing in
+PIN_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+# the routing state of a request: whether its reads may go to a replica, and whether it wrote
+# it is changed in place, so the writes of the threads of an async view (which see a copy of the context) count
+class RequestRouting:
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+# sends the reads of the read views to a random replica, and all the rest to the primary (the default database)
+# outside of a request - in the commands and the task worker - everything goes to the primary, as do the reads in a
+# transaction, which must see its own writes, and the reads of a request after it wrote
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if (not REPLICA_DATABASES or routing is None or not routing.use_replica or routing.wrote
+                or model._meta.app_label not in REPLICA_APPS or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    # the replicas hold the same data as the primary, so the objects read from any of them are related freely
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# --- sends the rest of the reads of the current request to the primary when the data it shows was 'modified' (a time)
+# less than REPLICA_PIN_SECONDS ago, as a replica may still lag behind that change - for the views rendering parts
+# cached for every client, which would keep what they read from a lagging replica under the versions after the change
+def read_primary_after(modified):
+    routing = current_routing.get()
+    if routing is not None and time.time() - modified < REPLICA_PIN_SECONDS:
+        routing.use_replica = False
+
+
+# --- whether the reads of 'request' may go to a replica: a read (safe) request of a read view, from a client who
+# didn't write in the last REPLICA_PIN_SECONDS, so a client sees its own review or like at once
+def reads_from_replica(request):
+    match = request.resolver_match
+    if request.method not in SAFE_METHODS or match is None or match.url_name not in REPLICA_READ_VIEWS:
+        return False
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) <= time.time()
+    except ValueError:
+        return True
+
+
+# routes the reads of the read views to the replicas (see ReplicaRouter), and pins the reads of a client to the
+# primary for REPLICA_PIN_SECONDS after a request of theirs wrote, with a cookie holding the end of the pin
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # served as a coroutine, as MiddlewareMixin does
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        routing = RequestRouting()
+        token = current_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.pin_writer(request, response, routing)
+
+    async def __acall__(self, request):
+        routing = RequestRouting()
+        token = current_routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.pin_writer(request, response, routing)
+
+    # the URL is resolved by now, so the view of the request is known
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.use_replica = reads_from_replica(request)
+
+    @staticmethod
+    def pin_writer(request, response, routing):
+        if REPLICA_DATABASES and (routing.wrote or request.method not in SAFE_METHODS):
+            response.set_cookie(PIN_COOKIE, f'{time.time() + REPLICA_PIN_SECONDS:.3f}', max_age=REPLICA_PIN_SECONDS,
+                                samesite='Lax')
+        return response
@@ -0,0 +1,169 @@
+from bisect import bisect_left
+from heapq import nsmallest
+from threading import Lock
+import re
+import time
+
+from django.conf import settings
+
+from homepage import caching
+from homepage.models import Course
+
+
+SEARCH_RESULTS_LIMIT = 10  # default number of results returned by a search
+MIN_WORD_SIMILARITY = 0.4  # minimal trigram similarity for a misspelled word to match
+PREFIX_MATCH_SCORE = 0.9  # score of a query word that is a prefix of a course name word (an exact word scores 1)
+NAME_PREFIX_BONUS = 0.5  # bonus for a course name that starts with the whole query
+COURSE_ID_MATCH_SCORE = 2  # score of a course whose identifier starts with the query
+# seconds between two checks of the catalog version, so a search (a query per keystroke of the autocomplete) doesn't
+# read the cache every time - a changed catalog reaches the index within this delay
+SEARCH_VERSION_CHECK_INTERVAL = getattr(settings, 'SEARCH_VERSION_CHECK_INTERVAL', 1)
+
+
+def normalize_words(text):
+    return re.findall(r'\w+', text.lower())
+
+
+# --- the trigrams of a word, padded like pg_trgm so that short words and word edges count too
+def word_trigrams(word):
+    padded = f'  {word} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+# in-memory ranked search over course names and identifiers
+# course name words are matched exactly, by prefix, or - to tolerate typos - by trigram similarity
+# the trigrams index the vocabulary of name words (not the courses), so a lookup only scores the few words
+# sharing a trigram with the query
+# the index loads lazily from the database, and loads again once the view cache version of 'scopes' (the courses)
+# changed - the versions are in the cache shared by the processes serving the database, so a change made by any of
+# them (a course saved in the admin, or a catalog imported by a command) reaches the index of every process
+# the version is checked at most every SEARCH_VERSION_CHECK_INTERVAL seconds
+# an index without 'scopes' is loaded (or built) once
+class CourseSearchIndex:
+
+    def __init__(self, scopes=None):
+        self.scopes = scopes
+        self.lock = Lock()
+        self.reset()
+
+    # --- drops the indexed courses, the next search reloads them from the database
+    def reset(self):
+        self.loaded = False
+        self.version = None  # the versions of the scopes the courses were loaded at
+        self.checked_at = None  # time.monotonic() of the last check of the versions
+        self.names = {}  # course_id -> course name
+        self.course_words = {}  # course_id -> the normalized words of the course name
+        self.word_courses = {}  # word -> set of the ids of the courses whose names contain it
+        self.sorted_words = []  # the vocabulary, sorted for prefix lookups
+        self.trigram_words = {}  # trigram -> set of the words containing it
+        self.word_trigrams_num = {}  # word -> number of trigrams of the word
+        self.sorted_ids = []  # the course ids as strings, sorted for prefix lookups
+
+    def load(self):
+        now = time.monotonic()
+        recently_checked = self.checked_at is not None and now - self.checked_at < SEARCH_VERSION_CHECK_INTERVAL
+        if self.loaded and (not self.scopes or recently_checked):
+            return
+        version = caching.get_versions(self.scopes) if self.scopes else None
+        with self.lock:
+            if not (self.loaded and self.version == version):
+                self._build(Course.objects.values_list('course_id', 'name'))
+                self.version = version
+            self.checked_at = now
+
+    # --- builds the index from (course_id, name) pairs
+    def build(self, courses):
+        with self.lock:
+            self._build(courses)
+
+    def _build(self, courses):
+        self.reset()
+        for course_id, name in courses:
+            self._add(course_id, name)
+        self.loaded = True
+
+    def _add(self, course_id, name):
+        words = tuple(normalize_words(name))
+        self.names[course_id] = name
+        self.course_words[course_id] = words
+        for word in set(words):
+            if word not in self.word_courses:
+                self.word_courses[word] = set()
+                self.sorted_words.insert(bisect_left(self.sorted_words, word), word)
+                trigrams = word_trigrams(word)
+                self.word_trigrams_num[word] = len(trigrams)
+                for trigram in trigrams:
+                    self.trigram_words.setdefault(trigram, set()).add(word)
+            self.word_courses[word].add(course_id)
+        id_string = str(course_id)
+        self.sorted_ids.insert(bisect_left(self.sorted_ids, id_string), id_string)
+
+    # --- returns the scores of the vocabulary words matching 'query_word' exactly, by prefix or by similarity
+    def _matching_words(self, query_word):
+        scores = {}
+        query_trigrams = word_trigrams(query_word)
+        shared_trigrams = {}
+        for trigram in query_trigrams:
+            for word in self.trigram_words.get(trigram, ()):
+                shared_trigrams[word] = shared_trigrams.get(word, 0) + 1
+        for word, shared in shared_trigrams.items():
+            similarity = shared / (len(query_trigrams) + self.word_trigrams_num[word] - shared)
+            if similarity >= MIN_WORD_SIMILARITY:
+                scores[word] = similarity
+
+        index = bisect_left(self.sorted_words, query_word)
+        while index < len(self.sorted_words) and self.sorted_words[index].startswith(query_word):
+            word = self.sorted_words[index]
+            scores[word] = 1 if word == query_word else max(PREFIX_MATCH_SCORE, scores.get(word, 0))
+            index += 1
+        return scores
+
+    def _matching_ids(self, query):
+        index = bisect_left(self.sorted_ids, query)
+        while index < len(self.sorted_ids) and self.sorted_ids[index].startswith(query):
+            yield int(self.sorted_ids[index])
+            index += 1
+
+    # --- returns the (course_id, name) pairs of the 'limit' best matches of 'query', best first
+    # every query word has to match a word of the course name, and a course scores the mean of its word matches
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT):
+        self.load()
+        query_words = normalize_words(query)
+        if not query_words:
+            return []
+
+        with self.lock:
+            scores = None
+            for query_word in query_words:
+                word_scores = {}
+                for word, score in self._matching_words(query_word).items():
+                    for course_id in self.word_courses[word]:
+                        word_scores[course_id] = max(score, word_scores.get(course_id, 0))
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {course_id: scores[course_id] + score
+                              for course_id, score in word_scores.items() if course_id in scores}
+            scores = {course_id: score / len(query_words) for course_id, score in scores.items()}
+
+            normalized_query = ' '.join(query_words)
+            for course_id in scores:
+                if ' '.join(self.course_words[course_id]).startswith(normalized_query):
+                    scores[course_id] += NAME_PREFIX_BONUS
+            if len(query_words) == 1 and query_words[0].isdigit():
+                for course_id in self._matching_ids(query_words[0]):
+                    scores[course_id] = COURSE_ID_MATCH_SCORE
+
+            # best score first, then the shorter name, then alphabetically
+            best = nsmallest(limit, scores.items(),
+                             key=lambda item: (-item[1], len(self.names[item[0]]), self.names[item[0]].lower()))
+            return [(course_id, self.names[course_id]) for course_id, score in best]
+
+    # --- returns the Course objects of the best matches of 'query', best first
+    def search_courses(self, query, limit=SEARCH_RESULTS_LIMIT):
+        ids = [course_id for course_id, name in self.search(query, limit)]
+        courses = Course.objects.in_bulk(ids)
+        return [courses[course_id] for course_id in ids if course_id in courses]
+
+
+course_index = CourseSearchIndex(scopes=['catalog'])
@@ -0,0 +1,11 @@
+// fills the course search suggestions with the best matches of the typed name
+$(document).on('input', '.course-search', function () {
+    var input = $(this);
+    var suggestions = $('#' + input.attr('list'));
+    $.getJSON(input.data('autocomplete-url'), {q: input.val()}, function (data) {
+        suggestions.empty();
+        $.each(data.results, function (index, course) {
+            suggestions.append($('<option>').val(course.name));
+        });
+    });
+});
@@ -0,0 +1,20 @@
+// fills the follow column of the courses table, which is cached for all users, with the toggles of the signed in
+// user from the ids of the courses they follow; a signed out user is sent to sign in by the follow link
+$(function () {
+    var followed = JSON.parse($('#followed-course-ids').text() || 'null') || [];
+    var next = encodeURIComponent(location.pathname + location.search);
+    $('.follow-cell').each(function () {
+        var cell = $(this);
+        var following = followed.indexOf(cell.data('course')) !== -1;
+        $('<a class="btn btn-sm follow-toggle"></a>')
+            .addClass(following ? 'btn-outline-dark' : 'btn-info')
+            .attr('href', cell.data('url') + '?action=' + (following ? 'unfollow' : 'follow') + '&next=' + next)
+            .text(following ? 'Unfollow' : 'Follow')
+            .appendTo(cell);
+    });
+});
+
+// the rows open their course, a toggle only follows or unfollows it
+$(document).on('click', '.follow-toggle', function (event) {
+    event.stopPropagation();
+});
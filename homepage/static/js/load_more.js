@@ -0,0 +1,7 @@
+// replaces the 'load more' button with the next page of review cards
+$(document).on('click', '.load-more', function () {
+    var button = $(this);
+    $.get(button.data('url'), function (page) {
+        button.replaceWith(page);
+    });
+});
@@ -0,0 +1,138 @@
+from datetime import timedelta
+import logging
+import traceback
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from homepage import caching
+from homepage.models import Task
+
+
+logger = logging.getLogger('homepage.tasks')
+
+TASK_MAX_ATTEMPTS = getattr(settings, 'TASK_MAX_ATTEMPTS', 5)  # a task failing this many times is left as failed
+TASK_RETRY_DELAY = getattr(settings, 'TASK_RETRY_DELAY', 10)  # seconds before the first retry, doubled on every retry
+TASK_LOCK_TIMEOUT = getattr(settings, 'TASK_LOCK_TIMEOUT', 300)  # seconds after which a running task is requeued
+TASK_BATCH_SIZE = 100  # number of due tasks a worker looks up at once
+MAX_ERROR_LENGTH = 5000
+
+TASKS = {}  # the task functions by name
+
+
+# raised when a task is found requeued (as stale) while it ran, so its work is rolled back for the worker running it now
+class TaskLost(Exception):
+    pass
+
+
+# --- registers a function as a task, run by the worker with the payload of the task as its keyword arguments
+def task(function):
+    TASKS[function.__name__] = function
+    return function
+
+
+# --- adds a task running 'name' with the keyword arguments 'payload', in the current transaction
+# a task with the same 'key' is added only once, whatever its state, so a retried request doesn't repeat the work
+def enqueue(name, key=None, delay=0, **payload):
+    if name not in TASKS:
+        raise ValueError(f'Unknown task {name}')
+    new_task = Task(name=name, payload=payload, idempotency_key=key, max_attempts=TASK_MAX_ATTEMPTS,
+                    run_at=timezone.now() + timedelta(seconds=delay))
+    # a single INSERT, ignored when the key is taken
+    Task.objects.bulk_create([new_task], ignore_conflicts=key is not None)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=TASK_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+# --- requeues the tasks claimed by a worker that stopped before finishing them
+def requeue_stale_tasks():
+    stale = timezone.now() - timedelta(seconds=TASK_LOCK_TIMEOUT)
+    return Task.objects.filter(status=Task.Status.RUNNING, locked_at__lt=stale).update(
+        status=Task.Status.QUEUED, locked_at=None)
+
+
+# --- runs the due tasks, up to 'limit' of them, and returns the number run
+# a task is claimed by a conditional update, so of the workers polling the same tasks only one runs each
+def run_due_tasks(limit=TASK_BATCH_SIZE):
+    requeue_stale_tasks()
+    due = Task.objects.filter(status=Task.Status.QUEUED, run_at__lte=timezone.now()).order_by('run_at', 'pk')
+    run = 0
+    for task_id in list(due.values_list('pk', flat=True)[:limit]):
+        claimed = Task.objects.filter(pk=task_id, status=Task.Status.QUEUED).update(
+            status=Task.Status.RUNNING, locked_at=timezone.now(), attempts=F('attempts') + 1)
+        if claimed:
+            run_task(Task.objects.get(pk=task_id))
+            run += 1
+    return run
+
+
+# --- runs a claimed task in a transaction of its own, and records its result
+# the task is marked done in the transaction of its work, and only if the claim is still its own, so the work of a
+# task is committed once even when it was requeued while it ran
+# a failed task is retried with an exponential backoff until it has used its attempts
+def run_task(claimed_task):
+    function = TASKS.get(claimed_task.name)
+    try:
+        if function is None:
+            raise LookupError(f'Unknown task {claimed_task.name}')
+        with transaction.atomic():
+            function(**claimed_task.payload)
+            done = Task.objects.filter(pk=claimed_task.pk, status=Task.Status.RUNNING,
+                                       locked_at=claimed_task.locked_at).update(
+                status=Task.Status.DONE, locked_at=None, finished_at=timezone.now())
+            if not done:
+                raise TaskLost(claimed_task.pk)
+    except TaskLost:
+        logger.warning('Task %s %s was requeued while it ran, its work is left to the next run', claimed_task.pk,
+                       claimed_task.name)
+        return False
+    except Exception:
+        error = traceback.format_exc()[-MAX_ERROR_LENGTH:]
+        retry = function is not None and claimed_task.attempts < claimed_task.max_attempts
+        logger.warning('Task %s %s failed (attempt %s of %s)%s', claimed_task.pk, claimed_task.name,
+                       claimed_task.attempts, claimed_task.max_attempts, ', retrying' if retry else '', exc_info=True)
+        if retry:
+            Task.objects.filter(pk=claimed_task.pk).update(
+                status=Task.Status.QUEUED, locked_at=None, last_error=error,
+                run_at=timezone.now() + retry_delay(claimed_task.attempts))
+        else:
+            Task.objects.filter(pk=claimed_task.pk).update(
+                status=Task.Status.FAILED, locked_at=None, last_error=error, finished_at=timezone.now())
+        return False
+    return True
+
+
+# --- deletes the tasks done more than 'days' ago, the failed ones are kept for inspection
+def purge_done_tasks(days):
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Task.objects.filter(status=Task.Status.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+# the task functions
+
+
+# renders the shared part of the first page of a course into the view cache, after a change invalidated it,
+# so the next visitor doesn't wait for it
+@task
+def warm_course_page(course_id):
+    from homepage.views import compute_course_page  # the views enqueue the tasks
+    try:
+        caching.get_or_compute('course', caching.course_scopes(course_id), [course_id, None],
+                               lambda: compute_course_page(course_id))
+    except ObjectDoesNotExist:
+        pass  # the course was deleted since
+
+
+# --- queues the warming of the page of the course 'course_id' in the current transaction, once per change: the key
+# holds the versions of the page after the change
+# the worker warms the cache it shares with the web server, so nothing is queued with a cache of each process
+def enqueue_course_page_warming(course_id):
+    if caching.is_shared_cache():
+        versions = caching.get_versions(caching.course_scopes(course_id))
+        enqueue('warm_course_page', key=f'warm_course_page:{course_id}:{versions}', course_id=course_id)
@@ -0,0 +1,184 @@
+import pytest
+from homepage import api
+from homepage.models import Course, Review, AppUser, User, UserLikes, Prerequisites
+
+
+def conditional_get(client, url, response, data=None):
+    return client.get(url, data=data, HTTP_IF_NONE_MATCH=response['ETag'])
+
+
+@pytest.mark.django_db
+def test_courses_list(client):
+    response = client.get('/api/courses/')
+    results = response.json()['results']
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/json'
+    assert [course['course_id'] for course in results] == sorted(Course.objects.values_list('pk', flat=True))
+    course = [course for course in results if course['course_id'] == 10341][0]
+    assert course['name'] == 'Open Source 101'
+    assert course['avg_rating'] == float(Course.objects.get(pk=10341).avg_rating)
+    assert course['url'] == '/api/courses/10341/'
+
+
+@pytest.mark.django_db
+def test_courses_list_filters_and_sort(client):
+    response = client.get('/api/courses/', data={'filter_by': ['mand', 'has_preqs'], 'sort_by': 'name'})
+    expected = Course.get_filtered_and_sorted_courses(['mand', 'has_preqs'], 'name')['result']
+
+    assert [course['course_id'] for course in response.json()['results']] == [course.pk for course in expected]
+    assert all(course['has_prerequisites'] and course['mandatory'] for course in response.json()['results'])
+    assert response.json()['filters'] == ['mandatory', 'with prerequisites']
+    assert response.json()['sort'] == 'name'
+
+
+@pytest.mark.parametrize("data", [{'sort_by': 'popularity'}, {'filter_by': 'cheap'}, {'cursor': 'x'},
+                                  {'cursor': Course.encode_cursor(Course(course_id=10111, name='a'), 'name')}])
+@pytest.mark.django_db
+def test_courses_list_invalid_parameters(client, data):
+    response = client.get('/api/courses/', data=data)
+    assert response.status_code == 400
+    assert 'errors' in response.json()
+
+
+@pytest.mark.parametrize("sort_val", ['id', 'name', 'rating', 'load', 'num_reviews', 'num_raters'])
+@pytest.mark.django_db
+def test_courses_list_pages(client, monkeypatch, sort_val):
+    monkeypatch.setattr(api, 'COURSES_API_PAGE_SIZE', 3)
+    Course.objects.filter(pk__in=[10111, 10221]).update(avg_rating=None, avg_load=None)
+    ids = []
+    cursor = ''
+    while cursor is not None:
+        response = client.get('/api/courses/', data={'sort_by': sort_val, 'cursor': cursor}).json()
+        assert len(response['results']) <= 3
+        ids += [course['course_id'] for course in response['results']]
+        cursor = response['next_cursor']
+
+    courses = Course.get_sorted_courses(Course.objects, sort_val)['result']
+    assert ids == list(courses.order_by(*courses.query.order_by, 'pk').values_list('pk', flat=True))
+
+
+@pytest.mark.django_db
+def test_course_detail(client):
+    response = client.get('/api/courses/12343/')
+    course = Course.objects.get(pk=12343)
+
+    assert response.status_code == 200
+    assert response.json()['name'] == course.name
+    assert response.json()['rating_histogram'] == course.rating_histogram()
+    assert response.json()['prerequisites'] == [{'course_id': 10340, 'req_code': 'BEFORE'}]
+    assert response.json()['has_prerequisites']
+    assert 10340 in response.json()['prerequisite_chain']
+
+
+@pytest.mark.django_db
+def test_course_detail_not_found(client):
+    response = client.get('/api/courses/99999/')
+    assert response.status_code == 404
+    assert response.json() == {'error': 'course not found'}
+
+
+@pytest.mark.django_db
+def test_reviews_feed_pages(client):
+    reviews = []
+    cursor = None
+    while True:
+        response = client.get('/api/reviews/', data={'cursor': cursor} if cursor else {}).json()
+        reviews += [review['id'] for review in response['results']]
+        cursor = response['next_cursor']
+        if not cursor:
+            break
+
+    assert reviews == list(Review.main_feed().values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+def test_reviews_feed_of_course(client):
+    response = client.get('/api/reviews/', data={'course': 10111})
+    expected = Review.course_feed(Course.objects.get(pk=10111))
+
+    assert [review['id'] for review in response.json()['results']] == [review.id for review in expected][:10]
+    assert all(review['course_id'] == 10111 for review in response.json()['results'])
+    assert client.get('/api/reviews/', data={'course': 99999}).status_code == 404
+
+
+@pytest.mark.parametrize("url, data", [
+    ('/api/courses/', {'filter_by': 'mand', 'sort_by': 'name'}),
+    ('/api/courses/10111/', None),
+    ('/api/reviews/', None),
+    ('/api/reviews/', {'course': 10111}),
+])
+@pytest.mark.django_db
+def test_not_modified_without_queries(client, django_assert_num_queries, url, data):
+    response = client.get(url, data=data)
+    assert response['ETag'].startswith('"') and not response['ETag'].startswith('W/')
+    assert response.has_header('Last-Modified')
+
+    with django_assert_num_queries(0):
+        not_modified = conditional_get(client, url, response, data)
+    assert not_modified.status_code == 304
+
+    with django_assert_num_queries(0):
+        not_modified = client.get(url, data=data, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+    assert not_modified.status_code == 304
+
+
+@pytest.mark.django_db
+def test_etag_varies_with_parameters(client):
+    first = client.get('/api/courses/', data={'sort_by': 'name'})
+    second = client.get('/api/courses/', data={'sort_by': 'id'})
+    assert first['ETag'] != second['ETag']
+    assert conditional_get(client, '/api/courses/', first, {'sort_by': 'id'}).status_code == 200
+
+
+@pytest.mark.django_db
+def test_course_change_modifies_courses(client):
+    response = client.get('/api/courses/')
+    course = Course.objects.get(pk=10341)
+    course.name = 'Open Source 102'
+    course.save()
+
+    modified = conditional_get(client, '/api/courses/', response)
+    assert modified.status_code == 200
+    assert modified['ETag'] != response['ETag']
+    assert 'Open Source 102' in modified.content.decode()
+
+
+@pytest.mark.django_db
+def test_review_change_modifies_only_its_course(client):
+    course_response = client.get('/api/courses/10111/')
+    other_response = client.get('/api/courses/10221/')
+    feed_response = client.get('/api/reviews/')
+    Review(course=Course.objects.get(pk=10111), user=AppUser.objects.get(pk=1), rate=5, course_load=2,
+           content='A brand new review').save()
+
+    assert conditional_get(client, '/api/courses/10111/', course_response).status_code == 200
+    assert conditional_get(client, '/api/courses/10221/', other_response).status_code == 304
+    assert conditional_get(client, '/api/reviews/', feed_response).status_code == 200
+
+
+@pytest.mark.django_db
+def test_like_modifies_feed(client):
+    feed_response = client.get('/api/reviews/')
+    review = Review.objects.get(pk=feed_response.json()['results'][0]['id'])
+    UserLikes.toggle_like(User.objects.get(pk=2), review)
+
+    modified = conditional_get(client, '/api/reviews/', feed_response)
+    assert modified.status_code == 200
+    assert modified.json()['results'][0]['likes_num'] == Review.objects.get(pk=review.id).likes_num
+
+
+@pytest.mark.django_db
+def test_prerequisite_change_modifies_course(client):
+    response = client.get('/api/courses/10340/')
+    Prerequisites(course_id=Course.objects.get(pk=10340), req_course_id=Course.objects.get(pk=10341),
+                  req_code=Prerequisites.Req_Code.BEFORE).save()
+
+    modified = conditional_get(client, '/api/courses/10340/', response)
+    assert modified.status_code == 200
+    assert modified.json()['prerequisites'] == [{'course_id': 10341, 'req_code': 'BEFORE'}]
+
+
+@pytest.mark.django_db
+def test_api_read_only(client):
+    assert client.post('/api/courses/').status_code == 405
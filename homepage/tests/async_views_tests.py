@@ -0,0 +1,142 @@
+import json
+import pytest
+import threading
+import time
+from io import StringIO
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from homepage import async_views
+from homepage.instrumentation import request_stats
+from homepage.models import Course, FollowedUserCourses, Review, User, UserLikes
+
+
+# the async views run their queries in threads with connections of their own, which only see committed data,
+# so these tests commit their data and restore the migrated data after themselves
+async_db = pytest.mark.django_db(transaction=True, serialized_rollback=True)
+
+CONTEXT_KEYS = {
+    '/': ['cache_version'],
+    '/courses/?filter_by=mand&sort_by=name': ['filters', 'sort', 'cache_parts', 'followed_course_ids'],
+    '/reviews/': ['reviews', 'next_cursor'],
+    '/course/{course_id}/': ['course', 'reviews', 'next_cursor', 'reviews_count', 'is_following', 'preq',
+                             'preq_chain', 'unlocks'],
+}
+
+
+# --- requests 'path' from the async views, through the URLs of the ASGI entry point
+def async_get(client, path):
+    async def get():
+        return await client.get(path)
+    with override_settings(ROOT_URLCONF='ClassRater.asgi_urls'):
+        response = async_to_sync(get)()
+        response.resolver_match.func  # resolved lazily, against the current URLs
+    return response
+
+
+@pytest.fixture
+def signed_in_clients():
+    user = User.objects.get(username='testUser1')
+    sync_client = Client()
+    sync_client.force_login(user)
+    async_client = AsyncClient()
+    async_client.force_login(user)
+    return sync_client, async_client
+
+
+@async_db
+def test_async_views_render_the_sync_context(signed_in_clients):
+    user = User.objects.get(username='testUser1')
+    review = Review.objects.get(pk=1)
+    FollowedUserCourses.objects.get_or_create(user=user.appuser, course=review.course)
+    UserLikes.objects.get_or_create(user_id=user, review_id=review)
+    sync_client, async_client = signed_in_clients
+
+    for path, keys in CONTEXT_KEYS.items():
+        path = path.format(course_id=review.course_id)
+        sync_response = sync_client.get(path)
+        async_response = async_get(async_client, path)
+
+        assert sync_response.resolver_match.func.__module__ == 'homepage.views'
+        assert async_response.resolver_match.func.__module__ == 'homepage.async_views'
+        assert async_response.status_code == sync_response.status_code == 200
+        assert async_response.templates[0].name == sync_response.templates[0].name
+        for key in keys:
+            assert async_response.context[key] == sync_response.context[key], (path, key)
+    assert async_response.context['is_following']
+    assert any(review.is_liked for review in async_response.context['reviews'])
+
+
+@async_db
+def test_async_course_redirects_for_missing_course():
+    response = async_get(AsyncClient(), '/course/99999999/')
+
+    assert response.status_code == 302
+    assert response.url == '/courses/'
+
+
+@async_db
+def test_async_views_are_instrumented():
+    request_stats.reset()
+    async_get(AsyncClient(), '/course/10341/')
+
+    [stats] = [stats for stats in request_stats.summary() if stats['view'] == 'course']
+    assert stats['max_queries'] >= 4
+
+
+def test_run_sync_closes_the_connections_of_its_thread(monkeypatch):
+    closed = []
+    monkeypatch.setattr(async_views, 'close_old_connections', lambda: closed.append(threading.get_ident()))
+
+    def fail():
+        raise ValueError(threading.get_ident())
+
+    async def run_sync(function):
+        return await async_views.run_sync(function)
+
+    thread = async_to_sync(run_sync)(threading.get_ident)
+    with pytest.raises(ValueError) as error:
+        async_to_sync(run_sync)(fail)
+    assert closed == [thread, error.value.args[0]]
+
+
+# with CONN_MAX_AGE 0 a connection would be closed after every lookup, the executor threads keep theirs
+@async_db
+def test_run_sync_keeps_the_connections_of_its_thread():
+    def lookup():
+        Course.objects.exists()
+        return connections['default']
+
+    async def run_sync(function):
+        return await async_views.run_sync(function)
+
+    conn = async_to_sync(run_sync)(lookup)
+    assert conn.connection is not None
+    assert conn.close_at >= time.monotonic() + async_views.EXECUTOR_CONN_MAX_AGE - 1
+
+
+def test_asgi_urls_serve_the_async_views():
+    from ClassRater.asgi_urls import urlpatterns
+
+    views = {pattern.name: pattern.callback for pattern in urlpatterns if getattr(pattern, 'name', None)}
+    assert views['course'] is async_views.course
+    assert views['reviews'] is async_views.reviews
+    assert views['sign_in'].__module__ == 'homepage.views'
+
+
+@async_db
+def test_benchmark_asgi_command():
+    out = StringIO()
+    cache.set('session', 'signed in')
+    call_command('benchmark_asgi', '--requests', '4', '--concurrency', '2', '--view', 'course', stdout=out)
+    report = json.loads(out.getvalue())
+
+    assert cache.get('session') == 'signed in'  # the views ran with a cache of their own
+
+    assert [(result['name'], result['user']) for result in report['results']] == \
+        [('course', 'anonymous'), ('course', 'signed_in')]
+    for result in report['results']:
+        assert result['wsgi']['statuses'] == result['asgi']['statuses'] == [200]
+        assert result['asgi']['requests_per_s'] > 0
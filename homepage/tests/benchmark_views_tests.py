@@ -0,0 +1,69 @@
+import json
+import pytest
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import get_resolver, URLPattern
+from homepage.models import Review
+from homepage.management.commands.benchmark_views import percentile
+
+
+def benchmark(*args):
+    out = StringIO()
+    err = StringIO()
+    call_command('benchmark_views', *args, stdout=out, stderr=err)
+    return out.getvalue(), err.getvalue()
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.9) == 90
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.99) == 7
+
+
+@pytest.mark.django_db
+def test_benchmark_times_every_view(tmp_path):
+    output = tmp_path / 'results.json'
+    benchmark('--runs', '2', '--output', str(output))
+    report = json.loads(output.read_text())
+    names = {pattern.name for pattern in get_resolver().url_patterns
+             if isinstance(pattern, URLPattern) and pattern.name}
+
+    assert report['runs'] == 2
+    assert report['database']['reviews'] == Review.objects.count()
+    assert {result['name'] for result in report['results']} == names
+    assert len(report['results']) == 2 * len(names)
+    for result in report['results']:
+        assert result['status'] < 500
+        assert result['latency_ms']['p50'] <= result['latency_ms']['p99'] <= result['latency_ms']['max']
+        assert result['queries']['min'] <= result['queries']['max']
+
+
+# the views change a copy of the database, and use a cache of their own
+@pytest.mark.django_db
+def test_benchmark_leaves_the_data_and_the_cache_untouched():
+    likes = list(Review.objects.order_by('pk').values_list('likes_num', flat=True))
+    cache.set('session', 'signed in')
+    benchmark('--runs', '3', '--view', 'like_review', '--view', 'courses')
+
+    assert list(Review.objects.order_by('pk').values_list('likes_num', flat=True)) == likes
+    assert cache.get('session') == 'signed in'
+
+
+@pytest.mark.django_db
+def test_benchmark_compare(tmp_path):
+    previous = tmp_path / 'previous.json'
+    benchmark('--runs', '1', '--view', 'courses', '--output', str(previous))
+    out, err = benchmark('--runs', '1', '--view', 'courses', '--compare', str(previous))
+
+    assert json.loads(out)['results'][0]['name'] == 'courses'
+    assert 'courses' in err and 'p50' in err
+
+
+@pytest.mark.django_db
+def test_benchmark_unknown_view():
+    with pytest.raises(CommandError):
+        benchmark('--view', 'no_such_view')
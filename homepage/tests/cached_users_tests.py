@@ -0,0 +1,163 @@
+import pytest
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from homepage import auth_backends
+from homepage.auth_backends import CachedModelBackend, user_key
+from homepage.checks import check_cached_sign_ins
+from homepage.models import AppUser, User
+
+
+AUTH_TABLES = ['"django_session"', '"auth_user"', '"homepage_appuser"']
+
+
+# --- the queries of 'queries' loading a session, a user or an app user (the feeds join the authors, which is no
+# auth query)
+def auth_queries(queries):
+    return [query['sql'] for query in queries.captured_queries
+            if any(f'FROM {table}' in query['sql'] for table in AUTH_TABLES)]
+
+
+@pytest.fixture
+def signed_in_client(client):
+    client.login(username='testUser1', password='password123')
+    return client
+
+
+@pytest.mark.django_db
+def test_signed_in_pages_need_no_auth_queries(signed_in_client):
+    signed_in_client.get('/users/my_profile/')
+
+    for path in ['/users/my_profile/', '/reviews/', '/course/10221/']:
+        with CaptureQueriesContext(connection) as queries:
+            response = signed_in_client.get(path)
+        assert response.status_code == 200
+        assert response.context['user'].username == 'testUser1'
+        assert auth_queries(queries) == [], path
+
+
+@pytest.mark.django_db
+def test_sessions_are_written_through_to_the_database(signed_in_client):
+    session_key = signed_in_client.session.session_key
+
+    assert Session.objects.filter(session_key=session_key).exists()
+    cache.clear()
+    response = signed_in_client.get('/users/my_profile/')
+    assert response.context['user'].username == 'testUser1'
+
+
+@pytest.mark.django_db
+def test_user_is_cached_with_its_app_user(django_assert_num_queries):
+    backend = CachedModelBackend()
+    with django_assert_num_queries(1):
+        user = backend.get_user(1)
+        assert user.appuser.pk == 1
+    with django_assert_num_queries(0):
+        assert backend.get_user(1).appuser.pk == 1
+
+
+@pytest.mark.django_db
+def test_user_without_app_user_is_cached(django_assert_num_queries):
+    admin = User.objects.create_superuser('admin', 'admin@example.com', 'password123')
+    backend = CachedModelBackend()
+    backend.get_user(admin.pk)
+
+    with django_assert_num_queries(0):
+        user = backend.get_user(admin.pk)
+        assert not hasattr(user, 'appuser')
+
+
+# the cache, on disk, holds no password hash - the cached user loads it when it is used, and saves without it
+@pytest.mark.django_db
+def test_cached_user_holds_no_password(signed_in_client, django_assert_num_queries):
+    signed_in_client.get('/users/my_profile/')
+    user = User.objects.get(username='testUser1')
+    entry = cache.get(user_key(user.pk))
+
+    assert 'password' not in entry['user'] and user.password not in str(entry)
+    with django_assert_num_queries(0):
+        cached = CachedModelBackend().get_user(user.pk)
+        assert cached.get_session_auth_hash() == user.get_session_auth_hash()
+    assert cached.check_password('password123')
+
+    cached = CachedModelBackend().get_user(user.pk)
+    cached.first_name = 'Cached'
+    cached.save()
+    assert User.objects.get(pk=user.pk).password == user.password
+
+
+@pytest.mark.django_db
+def test_changed_password_is_forgotten(signed_in_client, django_capture_on_commit_callbacks):
+    signed_in_client.get('/users/my_profile/')
+    user = User.objects.get(username='testUser1')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.set_password('new password')
+        user.save()
+    assert cache.get(user_key(user.pk)) is None
+    assert signed_in_client.get('/users/my_profile/').status_code == 302
+
+
+@pytest.mark.django_db
+def test_missing_and_inactive_users():
+    backend = CachedModelBackend()
+    assert backend.get_user(99999) is None
+
+    User.objects.filter(pk=1).update(is_active=False)
+    assert backend.get_user(1) is None
+
+
+@pytest.mark.django_db
+def test_changed_user_is_loaded_again(signed_in_client, django_capture_on_commit_callbacks):
+    signed_in_client.get('/users/my_profile/')
+    user = User.objects.get(username='testUser1')
+    assert cache.get(user_key(user.pk)) is not None
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.email = 'changed@example.com'
+        user.save()
+    assert cache.get(user_key(user.pk)) is None
+    assert signed_in_client.get('/users/my_profile/').context['user'].email == 'changed@example.com'
+
+
+@pytest.mark.django_db
+def test_deleted_app_user_is_forgotten(django_capture_on_commit_callbacks):
+    app_user = AppUser.create_app_user('cached', 'cached@example.com', 'password123')
+    CachedModelBackend().get_user(app_user.pk)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        app_user.delete()
+    assert cache.get(user_key(app_user.pk)) is None
+
+
+# the user is changed by another process, which has a cache client of its own on the shared cache
+@pytest.mark.parametrize("change", ['deactivate', 'set_password'])
+@pytest.mark.django_db
+def test_user_changed_by_another_process_is_signed_out(signed_in_client, change, monkeypatch,
+                                                       django_capture_on_commit_callbacks):
+    assert signed_in_client.get('/users/my_profile/').status_code == 200
+
+    user = User.objects.get(username='testUser1')
+    if change == 'deactivate':
+        user.is_active = False
+    else:
+        user.set_password('new password')
+    with monkeypatch.context() as other_process:
+        other_process.setattr(auth_backends, 'cache', FileBasedCache(caches['default']._dir, {}))
+        with django_capture_on_commit_callbacks(execute=True):
+            user.save()
+
+    response = signed_in_client.get('/users/my_profile/')
+    assert response.status_code == 302
+    assert response.url.startswith('/users/sign_in/')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+def test_cached_sign_ins_need_a_shared_cache():
+    assert [error.id for error in check_cached_sign_ins(None)] == ['homepage.E002']
+    with override_settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'],
+                           SESSION_ENGINE='django.contrib.sessions.backends.db'):
+        assert check_cached_sign_ins(None) == []
@@ -0,0 +1,167 @@
+import pytest
+import random
+import time
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from homepage import caching, search
+from homepage.models import Course
+from homepage.search import CourseSearchIndex, course_index
+
+
+@pytest.fixture
+def index():
+    index = CourseSearchIndex()
+    index.build([
+        (10221, 'Grammatica in Arithmancy'),
+        (12357, 'Numerology'),
+        (10231, 'UnFogging the Future'),
+        (10111, 'Resonance in Runes and Signs'),
+        (10341, 'Open Source 101'),
+        (20001, 'Advanced Numerology'),
+    ])
+    return index
+
+
+# the shared index is reloaded for every test, so it only holds the courses of the current test database
+@pytest.fixture
+def fresh_course_index():
+    course_index.reset()
+    yield course_index
+    course_index.reset()
+
+
+def result_names(results):
+    return [name for course_id, name in results]
+
+
+@pytest.mark.parametrize("query, expected_first", [
+    ('Numerology', 'Numerology'),
+    ('numer', 'Numerology'),
+    ('Numerlogy', 'Numerology'),          # a missing letter
+    ('resonanse', 'Resonance in Runes and Signs'),  # a wrong letter
+    ('runes resonance', 'Resonance in Runes and Signs'),
+    ('grammatica arith', 'Grammatica in Arithmancy'),
+    ('future', 'UnFogging the Future'),
+    ('open source', 'Open Source 101'),
+    ])
+def test_search_best_match(index, query, expected_first):
+    assert result_names(index.search(query))[0] == expected_first
+
+
+def test_search_ranks_exact_before_prefix_and_typo(index):
+    assert result_names(index.search('numerology')) == ['Numerology', 'Advanced Numerology']
+
+
+def test_search_requires_every_query_word(index):
+    assert result_names(index.search('numerology runes')) == []
+
+
+@pytest.mark.parametrize("query", ['', '   ', 'Introduction to Buddhism', 'xyz'])
+def test_search_without_matches(index, query):
+    assert index.search(query) == []
+
+
+def test_search_by_course_id_prefix(index):
+    assert sorted(course_id for course_id, name in index.search('102')) == [10221, 10231]
+    assert [course_id for course_id, name in index.search('12357')] == [12357]
+
+
+def test_search_limit(index):
+    assert len(index.search('in', limit=1)) == 1
+
+
+# the timing depends on the machine, so it is a benchmark, run with --benchmark
+@pytest.mark.benchmark
+def test_search_time_on_large_catalog():
+    generator = random.Random(0)
+    vocabulary = [''.join(generator.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(generator.randint(3, 10)))
+                  for _ in range(3000)]
+    index = CourseSearchIndex()
+    index.build((course_id, ' '.join(generator.sample(vocabulary, 4))) for course_id in range(10000))
+
+    queries = [word[:generator.randint(2, len(word))] for word in generator.sample(vocabulary, 200)]
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query)
+    average_time = (time.perf_counter() - start) / len(queries)
+
+    assert average_time < 0.005
+
+
+@pytest.mark.django_db
+def test_course_index_loads_from_database(fresh_course_index):
+    assert result_names(fresh_course_index.search('numerology')) == ['Numerology']
+
+
+@pytest.mark.django_db
+def test_saved_course_indexed_on_commit(fresh_course_index, django_capture_on_commit_callbacks):
+    fresh_course_index.load()
+    with django_capture_on_commit_callbacks(execute=True):
+        Course(1, 'Linear Algebra 1', True, 4).save()
+    assert result_names(fresh_course_index.search('algebra')) == ['Linear Algebra 1']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Course.objects.get(pk=1).delete()
+    assert fresh_course_index.search('algebra') == []
+
+
+# a rename by another process reaches the index through the catalog version of the shared cache
+@pytest.mark.django_db
+def test_course_index_reloads_when_the_shared_version_changes(fresh_course_index, monkeypatch):
+    assert result_names(fresh_course_index.search('numerology')) == ['Numerology']
+    Course.objects.filter(pk=12357).update(name='Arithmology')  # sends no signals
+    assert result_names(fresh_course_index.search('numerology')) == ['Numerology']
+
+    with monkeypatch.context() as other_process:
+        other_process.setattr(caching, 'cache', FileBasedCache(caches['default']._dir, {}))
+        caching.bump_versions(['catalog'])
+    assert fresh_course_index.search('numerology') == []
+    assert result_names(fresh_course_index.search('arithmology')) == ['Arithmology']
+
+
+# the catalog version is read from the cache at most once per interval, not on every search
+@pytest.mark.django_db
+def test_course_index_checks_the_version_once_per_interval(fresh_course_index, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(search, 'SEARCH_VERSION_CHECK_INTERVAL', 1)
+    monkeypatch.setattr(search.time, 'monotonic', lambda: now[0])
+    reads = []
+    get_versions = caching.get_versions
+    monkeypatch.setattr(caching, 'get_versions', lambda scopes: reads.append(scopes) or get_versions(scopes))
+
+    fresh_course_index.search('numerology')
+    Course.objects.filter(pk=12357).update(name='Arithmology')
+    caching.bump_versions(['catalog'])
+    assert result_names(fresh_course_index.search('numerology')) == ['Numerology']
+    assert len(reads) == 1
+
+    now[0] += 1
+    assert fresh_course_index.search('numerology') == []
+    assert len(reads) == 2
+
+
+# --------Front End testing-------- #
+@pytest.fixture
+def sign_in(client):
+    client.post('/users/sign_in/', data={'username': 'testUser1', 'password': 'password123'})
+
+
+@pytest.mark.django_db
+def test_courses_autocomplete(client, fresh_course_index):
+    response = client.get('/courses/autocomplete/', {'q': 'numerlogy'})
+    assert response.status_code == 200
+    assert response.json() == {'results': [{'course_id': 12357, 'name': 'Numerology', 'url': '/add_review/12357'}]}
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("sign_in")
+def test_add_review_search_is_typo_tolerant(client, fresh_course_index):
+    response = client.get('/add_review_search/', {'course': 'resonanse'})
+    assert [course.course_id for course in response.context['courses']] == [10111]
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("sign_in")
+def test_add_review_search_empty_query_is_limited(client, fresh_course_index):
+    response = client.get('/add_review_search/')
+    assert len(response.context['courses']) <= 10
@@ -1,5 +1,6 @@
 import pytest
-from pytest_django.asserts import assertTemplateUsed
+from homepage.models import Course
+from pytest_django.asserts import assertTemplateUsed, assertContains, assertNotContains
 
 
 @pytest.mark.parametrize("valid_course_id", [
@@ -21,3 +22,19 @@ def test_invalid_course_resquest(client):
     response = client.get(response.url)
     assert response.status_code == 200
     assertTemplateUsed(response, 'homepage/courses/courses.html')
+
+
+@pytest.mark.django_db
+def test_course_page_renders_distributions(client):
+    course = Course.objects.get(pk=10111)
+    course.update_course_per_review(5, 1, False)
+
+    response = client.get('/course/10111/')
+    assertTemplateUsed(response, 'homepage/courses/distribution.html')
+    assertContains(response, 'class="distribution-bar"', count=10)
+
+
+@pytest.mark.django_db
+def test_course_page_without_raters_has_no_distributions(client):
+    response = client.get('/course/10340/')
+    assertNotContains(response, 'class="distribution"')
@@ -174,8 +174,8 @@ def test_create_multiple_courses():
 def courses():
     courses_list = [
          Course(1, "Course1", True, 3, None),
-         Course(2, "Course2", False, 2, None, 3.5, 2, 13, 5),
-         Course(3, "Course3", False, 1, None, 3.5, 2, 13, 0)
+         Course(2, "Course2", False, 2, None, 3.46154, 2, 13, 5, rating_sum=26, load_sum=45),
+         Course(3, "Course3", False, 1, None, 3.46154, 2, 13, 0, rating_sum=26, load_sum=45)
          ]
     for course in courses_list:
         course.save()
@@ -190,10 +190,10 @@ def test_update_course_with_previous_data(courses):
     course = courses[1]
     course.update_course_per_review(3, 1, False)  # simulates review that gave rating: 3 load: 1 and no text review
     db_course = Course.objects.get(pk=course.course_id)
-    # expect rating to be (3 + 2*13) / 14 = 2.07142
+    # expect rating to be (3 + 26) / 14 = 2.07142 and load to be (1 + 45) / 14 = 3.28571
 
     assert db_course.avg_rating.compare(Decimal('2.07143')) == 0    # assert change
-    assert db_course.avg_load.compare(Decimal('3.32143')) == 0      # assert change
+    assert db_course.avg_load.compare(Decimal('3.28571')) == 0      # assert change
     assert db_course.num_of_raters == 14                            # assert change
     assert db_course.num_of_reviewers == 5                          # assert no change
 
@@ -204,10 +204,10 @@ def test_update_course_with_partial_previous_data(courses):
     course = courses[2]
     course.update_course_per_review(3, 1, True)    # simulates review that gave rating: 3 load: 1 and no text review
     db_course = Course.objects.get(pk=course.course_id)
-    # expect rating to be (3 + 2*13) / 14 = 2.07142
+    # expect rating to be (3 + 26) / 14 = 2.07142 and load to be (1 + 45) / 14 = 3.28571
 
     assert db_course.avg_rating.compare(Decimal('2.07143')) == 0    # assert change
-    assert db_course.avg_load.compare(Decimal('3.32143')) == 0      # assert change
+    assert db_course.avg_load.compare(Decimal('3.28571')) == 0      # assert change
     assert db_course.num_of_raters == 14                            # assert change
     assert db_course.num_of_reviewers == 1                          # assert change
 
@@ -223,3 +223,91 @@ def test_update_course_with_no_prev_data(courses):
     assert db_course.avg_load.compare(Decimal('1.00000')) == 0      # assert change
     assert db_course.num_of_raters == 1                             # assert change
     assert db_course.num_of_reviewers == 1                          # assert change
+
+
+@pytest.mark.django_db
+def test_update_course_keeps_exact_sums(courses):
+    course = courses[0]
+    ratings = [(5, 1), (4, 2), (4, 2), (1, 5), (3, 3), (5, 4), (2, 2)]
+    for rating, load in ratings:
+        Course.objects.get(pk=course.course_id).update_course_per_review(rating, load, True)
+    db_course = Course.objects.get(pk=course.course_id)
+
+    assert db_course.rating_sum == sum(rating for rating, load in ratings)
+    assert db_course.load_sum == sum(load for rating, load in ratings)
+    assert db_course.num_of_raters == len(ratings)
+    assert db_course.avg_rating.compare(Decimal('3.42857')) == 0    # 24 / 7
+    assert db_course.avg_load.compare(Decimal('2.71429')) == 0      # 19 / 7
+
+
+# a stale instance must not overwrite a review applied through another instance
+@pytest.mark.django_db
+def test_update_course_from_stale_instances(courses):
+    first = Course.objects.get(pk=courses[0].course_id)
+    second = Course.objects.get(pk=courses[0].course_id)
+    first.update_course_per_review(5, 1, True)
+    second.update_course_per_review(3, 3, False)
+    db_course = Course.objects.get(pk=courses[0].course_id)
+
+    assert db_course.num_of_raters == 2
+    assert db_course.num_of_reviewers == 1
+    assert db_course.avg_rating.compare(Decimal('4.00000')) == 0
+    assert db_course.avg_load.compare(Decimal('2.00000')) == 0
+    assert second.num_of_raters == 2
+
+
+# the sums backfilled by the migration reproduce the stored averages
+@pytest.mark.django_db
+def test_backfilled_sums_match_averages():
+    for course in Course.objects.filter(num_of_raters__gt=0):
+        assert abs(course.rating_sum - course.avg_rating * course.num_of_raters) <= Decimal('0.5')
+        assert abs(course.load_sum - course.avg_load * course.num_of_raters) <= Decimal('0.5')
+
+
+# --- rating and load histograms
+@pytest.mark.django_db
+def test_update_course_updates_histograms(courses):
+    course = courses[0]
+    for rating, load in [(5, 1), (4, 2), (4, 2), (1, 5)]:
+        course.update_course_per_review(rating, load, False)
+    db_course = Course.objects.get(pk=course.course_id)
+
+    assert db_course.rating_histogram() == [1, 0, 0, 2, 1]
+    assert db_course.load_histogram() == [1, 2, 0, 0, 1]
+
+
+@pytest.mark.parametrize("histogram, median", [
+    ([0, 0, 0, 0, 0], None),
+    ([0, 0, 1, 0, 0], 3),
+    ([1, 0, 0, 2, 1], 4),
+    ([1, 2, 0, 0, 1], 2),
+    ([3, 0, 0, 0, 3], 3),
+    ([1, 0, 0, 0, 0], 1),
+    ([2, 1, 0, 0, 1], 1.5),
+    ])
+def test_histogram_median(histogram, median):
+    assert Course.histogram_median(histogram) == median
+
+
+def test_histogram_distribution():
+    distribution = Course.histogram_distribution([1, 0, 0, 2, 1])
+
+    assert [bucket['value'] for bucket in distribution] == [1, 2, 3, 4, 5]
+    assert [bucket['count'] for bucket in distribution] == [1, 0, 0, 2, 1]
+    assert [bucket['percent'] for bucket in distribution] == [25, 0, 0, 50, 25]
+
+
+# the histograms backfilled by the migration hold every rater of a course, seeded or reviewing, and agree with
+# its sums - the Review rows are counted as they are
+@pytest.mark.django_db
+def test_backfilled_histograms_match_raters():
+    for course in Course.objects.all():
+        assert sum(course.rating_histogram()) == course.num_of_raters
+        assert sum(course.load_histogram()) == course.num_of_raters
+        assert sum(value * count for value, count in zip(range(1, 6), course.rating_histogram())) == course.rating_sum
+        assert sum(value * count for value, count in zip(range(1, 6), course.load_histogram())) == course.load_sum
+
+        reviews = course.review_set.all()
+        for value, rating_count, load_count in zip(range(1, 6), course.rating_histogram(), course.load_histogram()):
+            assert rating_count >= reviews.filter(rate=value).count()
+            assert load_count >= reviews.filter(course_load=value).count()
@@ -339,7 +339,8 @@ def test_invalid_filter_with_client(all_courses, client):
 def test_filter_result_with_client(client, valid_filters, filters_to_results):
     response = client.get('/courses/', data={'filter_by': valid_filters, 'sort_by': 'id'})
     assert response.status_code == 200
-    assert list(response.context['all_courses']) == list(filters_to_results[valid_filters])
+    # the expected queryset is unordered, and may be read in the order of the index of its filter
+    assert list(response.context['all_courses']) == list(filters_to_results[valid_filters].order_by('course_id'))
 
 
 @pytest.mark.parametrize("valid_filters", [
@@ -403,3 +404,50 @@ def test_renders_reviews_template(client):
     response = client.get('/courses/')
     assert response.status_code == 200
     assertTemplateUsed(response, 'homepage/courses/courses.html')
+
+
+# --- test the number of queries of the view does not depend on the catalog size
+COURSES_VIEW_MAX_QUERIES = 2
+
+
+@pytest.fixture
+def large_catalog():
+    courses = [Course(100 + ind, f"Catalog Course {ind}", ind % 2 == 0, 3) for ind in range(200)]
+    Course.objects.bulk_create(courses)
+    Prerequisites.objects.bulk_create([
+        Prerequisites(course_id=courses[ind], req_course_id=courses[ind - 1], req_code=Prerequisites.Req_Code.BEFORE)
+        for ind in range(1, len(courses), 3)
+        ])
+    return courses
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {'sort_by': 'name'},
+    {'filter_by': 'has_preqs', 'sort_by': 'id'},
+    {'filter_by': 'no_preqs', 'sort_by': 'rating'},
+    {'filter_by': ['mand', 'has_preqs', 'rater_num'], 'sort_by': 'num_raters'},
+    {'filter_by': ['elect', 'no_preqs', 'load_below', 'rate_over'], 'sort_by': 'load'},
+    ])
+@pytest.mark.django_db
+def test_courses_view_query_budget(client, large_catalog, django_assert_max_num_queries, query):
+    with django_assert_max_num_queries(COURSES_VIEW_MAX_QUERIES):
+        response = client.get('/courses/', data=query)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_courses_annotated_with_preqs(large_catalog):
+    with_preqs = set(Prerequisites.objects.values_list('course_id', flat=True))
+    for course in Course.get_courses():
+        assert course.preqs_exist == (course.course_id in with_preqs)
+
+
+@pytest.mark.django_db
+def test_get_filtered_and_sorted_courses():
+    result = Course.get_filtered_and_sorted_courses(['has_preqs', 'mand'], 'name')
+    expected = Course.get_mandatory_courses(Course.get_courses_with_preqs(Course.sort_by_name(Course.objects.all())))
+
+    assert list(result['result']) == list(expected)
+    assert result['filters'] == ['with prerequisites', 'mandatory']
+    assert result['sort'] == 'name'
@@ -0,0 +1,137 @@
+import json
+import pytest
+import queue
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from homepage import database, views
+from homepage.database import retry_on_locked
+from homepage.management.commands import benchmark_writes
+from homepage.models import Review, UserLikes
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(database.time, 'sleep', delays.append)
+    return delays
+
+
+# --- a function failing on a locked database its first 'failures' calls
+def failing(failures, message='database is locked'):
+    calls = []
+
+    @retry_on_locked
+    def write():
+        calls.append(len(calls))
+        if len(calls) <= failures:
+            raise OperationalError(message)
+        return 'done'
+    return write, calls
+
+
+def pragma(cursor, name):
+    cursor.execute(f'PRAGMA {name}')
+    return cursor.fetchone()[0]
+
+
+# --------The connection PRAGMAs-------- #
+@pytest.mark.django_db
+def test_new_connections_get_the_pragmas(tmp_path):
+    file_connection = DatabaseWrapper({**connection.settings_dict, 'NAME': str(tmp_path / 'db.sqlite3')})
+    try:
+        with file_connection.cursor() as cursor:
+            assert pragma(cursor, 'journal_mode') == 'wal'
+            assert pragma(cursor, 'synchronous') == 1  # normal
+            assert pragma(cursor, 'busy_timeout') == database.SQLITE_PRAGMAS['busy_timeout']
+            assert pragma(cursor, 'cache_size') == database.SQLITE_PRAGMAS['cache_size']
+    finally:
+        file_connection.close()
+
+
+# --------The retries of the locked writes-------- #
+def test_locked_write_is_retried(no_sleep):
+    write, calls = failing(2)
+
+    assert write() == 'done'
+    assert len(calls) == 3
+    assert len(no_sleep) == 2
+    assert no_sleep[1] > no_sleep[0] * 0.5  # the delay grows, give or take the jitter
+
+
+def test_locked_write_gives_up(no_sleep):
+    write, calls = failing(database.WRITE_RETRIES + 1)
+
+    with pytest.raises(OperationalError):
+        write()
+    assert len(calls) == database.WRITE_RETRIES + 1
+
+
+def test_locked_table_is_retried():
+    write, calls = failing(1, 'database table is locked: homepage_userlikes')
+
+    assert write() == 'done'
+
+
+def test_other_errors_are_not_retried():
+    write, calls = failing(1, 'no such table: homepage_userlikes')
+
+    with pytest.raises(OperationalError):
+        write()
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_write_in_outer_transaction_is_not_retried():
+    write, calls = failing(1)
+
+    with transaction.atomic():
+        with pytest.raises(OperationalError):
+            write()
+    assert len(calls) == 1
+
+
+# the views own the retries, around their whole transaction, and the model methods within it retry nothing
+# (outside of the transaction of a test, which would leave nothing to retry)
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+def test_locked_like_is_retried_by_the_view(monkeypatch, no_sleep):
+    calls = []
+
+    def toggle_like(user, review):
+        calls.append(review)
+        if len(calls) == 1:
+            raise OperationalError('database is locked')
+    monkeypatch.setattr(UserLikes, 'toggle_like', toggle_like)
+    monkeypatch.setattr(views, 'enqueue_course_page_warming', lambda course_id: None)
+    review = Review.objects.first()
+
+    views.toggle_review_like(review.user.user, review)
+    assert calls == [review, review]
+    with transaction.atomic(), pytest.raises(OperationalError):
+        calls.clear()
+        views.toggle_review_like(review.user.user, review)
+    assert len(calls) == 1
+
+
+# --------The write benchmark-------- #
+@pytest.mark.django_db
+def test_benchmark_writes_command():
+    out = StringIO()
+    call_command('benchmark_writes', '--processes', '2', '--writes', '5', stdout=out)
+    report = json.loads(out.getvalue())
+
+    assert set(report['results']) == {'default', 'configured'}
+    assert report['results']['configured']['pragmas'] == database.SQLITE_PRAGMAS
+    for result in report['results'].values():
+        assert result['writes'] + result['errors'] == 10
+        assert result['writes_per_s'] > 0
+    assert report['speedup'] > 0
+
+
+def test_benchmark_writes_fails_when_a_writer_exits_without_its_results():
+    class ExitedWriter:
+        exitcode = -9
+
+    with pytest.raises(CommandError, match='exited without its results'):
+        benchmark_writes.Command.collect_results([ExitedWriter()], queue.Queue())
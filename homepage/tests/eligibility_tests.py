@@ -0,0 +1,166 @@
+import pytest
+import random
+import time
+from homepage.models import Course, Prerequisites, Review, AppUser
+from homepage.eligibility import EligibilityIndex, eligibility_index, bit_indexes
+
+BEFORE = Prerequisites.Req_Code.BEFORE
+SIMU = Prerequisites.Req_Code.SIMU
+CANT = Prerequisites.Req_Code.CANT
+NONE = Prerequisites.Req_Code.NONE
+
+
+# 2 requires 1 before, 3 requires 2 before, 4 requires 1 at the same time (or before),
+# 5 can't be taken after 1, 6 requires 3 at the same time, 7 has an unrelated row with 5
+@pytest.fixture
+def index():
+    index = EligibilityIndex()
+    index.build([(course_id, f'Course {course_id}') for course_id in range(1, 8)],
+                [(2, 1, BEFORE), (3, 2, BEFORE), (4, 1, SIMU), (5, 1, CANT), (6, 3, SIMU), (7, 5, NONE)])
+    return index
+
+
+def test_bit_indexes():
+    assert list(bit_indexes(0)) == []
+    assert list(bit_indexes(0b101001)) == [0, 3, 5]
+    assert list(bit_indexes(1 << 5000)) == [5000]
+
+
+@pytest.mark.parametrize("completed, eligible", [
+    ([], [1, 4, 5, 7]),
+    ([1], [2, 4, 7]),
+    ([1, 2], [3, 4, 6, 7]),
+    ([5], [1, 4, 7]),
+    ([1, 2, 3, 4, 5, 6, 7], []),
+    ([99], [1, 4, 5, 7]),  # unknown courses are ignored
+])
+def test_eligible_course_ids(index, completed, eligible):
+    assert index.eligible_course_ids(completed) == eligible
+
+
+def test_simultaneous_requirement_of_a_blocked_course():
+    index = EligibilityIndex()
+    # 3 requires 2 at the same time, 2 requires 1 at the same time, and 1 is excluded by 4
+    index.build([(course_id, f'Course {course_id}') for course_id in range(1, 5)],
+                [(3, 2, SIMU), (2, 1, SIMU), (1, 4, CANT)])
+
+    assert index.eligible_course_ids([]) == [1, 2, 3, 4]
+    assert index.eligible_course_ids([4]) == []
+
+
+def test_eligible_courses_names(index):
+    assert index.eligible_courses([1, 2]) == [(3, 'Course 3'), (4, 'Course 4'), (6, 'Course 6'), (7, 'Course 7')]
+
+
+# reference evaluation, course by course
+def eligible_by_rules(courses, prerequisites, completed):
+    completed = set(completed)
+    eligible = {course_id for course_id in courses if course_id not in completed}
+    for course_id, req_course_id, req_code in prerequisites:
+        if req_code == BEFORE and req_course_id not in completed or req_code == CANT and req_course_id in completed:
+            eligible.discard(course_id)
+    changed = True
+    while changed:
+        blocked = {course_id for course_id, req_course_id, req_code in prerequisites
+                   if req_code == SIMU and course_id in eligible and req_course_id not in completed | eligible}
+        eligible -= blocked
+        changed = bool(blocked)
+    return sorted(eligible)
+
+
+def synthetic_catalog(generator, courses_num, preqs_per_course):
+    courses = list(range(100000, 100000 + courses_num))
+    prerequisites = []
+    for position, course_id in enumerate(courses[1:], start=1):
+        for _ in range(generator.randint(0, preqs_per_course)):
+            req_course_id = courses[generator.randrange(position)]
+            prerequisites.append((course_id, req_course_id, generator.choice([BEFORE, BEFORE, SIMU, CANT, NONE])))
+    return courses, prerequisites
+
+
+def test_matches_rules_on_random_catalog():
+    generator = random.Random(3)
+    courses, prerequisites = synthetic_catalog(generator, 300, 3)
+    index = EligibilityIndex()
+    index.build([(course_id, str(course_id)) for course_id in courses], prerequisites)
+
+    for _ in range(30):
+        completed = generator.sample(courses, generator.randint(0, 200))
+        assert index.eligible_course_ids(completed) == eligible_by_rules(courses, prerequisites, completed)
+
+
+# an evaluation scans the requirements a few times (once per code, and once per narrowing of the simultaneous
+# requirements) with bitsets of the whole catalog, rather than evaluating the courses one by one
+def test_evaluation_passes_on_large_catalog(monkeypatch):
+    generator = random.Random(0)
+    courses, prerequisites = synthetic_catalog(generator, 10000, 3)
+    index = EligibilityIndex()
+    index.build([(course_id, str(course_id)) for course_id in courses], prerequisites)
+    passes = []
+    requiring = index._requiring
+    monkeypatch.setattr(index, '_requiring', lambda *args: passes.append(args[0]) or requiring(*args))
+
+    for _ in range(20):
+        passes.clear()
+        index.eligible_course_ids(generator.sample(courses, generator.randint(0, 5000)))
+        assert passes.count(BEFORE) == passes.count(CANT) == 1
+        assert passes.count(SIMU) <= 10
+
+
+# the timing depends on the machine, so it is a benchmark, run with --benchmark
+@pytest.mark.benchmark
+def test_evaluation_time_on_large_catalog():
+    generator = random.Random(0)
+    courses, prerequisites = synthetic_catalog(generator, 10000, 3)
+    index = EligibilityIndex()
+    index.build([(course_id, str(course_id)) for course_id in courses], prerequisites)
+    completed_sets = [generator.sample(courses, generator.randint(0, 5000)) for _ in range(20)]
+
+    start = time.perf_counter()
+    for completed in completed_sets:
+        index.eligible_course_ids(completed)
+    average_time = (time.perf_counter() - start) / len(completed_sets)
+
+    assert average_time < 0.05
+
+
+@pytest.mark.django_db
+def test_index_follows_database_changes(django_assert_num_queries):
+    completed = [10111]
+    with django_assert_num_queries(2):
+        eligible = eligibility_index.eligible_course_ids(completed)
+    with django_assert_num_queries(0):
+        eligibility_index.eligible_course_ids(completed)
+
+    Course(1, 'Linear Algebra 1', True, 4).save()
+    assert eligibility_index.eligible_course_ids(completed) == sorted(eligible + [1])
+
+    new_course = Course.objects.get(pk=1)
+    Prerequisites(course_id=new_course, req_course_id=Course.objects.get(pk=12357), req_code=BEFORE).save()
+    assert eligibility_index.eligible_course_ids(completed) == eligible
+
+
+@pytest.mark.django_db
+def test_eligible_courses_view(client):
+    response = client.get('/courses/eligible/', data={'completed': [10111, 10221]})
+    expected = eligibility_index.eligible_courses([10111, 10221])
+
+    assert response.status_code == 200
+    assert response.json()['completed'] == [10111, 10221]
+    assert [(result['course_id'], result['name']) for result in response.json()['results']] == expected
+    assert response.json()['results'][0]['url'] == f'/course/{expected[0][0]}/'
+
+
+@pytest.mark.django_db
+def test_eligible_courses_view_uses_reviewed_courses(client):
+    client.post('/users/sign_in/', data={'username': 'testUser1', 'password': 'password123'})
+    reviewed = sorted(Review.objects.filter(user=AppUser.objects.get(pk=1)).values_list('course_id', flat=True))
+    response = client.get('/courses/eligible/')
+
+    assert response.json()['completed'] == reviewed
+    assert not {result['course_id'] for result in response.json()['results']} & set(reviewed)
+
+
+@pytest.mark.django_db
+def test_eligible_courses_view_invalid_ids(client):
+    assert client.get('/courses/eligible/', data={'completed': 'abc'}).status_code == 400
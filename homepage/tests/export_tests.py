@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from homepage import exports
+from homepage.exports import parse_since, export_columns
+from homepage.models import Course, Review, UserLikes, User
+
+
+@pytest.fixture
+def staff_client(client):
+    User.objects.create_user('staffUser', 'staff@example.com', 'password123', is_staff=True)
+    client.login(username='staffUser', password='password123')
+    return client
+
+
+def streamed(response):
+    return b''.join(response.streaming_content).decode()
+
+
+def test_parse_since():
+    assert parse_since('2021-05-01T12:30:00+00:00').hour == 12
+    assert parse_since('2021-05-01').day == 1
+    assert timezone.is_aware(parse_since('2021-05-01 10:00'))
+    assert parse_since('yesterday') is None
+    assert parse_since('2021-02-30') is None
+    assert parse_since('2021-05-01T25:00') is None
+
+
+@pytest.mark.django_db
+def test_export_reviews_csv(staff_client):
+    response = staff_client.get('/staff/export/reviews.csv')
+    rows = list(csv.reader(io.StringIO(streamed(response))))
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'text/csv'
+    assert response['Content-Disposition'] == 'attachment; filename="reviews.csv"'
+    assert rows[0] == export_columns('reviews')
+    assert [int(row[0]) for row in rows[1:]] == list(Review.objects.order_by('pk').values_list('pk', flat=True))
+
+
+@pytest.mark.django_db
+def test_export_courses_ndjson(staff_client):
+    response = staff_client.get('/staff/export/courses.ndjson')
+    rows = [json.loads(line) for line in streamed(response).splitlines()]
+    course = Course.objects.get(pk=10341)
+    exported = [row for row in rows if row['course_id'] == 10341][0]
+
+    assert response['Content-Type'] == 'application/x-ndjson'
+    assert len(rows) == Course.objects.count()
+    assert exported['avg_rating'] == float(course.avg_rating)
+    assert exported['rating_sum'] == course.rating_sum
+    assert [exported[f'rating_count_{value}'] for value in range(1, 6)] == course.rating_histogram()
+
+
+@pytest.mark.django_db
+def test_export_likes(staff_client):
+    rows = [json.loads(line) for line in streamed(staff_client.get('/staff/export/likes.ndjson')).splitlines()]
+    assert {(row['user_id'], row['review_id']) for row in rows} == set(
+        UserLikes.objects.values_list('user_id', 'review_id'))
+
+
+@pytest.mark.django_db
+def test_export_since(staff_client):
+    old_date = timezone.now() - timedelta(days=30)
+    Review.objects.update(date=old_date)
+    UserLikes.objects.update(date=old_date)
+    new_review = Review.objects.create(course=Course.objects.get(pk=10231), user_id=1, rate=3, course_load=3)
+    like = UserLikes.objects.create(user_id=User.objects.get(pk=1), review_id=new_review)
+    since = (timezone.now() - timedelta(days=1)).isoformat()
+
+    reviews = list(csv.reader(io.StringIO(streamed(staff_client.get('/staff/export/reviews.csv', {'since': since})))))
+    likes = streamed(staff_client.get('/staff/export/likes.ndjson', {'since': since})).splitlines()
+    courses = streamed(staff_client.get('/staff/export/courses.ndjson', {'since': since})).splitlines()
+
+    assert [int(row[0]) for row in reviews[1:]] == [new_review.id]
+    assert [json.loads(line)['id'] for line in likes] == [like.id]
+    assert [json.loads(line)['course_id'] for line in courses] == [10231]
+
+
+@pytest.mark.django_db
+def test_export_streams_in_chunks(monkeypatch):
+    monkeypatch.setattr(exports, 'EXPORT_CHUNK_SIZE', 2)
+    rows = exports.export_rows('reviews')
+    first = next(rows)
+
+    assert first[0] == Review.objects.order_by('pk').first().pk
+    assert len(list(rows)) == Review.objects.count() - 1
+
+
+@pytest.mark.parametrize("url, status", [
+    ('/staff/export/reviews.xml', 404),
+    ('/staff/export/users.csv', 404),
+    ('/staff/export/reviews.csv?since=soon', 400),
+    ('/staff/export/reviews.csv?since=2021-02-30', 400),
+])
+@pytest.mark.django_db
+def test_export_invalid_requests(staff_client, url, status):
+    assert staff_client.get(url).status_code == status
+
+
+@pytest.mark.django_db
+def test_export_staff_only(client):
+    assert client.get('/staff/export/reviews.csv').status_code == 302
+    client.post('/users/sign_in/', data={'username': 'testUser1', 'password': 'password123'})
+    assert client.get('/staff/export/reviews.csv').status_code == 302
+
+
+@pytest.mark.django_db
+def test_export_command(tmp_path):
+    output = tmp_path / 'courses.csv'
+    call_command('export_data', 'courses', '--output', str(output))
+    rows = list(csv.reader(output.open(newline='')))
+
+    assert rows[0] == export_columns('courses')
+    assert len(rows) == Course.objects.count() + 1
+
+
+@pytest.mark.django_db
+def test_export_command_to_output():
+    out = StringIO()
+    call_command('export_data', 'likes', '--format', 'ndjson', '--since', '2000-01-01', stdout=out)
+    assert len(out.getvalue().splitlines()) == UserLikes.objects.count()
+
+
+@pytest.mark.parametrize("since", ['soon', '2021-02-30'])
+def test_export_command_invalid_since(since):
+    with pytest.raises(CommandError):
+        call_command('export_data', 'reviews', '--since', since)
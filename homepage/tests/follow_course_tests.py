@@ -1,6 +1,7 @@
 import pytest
 from homepage.models import Course, FollowedUserCourses
 from django.contrib.auth.models import User
+from django.db import IntegrityError
 
 
 @pytest.mark.django_db
@@ -40,6 +41,36 @@ class TestFollowCourse:
         FollowedUserCourses.unfollow_course(followed_course_pair[0], followed_course_pair[1])
         assert not FollowedUserCourses.is_following_course(followed_course_pair[0], followed_course_pair[1])
 
+    def test_follow_course_twice(self, not_followed_pair):
+        FollowedUserCourses.follow_course(not_followed_pair[0], not_followed_pair[1])
+        FollowedUserCourses.follow_course(not_followed_pair[0], not_followed_pair[1])
+        assert FollowedUserCourses.objects.filter(user_id=not_followed_pair[0].pk,
+                                                  course=not_followed_pair[1]).count() == 1
+
+    def test_unfollow_course_not_followed(self, not_followed_pair):
+        FollowedUserCourses.unfollow_course(not_followed_pair[0], not_followed_pair[1])
+        assert not FollowedUserCourses.is_following_course(not_followed_pair[0], not_followed_pair[1])
+
+    def test_duplicate_follow_is_rejected(self, followed_course_pair):
+        with pytest.raises(IntegrityError):
+            FollowedUserCourses.objects.create(user_id=followed_course_pair[0].pk, course=followed_course_pair[1])
+
+    def test_follow_statements_are_single_queries(self, django_assert_num_queries, not_followed_pair):
+        user, course = User.objects.get(pk=not_followed_pair[0].pk), not_followed_pair[1]
+        with django_assert_num_queries(1):
+            FollowedUserCourses.is_following_course(user, course)
+        with django_assert_num_queries(1):
+            FollowedUserCourses.follow_course(user, course)
+        with django_assert_num_queries(1):
+            FollowedUserCourses.get_followed_course_ids(user, [course.course_id, 10340])
+
+    def test_get_followed_course_ids(self, followed_course_pair, not_followed_pair):
+        user = followed_course_pair[0]
+        followed, not_followed = followed_course_pair[1].course_id, not_followed_pair[1].course_id
+        assert FollowedUserCourses.get_followed_course_ids(user, [followed, not_followed]) == {followed}
+        assert FollowedUserCourses.get_followed_course_ids(user, []) == set()
+        assert followed in FollowedUserCourses.get_followed_course_ids(user)
+
     # ----------------------------------------------------------------------------------------------- #
     # Frontend tests #
 
@@ -71,3 +102,31 @@ class TestFollowCourse:
         client.post('/users/sign_out/')
         response = client.get('/course/10340/follow_course_action')
         assert response.url == ('/users/sign_in/?next=/course/10340/follow_course_action')
+
+    def test_signed_in_follow_action_is_idempotent(self, client, signed_in, not_followed_pair):
+        client.get(f'/course/{not_followed_pair[1].course_id}/follow_course_action?action=follow')
+        client.get(f'/course/{not_followed_pair[1].course_id}/follow_course_action?action=follow')
+        assert FollowedUserCourses.is_following_course(not_followed_pair[0], not_followed_pair[1])
+
+        client.get(f'/course/{not_followed_pair[1].course_id}/follow_course_action?action=unfollow')
+        client.get(f'/course/{not_followed_pair[1].course_id}/follow_course_action?action=unfollow')
+        assert not FollowedUserCourses.is_following_course(not_followed_pair[0], not_followed_pair[1])
+
+    def test_signed_in_follow_action_redirects_to_next(self, client, signed_in):
+        response = client.get('/course/10340/follow_course_action?action=follow&next=/courses/%3Fsort_by%3Dname')
+        assert response.url == '/courses/?sort_by=name'
+
+        response = client.get('/course/10340/follow_course_action?action=follow&next=https://example.com/')
+        assert response.url == '/course/10340/'
+
+    def test_courses_page_has_the_followed_course_ids(self, client, signed_in, followed_course_pair):
+        response = client.get('/courses/')
+        followed_ids = response.context['followed_course_ids']
+        assert followed_course_pair[1].course_id in followed_ids
+        assert set(followed_ids) == FollowedUserCourses.get_followed_course_ids(followed_course_pair[0])
+        assert b'id="followed-course-ids"' in response.content
+        assert b'follow-cell' in response.content
+
+    def test_signed_out_courses_page_has_no_followed_course_ids(self, client):
+        response = client.get('/courses/')
+        assert response.context['followed_course_ids'] is None
@@ -0,0 +1,103 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, Sum
+from homepage.models import Course, Prerequisites, Review, User, UserLikes, FollowedUserCourses
+from homepage.management.commands.generate_data import sample_pairs, zipf_weights
+import random
+
+FIRST_COURSE_ID = 500000
+
+
+def generate(**options):
+    out = StringIO()
+    options = {'courses': 60, 'users': 40, 'reviews': 400, 'likes': 600, 'follows': 100,
+               'first_course_id': FIRST_COURSE_ID, 'seed': 1, **options}
+    call_command('generate_data', stdout=out, **options)
+    return out.getvalue()
+
+
+def synthetic_courses():
+    return Course.objects.filter(pk__gte=FIRST_COURSE_ID)
+
+
+def test_sample_pairs_are_distinct_and_capped():
+    generator = random.Random(0)
+    pairs = sample_pairs(generator, 500, zipf_weights(generator, 10, 1), zipf_weights(generator, 20, 1))
+    assert len(pairs) == len(set(pairs))
+    assert len(pairs) <= 200
+    assert all(0 <= a < 10 and 0 <= b < 20 for a, b in pairs)
+    assert sample_pairs(generator, 10, [], [1]) == []
+
+
+@pytest.mark.django_db
+def test_generates_requested_rows():
+    out = generate()
+    users = User.objects.filter(username__startswith='synthetic_user_')
+
+    assert 'Generated 60 courses' in out
+    assert synthetic_courses().count() == 60
+    assert users.count() == 40
+    assert all(hasattr(user, 'appuser') for user in users)
+    assert Review.objects.filter(course__in=synthetic_courses()).count() == 400
+    assert UserLikes.objects.filter(user_id__in=users).count() == 600
+    assert FollowedUserCourses.objects.filter(course__in=synthetic_courses()).count() == 100
+    assert Prerequisites.objects.filter(course_id__in=synthetic_courses()).exists()
+
+
+@pytest.mark.django_db
+def test_generated_users_can_sign_in(client):
+    generate(password='secret456')
+    assert client.login(username='synthetic_user_1', password='secret456')
+
+
+@pytest.mark.django_db
+def test_generated_aggregates_match_reviews():
+    generate()
+    courses = synthetic_courses().annotate(reviews_num=Count('review'), reviews_rating_sum=Sum('review__rate'),
+                                           reviews_load_sum=Sum('review__course_load'))
+    for course in courses:
+        assert course.num_of_raters == course.reviews_num
+        assert course.rating_sum == (course.reviews_rating_sum or 0)
+        assert course.load_sum == (course.reviews_load_sum or 0)
+        assert sum(course.rating_histogram()) == course.num_of_raters
+        if course.num_of_raters:
+            assert abs(float(course.avg_rating) - course.rating_sum / course.num_of_raters) < 1e-5
+
+    for review in Review.objects.filter(course__in=synthetic_courses()).annotate(likes=Count('userlikes'))[:100]:
+        assert review.likes_num == review.likes
+
+
+@pytest.mark.django_db
+def test_generated_popularity_is_skewed():
+    generate(reviews=1000, users=100)
+    reviews_per_course = sorted(synthetic_courses().values_list('num_of_raters', flat=True), reverse=True)
+    assert reviews_per_course[0] > 4 * reviews_per_course[len(reviews_per_course) // 2]
+
+
+@pytest.mark.django_db
+def test_generated_prerequisites_have_no_cycles():
+    generate(prerequisites=3)
+    for course_id, req_course_id in Prerequisites.objects.filter(course_id__in=synthetic_courses()).values_list(
+            'course_id', 'req_course_id'):
+        assert req_course_id < course_id
+
+
+@pytest.mark.django_db
+def test_generated_data_is_reproducible():
+    generate()
+    names = list(synthetic_courses().order_by('pk').values_list('name', 'num_of_raters'))
+    Course.objects.filter(pk__gte=FIRST_COURSE_ID).delete()
+    User.objects.filter(username__startswith='synthetic_user_').delete()
+    generate()
+    assert list(synthetic_courses().order_by('pk').values_list('name', 'num_of_raters')) == names
+
+
+@pytest.mark.django_db
+def test_refuses_existing_rows():
+    generate()
+    with pytest.raises(CommandError):
+        generate()
+    with pytest.raises(CommandError):
+        generate(first_course_id=600000)
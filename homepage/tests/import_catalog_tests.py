@@ -0,0 +1,237 @@
+import json
+import pytest
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from homepage import caching
+from homepage.models import Course, Prerequisites, Professor, Professor_to_Course
+from homepage.search import course_index
+from homepage.prerequisites import prerequisite_graph
+from homepage.eligibility import eligibility_index
+
+CSV_HEADER = 'course_id,name,mandatory,credit_points,syllabi,avg_load,avg_rating,num_of_raters,num_of_reviewers,' \
+             'prerequisites,professors\n'
+
+
+def import_catalog(path, *args):
+    out = StringIO()
+    err = StringIO()
+    call_command('import_catalog', str(path), *args, stdout=out, stderr=err)
+    return out.getvalue(), err.getvalue()
+
+
+@pytest.fixture
+def csv_catalog(tmp_path):
+    path = tmp_path / 'catalog.csv'
+    path.write_text(CSV_HEADER +
+                    '1,Linear Algebra 1,true,4,,,,0,0,,Albus Dumbledore\n'
+                    '2,Linear Algebra 2,True,4,https://example.com,3.5,4,2,1,1:BEFORE,Albus Dumbledore;Severus Snape\n'
+                    '3,Calculus 1,false,5,,,,0,0,2:1;1:simu;4:-1,\n'
+                    '4,Logic,0,3,,,,,,,\n')
+    return path
+
+
+@pytest.mark.django_db
+def test_import_csv(csv_catalog):
+    out, err = import_catalog(csv_catalog)
+
+    assert err == ''
+    assert 'Imported 4 rows' in out and 'rows/s' in out
+    assert Course.objects.get(pk=1).name == 'Linear Algebra 1'
+    assert Course.objects.get(pk=1).mandatory
+    assert not Course.objects.get(pk=4).mandatory
+    course = Course.objects.get(pk=2)
+    assert course.syllabi == 'https://example.com'
+    assert (course.avg_rating, course.avg_load) == (4, Decimal('3.5'))
+    assert (course.num_of_raters, course.num_of_reviewers) == (2, 1)
+    assert (course.rating_sum, course.load_sum) == (8, 7)
+
+
+@pytest.mark.django_db
+def test_import_prerequisites(csv_catalog):
+    import_catalog(csv_catalog)
+
+    preqs = Prerequisites.objects.filter(course_id__in=[1, 2, 3, 4])
+    assert sorted(preqs.values_list('course_id', 'req_course_id', 'req_code')) == [
+        (2, 1, Prerequisites.Req_Code.BEFORE),
+        (3, 1, Prerequisites.Req_Code.SIMU),
+        (3, 2, Prerequisites.Req_Code.BEFORE),
+        (3, 4, Prerequisites.Req_Code.CANT)]
+
+
+@pytest.mark.django_db
+def test_import_professors(csv_catalog):
+    existing = Professor.objects.create(name='Severus Snape')
+    import_catalog(csv_catalog)
+
+    assert Professor.objects.filter(name='Severus Snape').count() == 1
+    assert set(Professor_to_Course.get_professors_by_course(Course.objects.get(pk=2))) == {
+        existing, Professor.objects.get(name='Albus Dumbledore')}
+    assert Professor_to_Course.get_professors_by_course(Course.objects.get(pk=3)) == []
+
+
+@pytest.mark.django_db
+def test_import_jsonl(tmp_path):
+    path = tmp_path / 'catalog.jsonl'
+    rows = [{'course_id': 1, 'name': 'Linear Algebra 1', 'mandatory': True, 'credit_points': 4,
+             'professors': ['Minerva McGonagall']},
+            {'course_id': 2, 'name': 'Linear Algebra 2', 'mandatory': False, 'credit_points': 4,
+             'avg_rating': 4.5, 'avg_load': 2, 'num_of_raters': 2, 'num_of_reviewers': 0,
+             'prerequisites': [{'req_course_id': 1, 'req_code': 1}, {'req_course_id': 10111, 'req_code': 'CANT'}]}]
+    path.write_text('\n'.join(json.dumps(row) for row in rows) + '\n\n')
+    out, err = import_catalog(path)
+
+    assert err == ''
+    assert Course.objects.get(pk=2).avg_rating == Decimal('4.5')
+    assert Prerequisites.objects.filter(course_id=2).count() == 2
+    assert Professor_to_Course.get_professors_by_course(Course.objects.get(pk=1))[0].name == 'Minerva McGonagall'
+
+
+@pytest.mark.django_db
+def test_import_updates_catalog_fields_only(tmp_path):
+    course = Course.objects.get(pk=10341)
+    path = tmp_path / 'catalog.csv'
+    path.write_text(CSV_HEADER + '10341,Open Source 102,true,5,,,,0,0,,\n')
+    out, err = import_catalog(path)
+    updated = Course.objects.get(pk=10341)
+
+    assert 'Imported 1 rows' in out and '0 courses created, 1 updated' in out
+    assert (updated.name, updated.mandatory, updated.credit_points) == ('Open Source 102', True, 5)
+    assert (updated.avg_rating, updated.num_of_raters, updated.rating_sum) == (
+        course.avg_rating, course.num_of_raters, course.rating_sum)
+
+
+# the catalog fields missing from the file are left as they are
+@pytest.mark.django_db
+def test_import_updates_the_fields_of_the_file_only(tmp_path):
+    Course.objects.filter(pk=10341).update(syllabi='https://example.com/open-source')
+    path = tmp_path / 'catalog.csv'
+    path.write_text('course_id,name,mandatory,credit_points\n10341,Open Source 102,true,5\n')
+    import_catalog(path)
+    path = tmp_path / 'catalog.jsonl'
+    path.write_text('{"course_id": 10341, "name": "Open Source 103", "mandatory": false, "credit_points": 4}\n')
+    import_catalog(path)
+    updated = Course.objects.get(pk=10341)
+
+    assert (updated.name, updated.mandatory, updated.credit_points) == ('Open Source 103', False, 4)
+    assert updated.syllabi == 'https://example.com/open-source'
+
+
+@pytest.mark.django_db
+def test_import_replaces_listed_prerequisites_only(tmp_path):
+    path = tmp_path / 'catalog.csv'
+    path.write_text('course_id,name,mandatory,credit_points,prerequisites\n'
+                    '10342,Normalized Spatial Schemes,true,3,10111:1\n')
+    untouched = list(Prerequisites.objects.exclude(course_id=10342).values_list('id', flat=True))
+    import_catalog(path)
+
+    assert list(Prerequisites.objects.filter(course_id=10342).values_list('req_course_id', 'req_code')) == [(10111, 1)]
+    assert list(Prerequisites.objects.exclude(course_id=10342).values_list('id', flat=True)) == untouched
+
+
+@pytest.mark.parametrize("row, message", [
+    ('5,,true,4,,,,0,0,,', 'name'),
+    ('5,Logic,true,30,,,,0,0,,', 'credit_points'),
+    ('5,Logic,maybe,3,,,,0,0,,', 'True or False'),
+    ('5,Logic,true,3,,4,,1,0,,', "Can't have load without rating"),
+    ('5,Logic,true,3,,4,4,1,2,,', 'Can not have reviews without ratings'),
+    ('5,Logic,true,3,not a url,,,0,0,,', 'URL'),
+    ('5,Logic,true,3,,,,0,0,1:7,', 'requirement code'),
+    ('5,Logic,true,3,,,,0,0,1-1,', 'invalid prerequisites'),
+    ('-5,Logic,true,3,,,,0,0,,', 'greater than or equal to 0'),
+])
+@pytest.mark.django_db
+def test_import_skips_invalid_rows(tmp_path, row, message):
+    path = tmp_path / 'catalog.csv'
+    path.write_text(CSV_HEADER + row + '\n' + '6,Valid,true,3,,,,0,0,,\n')
+    out, err = import_catalog(path)
+
+    assert err.startswith('line 2:') and message in err
+    assert '1 courses created' in out and '1 invalid' in out
+    assert not Course.objects.filter(pk__in=[5, -5]).exists()
+    assert Course.objects.filter(pk=6).exists()
+
+
+@pytest.mark.parametrize("value, field", [
+    ('{"credit_points": [4]}', 'credit_points'),
+    ('{"avg_rating": {"value": 4}, "avg_load": 3, "num_of_raters": 1}', 'avg_rating'),
+    ('{"name": ["Logic"]}', 'name'),
+    ('{"mandatory": [true]}', 'mandatory'),
+])
+@pytest.mark.django_db
+def test_import_skips_values_of_the_wrong_type(tmp_path, value, field):
+    row = {'course_id': 5, 'name': 'Logic', 'mandatory': True, 'credit_points': 3, **json.loads(value)}
+    path = tmp_path / 'catalog.jsonl'
+    path.write_text(json.dumps(row) + '\n')
+    out, err = import_catalog(path)
+
+    assert err.startswith(f'line 1: {field}: ')
+    assert '1 invalid' in out
+    assert not Course.objects.filter(pk=5).exists()
+
+
+@pytest.mark.django_db
+def test_import_reports_unknown_required_course(tmp_path):
+    path = tmp_path / 'catalog.jsonl'
+    path.write_text('{"course_id": 1, "name": "A", "mandatory": true, "credit_points": 3, '
+                    '"prerequisites": [{"req_course_id": 999, "req_code": 1}]}\nnot json\n')
+    out, err = import_catalog(path)
+
+    assert 'unknown required course 999' in err
+    assert 'line 2: not a JSON object' in err
+    assert Course.objects.filter(pk=1).exists()
+    assert not Prerequisites.objects.filter(course_id=1).exists()
+
+
+@pytest.mark.django_db
+def test_import_invalidates_indexes_and_cache(client, csv_catalog):
+    assert course_index.search('algebra') == []
+    assert prerequisite_graph.prerequisite_chain(3) == set()
+    client.get('/courses/')
+    import_catalog(csv_catalog)
+
+    assert [course_id for course_id, name in course_index.search('algebra')] == [1, 2]
+    assert prerequisite_graph.prerequisite_chain(3) == {1, 2}
+    assert 'Linear Algebra 2' in client.get('/courses/').content.decode()
+
+
+# the command runs in a process of its own, whose only link to the server is the shared cache
+@pytest.mark.django_db
+def test_import_of_another_process_reaches_the_indexes(client, csv_catalog, monkeypatch):
+    assert course_index.search('algebra') == []
+    assert prerequisite_graph.prerequisite_chain(3) == set()
+    assert 2 not in eligibility_index.eligible_course_ids([1])
+    client.get('/courses/')
+
+    with monkeypatch.context() as other_process:
+        other_process.setattr(caching, 'cache', FileBasedCache(caches['default']._dir, {}))
+        import_catalog(csv_catalog)
+
+    assert [course_id for course_id, name in course_index.search('algebra')] == [1, 2]
+    assert prerequisite_graph.prerequisite_chain(3) == {1, 2}
+    eligible = eligibility_index.eligible_course_ids([1])
+    assert 2 in eligible and 3 not in eligible
+    assert 'Linear Algebra 2' in client.get('/courses/').content.decode()
+
+
+@pytest.mark.django_db
+def test_import_queries_do_not_depend_on_rows(tmp_path, django_assert_max_num_queries):
+    path = tmp_path / 'catalog.csv'
+    rows = [f'{course_id},Course {course_id},true,3,,,,0,0,{course_id - 1}:1,Prof {course_id % 7}\n'
+            for course_id in range(1, 3001)]
+    path.write_text(CSV_HEADER + ''.join(rows))
+    # SQLite limits the parameters of a query, so a batch takes a few queries, but far from a query per row
+    with django_assert_max_num_queries(150):
+        out, err = import_catalog(path, '--batch-size', '1000')
+
+    assert Course.objects.filter(pk__range=(1, 3000)).count() == 3000
+    assert Prerequisites.objects.filter(course_id__course_id__range=(1, 3000)).count() == 2999
+    assert Professor_to_Course.objects.filter(course_id__course_id__range=(1, 3000)).count() == 3000
+
+
+def test_import_unknown_format():
+    with pytest.raises(CommandError):
+        call_command('import_catalog', 'catalog.txt')
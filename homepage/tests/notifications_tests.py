@@ -0,0 +1,167 @@
+import pytest
+from datetime import timedelta
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from homepage import notifications
+from homepage.checks import check_shared_cache
+from homepage.models import AppUser, Course, FollowedUserCourses, Notification, Review, Task
+from homepage.tasks import run_due_tasks
+
+
+@pytest.fixture
+def course():
+    course = Course.objects.get(pk=10341)
+    FollowedUserCourses.objects.filter(course=course).delete()
+    return course
+
+
+@pytest.fixture
+def followers(course):
+    followers = [AppUser.create_app_user(f'follower{i}', f'follower{i}@example.com', 'password123') for i in range(3)]
+    for follower in followers:
+        FollowedUserCourses.objects.create(user=follower, course=course)
+    return followers
+
+
+def add_review(course, app_user, content='New review'):
+    return Review.objects.create(course=course, user=app_user, rate=4, course_load=2, content=content)
+
+
+@pytest.mark.django_db
+def test_new_review_notifies_the_followers_but_its_author(course, followers):
+    review = add_review(course, followers[0])
+
+    queued = Task.objects.get(name='notify_followers')
+    assert queued.idempotency_key == f'notify_followers:{review.id}'
+    assert Notification.objects.count() == 0
+    run_due_tasks()
+
+    assert sorted(Notification.objects.values_list('user_id', flat=True)) == \
+        sorted(follower.pk for follower in followers[1:])
+    assert not Notification.objects.filter(read=True).exists()
+
+
+@pytest.mark.django_db
+def test_repeated_fan_out_notifies_once(course, followers):
+    review = add_review(course, followers[0])
+    notifications.notify_followers(review.id)
+    notifications.notify_followers(review.id)
+
+    assert Notification.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_fan_out_of_deleted_review(course, followers):
+    review = add_review(course, followers[0])
+    review.delete()
+    run_due_tasks()
+
+    assert Task.objects.get(name='notify_followers').status == Task.Status.DONE
+    assert Notification.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_inbox_is_paginated_newest_first(course, followers):
+    author, reader = followers[0], followers[1]
+    now = timezone.now()
+    for i in range(5):
+        review = add_review(course, author, f'Review {i}')
+        Notification.objects.create(user=reader, review=review, date=now + timedelta(minutes=i))
+
+    first = Notification.get_inbox_page(reader.pk, page_size=3)
+    second = Notification.get_inbox_page(reader.pk, first['next_cursor'], page_size=3)
+
+    assert [n.review.content for n in first['reviews']] == ['Review 4', 'Review 3', 'Review 2']
+    assert [n.review.content for n in second['reviews']] == ['Review 1', 'Review 0']
+    assert second['next_cursor'] is None
+
+
+# --------The unread counts-------- #
+@pytest.mark.django_db
+def test_unread_count_is_cached(course, followers):
+    cache.clear()
+    review = add_review(course, followers[0])
+    notifications.notify_followers(review.id)
+
+    assert notifications.get_unread_count(followers[1].pk) == 1
+    with CaptureQueriesContext(connection) as queries:
+        assert notifications.get_unread_count(followers[1].pk) == 1
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_fan_out_increments_the_cached_counts(course, followers, django_capture_on_commit_callbacks):
+    cache.clear()
+    reader = followers[1]
+    assert notifications.get_unread_count(reader.pk) == 0
+
+    review = add_review(course, followers[0])
+    with django_capture_on_commit_callbacks(execute=True):
+        notifications.notify_followers(review.id)
+
+    with CaptureQueriesContext(connection) as queries:
+        assert notifications.get_unread_count(reader.pk) == 1
+    assert len(queries) == 0
+    # the users without a cached count are counted when needed
+    assert cache.get(notifications.unread_count_key(followers[2].pk)) is None
+
+
+# the fan-out runs in the run_tasks worker, which has a cache client of its own on the shared cache
+@pytest.mark.django_db
+def test_fan_out_of_the_worker_reaches_the_badge(client, course, followers, monkeypatch,
+                                                 django_capture_on_commit_callbacks):
+    reader = followers[1]
+    client.login(username=reader.user.username, password='password123')
+    assert client.get('/').context['unread_notifications'] == 0  # cached by the web process
+
+    add_review(course, followers[0])
+    worker_cache = FileBasedCache(caches['default']._dir, {})
+    assert worker_cache is not caches['default']
+    monkeypatch.setattr(notifications, 'cache', worker_cache)
+    with django_capture_on_commit_callbacks(execute=True):
+        run_due_tasks()
+    monkeypatch.undo()
+
+    assert client.get('/').context['unread_notifications'] == 1
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+def test_process_local_cache_fails_the_checks():
+    assert [error.id for error in check_shared_cache(None)] == ['homepage.E001']
+
+
+def test_shared_cache_passes_the_checks():
+    assert check_shared_cache(None) == []
+
+
+@pytest.mark.django_db
+def test_reading_the_inbox_marks_all_read(client, course, followers, django_capture_on_commit_callbacks):
+    cache.clear()
+    reader = followers[1]
+    notifications.notify_followers(add_review(course, followers[0]).id)
+    client.login(username=reader.user.username, password='password123')
+
+    response = client.get('/')
+    assert b'notifications-badge' in response.content
+    assert response.context['unread_notifications'] == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.get('/users/notifications/')
+    assert response.status_code == 200
+    assert [n.read for n in response.context['notifications']] == [False]
+    assert b'New review' in response.content
+    assert Notification.count_unread(reader.pk) == 0
+    assert notifications.get_unread_count(reader.pk) == 0
+    assert b'notifications-badge' not in client.get('/').content
+
+
+@pytest.mark.django_db
+def test_notifications_require_sign_in(client):
+    response = client.get('/users/notifications/')
+
+    assert response.status_code == 302
+    assert response.url.startswith('/users/sign_in/')
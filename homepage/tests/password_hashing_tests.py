@@ -0,0 +1,103 @@
+import json
+import pytest
+from io import StringIO
+from django.conf import settings as project_settings
+from django.core.management import call_command
+from homepage.hashers import PBKDF2PasswordHasher
+from homepage.models import User
+
+
+PASSWORD = 'pw123123'
+
+
+@pytest.fixture
+def verifications(monkeypatch):
+    calls = []
+    verify = PBKDF2PasswordHasher.verify
+
+    def counting_verify(self, password, encoded):
+        calls.append(password)
+        return verify(self, password, encoded)
+    monkeypatch.setattr(PBKDF2PasswordHasher, 'verify', counting_verify)
+    return calls
+
+
+@pytest.fixture
+def fast_hashing(monkeypatch):
+    monkeypatch.setattr(PBKDF2PasswordHasher, 'iterations', 1000)
+
+
+def sign_in(client, username, password=PASSWORD):
+    return client.post('/users/sign_in/', data={'username': username, 'password': password})
+
+
+@pytest.mark.django_db
+def test_sign_in_hashes_the_password_once(client, verifications):
+    User.objects.create_user('valid_username', 'valid@mta.ac.il', PASSWORD)
+
+    response = sign_in(client, 'valid_username')
+    assert response.url == '/'
+    assert verifications == [PASSWORD]
+    assert client.get('/users/my_profile/').context['user'].username == 'valid_username'
+
+
+@pytest.mark.django_db
+def test_failed_sign_in_hashes_the_password_once(client, verifications):
+    User.objects.create_user('valid_username', 'valid@mta.ac.il', PASSWORD)
+
+    response = sign_in(client, 'valid_username', 'wrong password')
+    assert response.url == '/users/sign_in/'
+    assert verifications == ['wrong password']
+
+
+def test_project_hasher_is_preferred():
+    assert project_settings.PASSWORD_HASHERS[0] == 'homepage.hashers.PBKDF2PasswordHasher'
+    assert PBKDF2PasswordHasher.iterations == project_settings.PASSWORD_PBKDF2_ITERATIONS
+    assert PBKDF2PasswordHasher.algorithm == 'pbkdf2_sha256'
+
+
+# --------Rehashing on sign in-------- #
+@pytest.mark.django_db
+def test_password_is_rehashed_when_the_iterations_change(client, fast_hashing, monkeypatch,
+                                                         django_capture_on_commit_callbacks):
+    user = User.objects.create_user('valid_username', 'valid@mta.ac.il', PASSWORD)
+    assert user.password.startswith('pbkdf2_sha256$1000$')
+
+    monkeypatch.setattr(PBKDF2PasswordHasher, 'iterations', 2000)
+    with django_capture_on_commit_callbacks(execute=True):
+        sign_in(client, 'valid_username')
+    user.refresh_from_db()
+    assert user.password.startswith('pbkdf2_sha256$2000$')
+    # the cached user was dropped with the old hash, so the session of the sign in stays valid
+    assert client.get('/users/my_profile/').context['user'].is_authenticated
+
+
+@pytest.mark.django_db
+def test_password_is_rehashed_when_the_hasher_changes(client, fast_hashing, settings):
+    preferred = settings.PASSWORD_HASHERS
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher', *preferred]
+    user = User.objects.create_user('valid_username', 'valid@mta.ac.il', PASSWORD)
+    assert user.password.startswith('pbkdf2_sha1$')
+
+    settings.PASSWORD_HASHERS = preferred
+    assert sign_in(client, 'valid_username').url == '/'
+    user.refresh_from_db()
+    assert user.password.startswith('pbkdf2_sha256$1000$')
+    assert user.check_password(PASSWORD)
+
+
+# --------The hasher benchmark-------- #
+def test_benchmark_hashers_command(fast_hashing):
+    out = StringIO()
+    call_command('benchmark_hashers', '--logins', '3', stdout=out)
+    report = json.loads(out.getvalue())
+
+    assert report['preferred'] == 'homepage.hashers.PBKDF2PasswordHasher'
+    results = {result['hasher']: result for result in report['results']}
+    assert list(results) == project_settings.PASSWORD_HASHERS
+    preferred = results['homepage.hashers.PBKDF2PasswordHasher']
+    assert preferred['available'] and preferred['iterations'] == 1000
+    assert preferred['verify_ms']['p50'] <= preferred['verify_ms']['max']
+    assert preferred['logins_per_s_per_core'] > 0
+    for result in results.values():
+        assert result['available'] in (True, False)
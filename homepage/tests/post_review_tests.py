@@ -1,6 +1,6 @@
 import pytest
 from homepage.forms import ReviewForm
-from homepage.models import Review, Professor_to_Course
+from homepage.models import Review, Professor_to_Course, Course
 from pytest_django.asserts import assertTemplateUsed
 
 
@@ -86,6 +86,19 @@ def test_post_valid_review_with_client(client, review_details):
     assert response.url == f'/course/{course_id}/'
 
 
+@pytest.mark.django_db
+@pytest.mark.usefixtures("sign_in")
+def test_post_review_updates_course_sums(client, review_details):
+    course_id = review_details.get('course')
+    course_before = Course.objects.get(pk=course_id)
+    client.post(f'/add_review/{course_id}', data=review_details)
+    course_after = Course.objects.get(pk=course_id)
+
+    assert course_after.rating_sum == course_before.rating_sum + review_details.get('rate')
+    assert course_after.load_sum == course_before.load_sum + review_details.get('course_load')
+    assert course_after.num_of_raters == course_before.num_of_raters + 1
+
+
 @pytest.mark.django_db
 @pytest.mark.usefixtures("sign_in")
 def test_renders_add_review_template(client, review_details):
@@ -0,0 +1,153 @@
+import pytest
+import random
+from homepage.models import Course, Prerequisites
+from homepage.prerequisites import PrerequisiteGraph, prerequisite_graph, strongly_connected_components
+
+BEFORE = Prerequisites.Req_Code.BEFORE
+SIMU = Prerequisites.Req_Code.SIMU
+CANT = Prerequisites.Req_Code.CANT
+NONE = Prerequisites.Req_Code.NONE
+
+
+@pytest.fixture
+def courses():
+    courses_list = [Course(course_id, f'Course {course_id}', False, 3) for course_id in range(1, 9)]
+    for course in courses_list:
+        course.save()
+    return {course.course_id: course for course in courses_list}
+
+
+def add_preq(courses, course_id, req_course_id, req_code=BEFORE):
+    Prerequisites(course_id=courses[course_id], req_course_id=courses[req_course_id], req_code=req_code).save()
+
+
+# 1 <- 2 <- 3 <- 4 and 2 <- 5, so 4 requires 3, 2 and 1 and 1 unlocks 2, 3, 4 and 5
+@pytest.fixture
+def chain(courses):
+    for course_id, req_course_id in [(2, 1), (3, 2), (4, 3), (5, 2)]:
+        add_preq(courses, course_id, req_course_id)
+    add_preq(courses, 6, 1, SIMU)
+    add_preq(courses, 7, 4, CANT)
+    add_preq(courses, 8, 1, NONE)
+    return courses
+
+
+@pytest.fixture
+def graph():
+    graph = PrerequisiteGraph()
+    graph.load()
+    return graph
+
+
+@pytest.mark.django_db
+def test_graph_loads_in_a_single_query(chain, django_assert_num_queries):
+    graph = PrerequisiteGraph()
+    with django_assert_num_queries(1):
+        graph.load()
+        graph.prerequisite_chain(4)
+        graph.unlocks(1)
+        graph.has_prerequisites(4)
+
+
+@pytest.mark.django_db
+def test_prerequisite_chain(chain, graph):
+    assert graph.prerequisite_chain(4) == {1, 2, 3}
+    assert graph.prerequisite_chain(5) == {1, 2}
+    assert graph.prerequisite_chain(1) == set()
+    assert graph.prerequisite_chain(6) == set()
+    assert graph.prerequisite_chain(6, SIMU) == {1}
+    assert graph.prerequisite_chain(7, CANT) == {4}
+
+
+@pytest.mark.django_db
+def test_unlocks(chain, graph):
+    assert graph.unlocks(1) == {2, 3, 4, 5}
+    assert graph.unlocks(3) == {4}
+    assert graph.unlocks(4) == set()
+    assert graph.unlocks(1, SIMU) == {6}
+
+
+@pytest.mark.django_db
+def test_has_prerequisites(chain, graph):
+    assert all(graph.has_prerequisites(course_id) for course_id in [2, 3, 4, 5, 6, 7, 8])
+    assert not graph.has_prerequisites(1)
+    assert graph.direct_prerequisites(8) == ((1, NONE),)
+
+
+@pytest.mark.django_db
+def test_topological_order(chain, graph):
+    order = graph.topological_order()
+    assert {1, 2, 3, 4, 5} <= set(order)
+    for course_id in order:
+        assert all(order.index(req_course_id) < order.index(course_id)
+                   for req_course_id in graph.prerequisite_chain(course_id))
+    assert graph.sort_topologically({4, 1, 3}) == [1, 3, 4]
+    assert graph.cycles() == ()
+
+
+@pytest.mark.django_db
+def test_cycles(chain):
+    add_preq(chain, 1, 3)
+    add_preq(chain, 8, 8)
+    graph = PrerequisiteGraph()
+
+    assert graph.cycles() == ((1, 2, 3), (8,))
+    assert graph.prerequisite_chain(4) == {1, 2, 3}
+    assert graph.prerequisite_chain(2) == {1, 2, 3}
+    assert graph.unlocks(3) == {1, 2, 3, 4, 5}
+    assert graph.cycles(SIMU) == ()
+
+
+@pytest.mark.django_db
+def test_graph_rebuilt_on_change(chain):
+    assert prerequisite_graph.prerequisite_chain(4) == {1, 2, 3}
+    add_preq(chain, 1, 6)
+    assert prerequisite_graph.prerequisite_chain(4) == {1, 2, 3, 6}
+    Prerequisites.objects.get(course_id=3).delete()
+    assert prerequisite_graph.prerequisite_chain(4) == {3}
+
+
+@pytest.mark.django_db
+def test_graph_not_rebuilt_without_changes(chain, django_assert_num_queries):
+    prerequisite_graph.load()
+    Course(9, 'Course 9', False, 3).save()
+    with django_assert_num_queries(0):
+        prerequisite_graph.prerequisite_chain(4)
+
+
+def test_components_of_a_long_chain():
+    edges = {course_id: [course_id - 1] for course_id in range(1, 20000)}
+    components = strongly_connected_components(range(20000), edges)
+    assert components == [(course_id,) for course_id in range(20000)]
+
+
+def test_components_match_reachability():
+    generator = random.Random(7)
+    nodes = range(40)
+    edges = {node: generator.sample(nodes, 2) for node in nodes if generator.random() < 0.6}
+
+    def reachable(node):
+        seen = set()
+        stack = list(edges.get(node, ()))
+        while stack:
+            current = stack.pop()
+            if current not in seen:
+                seen.add(current)
+                stack.extend(edges.get(current, ()))
+        return seen
+
+    components = strongly_connected_components(nodes, edges)
+    component_of = {node: index for index, component in enumerate(components) for node in component}
+    for node in nodes:
+        for other in reachable(node):
+            assert component_of[other] <= component_of[node]
+            assert (component_of[other] == component_of[node]) == (node in reachable(other))
+
+
+@pytest.mark.django_db
+def test_course_page_shows_chain_and_unlocks(client, chain):
+    response = client.get('/course/3/')
+    assert response.context['preq_chain'] == [chain[1], chain[2]]
+    assert response.context['unlocks'] == [chain[4]]
+    assert [preq['req_course_id'] for preq in response.context['preq']] == [chain[2]]
+    assert 'Full prerequisite chain' in response.content.decode()
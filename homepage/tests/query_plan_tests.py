@@ -0,0 +1,117 @@
+import re
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from homepage import api
+from homepage.models import Course, Review, User, UserLikes
+
+
+# the plans of the queries a view runs should read the tables through their indexes: a full scan of a table or a
+# sort in a temporary B-tree grows with the table, and shows the query misses the index of its access path
+FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+# the pages read by the signed in user, and the tables they read whole on purpose
+HOT_VIEWS = {
+    '/': [],
+    '/courses/': ['homepage_course'],  # the whole table, in the order of its primary key
+    '/courses/?sort_by=name': [],
+    '/courses/?sort_by=rating': [],
+    '/courses/?sort_by=load': [],
+    '/courses/?sort_by=num_reviews': [],
+    '/courses/?sort_by=num_raters': [],
+    '/courses/?filter_by=mand&sort_by=rating': [],
+    '/reviews/': [],
+    '/course/10221/': ['homepage_prerequisites'],  # the prerequisite graph is loaded once, see homepage.prerequisites
+    '/users/my_profile/': [],
+    '/users/notifications/': [],
+}
+
+
+# --- returns the steps of the query plan of 'sql', as SQLite describes them
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+# --- returns the steps of the plans of the SELECT queries in 'queries' which scan a table (but those of
+# 'allowed_scans') or sort in a temporary B-tree, with their queries
+def unindexed_steps(queries, allowed_scans=()):
+    found = []
+    for query in queries:
+        if not query['sql'].startswith('SELECT'):
+            continue
+        for step in explain(query['sql']):
+            scan = FULL_SCAN.match(step)
+            if TEMP_SORT in step or (scan and scan.group(1) not in allowed_scans):
+                found.append((step, query['sql']))
+    return found
+
+
+def assert_indexed(queries, allowed_scans=()):
+    found = unindexed_steps(queries, allowed_scans)
+    assert not found, '\n'.join(f'{step}: {sql}' for step, sql in found)
+
+
+@pytest.fixture
+def signed_in_client(client):
+    client.force_login(User.objects.get(username='testUser1'))
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('path', HOT_VIEWS)
+def test_view_queries_use_indexes(signed_in_client, path):
+    with CaptureQueriesContext(connection) as queries:
+        response = signed_in_client.get(path)
+
+    assert response.status_code == 200
+    assert_indexed(queries.captured_queries, HOT_VIEWS[path])
+
+
+@pytest.mark.django_db
+def test_next_page_of_feed_uses_index(signed_in_client):
+    cursor = Review.get_feed_page(Review.main_feed(), page_size=2)['next_cursor']
+    with CaptureQueriesContext(connection) as queries:
+        signed_in_client.get(f'/reviews/?cursor={cursor}')
+
+    assert_indexed(queries.captured_queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('sort_val', ['id', 'name', 'rating', 'load', 'num_reviews', 'num_raters'])
+def test_pages_of_course_list_use_index(client, monkeypatch, sort_val):
+    monkeypatch.setattr(api, 'COURSES_API_PAGE_SIZE', 2)
+    Course.objects.filter(pk=10111).update(avg_rating=None, avg_load=None)
+    cursor = ''
+    with CaptureQueriesContext(connection) as queries:
+        while cursor is not None:
+            cursor = client.get('/api/courses/', data={'sort_by': sort_val, 'cursor': cursor}).json()['next_cursor']
+
+    assert_indexed(queries.captured_queries, ['homepage_course'] if sort_val == 'id' else [])
+
+
+@pytest.mark.django_db
+def test_model_access_paths_use_indexes():
+    user = User.objects.get(username='testUser1')
+    course = Course.objects.get(pk=10221)
+    with CaptureQueriesContext(connection) as queries:
+        list(Review.objects.filter(course=course).order_by('-likes_num'))
+        list(Review.profile_page_feed(user))
+        UserLikes.get_liked_reviews_by_user(user)
+        UserLikes.get_liked_review_ids_by_user(user, Review.objects.filter(course=course))
+
+    assert_indexed(queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_unindexed_steps_finds_scans_and_sorts():
+    with CaptureQueriesContext(connection) as queries:
+        list(Review.objects.order_by('content'))
+
+    steps = [step for step, sql in unindexed_steps(queries.captured_queries)]
+    assert 'SCAN homepage_review' in steps
+    assert any(TEMP_SORT in step for step in steps)
+    assert [step for step, sql in unindexed_steps(queries.captured_queries, ['homepage_review'])] == \
+        ['USE TEMP B-TREE FOR ORDER BY']
@@ -0,0 +1,180 @@
+import pytest
+import sqlite3
+import time
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import AsyncClient, Client, override_settings
+from homepage import caching, routers
+from homepage.models import Course, Review, User
+from homepage.routers import PIN_COOKIE, ReplicaRouter, RequestRouting, current_routing
+
+
+# the reads in a transaction go to the primary, so these tests commit their data, and restore the migrated data after
+# themselves
+replica_db = pytest.mark.django_db(transaction=True, serialized_rollback=True)
+
+
+# a second SQLite database, a copy of the test database made before the test writes, so the writes of a test
+# aren't on it - like on a replica which didn't catch up yet
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    path = tmp_path / 'replica.sqlite3'
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+    connections.databases['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path)}
+    monkeypatch.setattr(routers, 'REPLICA_DATABASES', ['replica'])
+    replica_caught_up()
+    yield connections['replica']
+    connections['replica'].close()
+    del connections['replica']
+    del connections.databases['replica']
+
+
+# --- dates the last changes of the data back by REPLICA_PIN_SECONDS, as if the replica caught up with them
+def replica_caught_up():
+    scopes = ['catalog', 'reviews', 'prerequisites', 'likes']
+    scopes += [f'course:{course_id}' for course_id in Course.objects.values_list('pk', flat=True)]
+    past = time.time() - routers.REPLICA_PIN_SECONDS - 1
+    cache.set_many({caching.modified_key(scope): past for scope in scopes}, None)
+
+
+# --- renames the course 'course_id' on the replica only, so the pages read from it are told apart
+def rename_on_replica(replica, course_id, name):
+    with replica.cursor() as cursor:
+        cursor.execute('UPDATE homepage_course SET name = %s WHERE course_id = %s', [name, course_id])
+
+
+def course_names(response):
+    return {course.name for course in response.context['all_courses']}
+
+
+@replica_db
+def test_read_views_read_from_the_replica(client, replica):
+    rename_on_replica(replica, 10221, 'Replicated Arithmancy')
+
+    response = client.get('/courses/')
+    assert 'Replicated Arithmancy' in course_names(response)
+    assert PIN_COOKIE not in response.cookies
+
+    response = client.get('/course/10221/')
+    assert response.context['course'].name == 'Replicated Arithmancy'
+
+
+@replica_db
+def test_other_views_read_from_the_primary(client, replica):
+    rename_on_replica(replica, 10221, 'Replicated Arithmancy')
+
+    assert client.get('/api/courses/10221/').json()['name'] == 'Grammatica in Arithmancy'
+
+
+@replica_db
+def test_sign_in_and_sessions_use_the_primary(client, replica):
+    # a user the replica doesn't have yet
+    User.objects.create_user('new_user', 'new_user@example.com', 'password123')
+    client.login(username='new_user', password='password123')
+
+    response = client.get('/reviews/')
+    assert response.status_code == 200
+    assert response.context['user'].username == 'new_user'
+
+
+@replica_db
+def test_client_reads_its_own_writes(client, replica):
+    client.force_login(User.objects.get(username='testUser1'))
+    review = Review.objects.get(pk=1)
+    likes = review.likes_num
+    # the replica doesn't have the new like, the primary has it
+    before = time.time()
+    response = client.get(f'/like/{review.user_id}/{review.id}/', HTTP_REFERER=f'/course/{review.course_id}/')
+    pin = float(response.cookies[PIN_COOKIE].value)
+    # the end of the pin is rounded to milliseconds
+    assert before + routers.REPLICA_PIN_SECONDS - 0.001 <= pin <= time.time() + routers.REPLICA_PIN_SECONDS + 0.001
+
+    response = client.get(f'/course/{review.course_id}/')
+    [liked] = [card for card in response.context['reviews'] if card.id == review.id]
+    assert liked.likes_num != likes
+
+    # once the replica caught up, another client reads it again (once the page cached by the first one is gone)
+    cache.clear()
+    replica_caught_up()
+    response = Client().get(f'/course/{review.course_id}/')
+    [card] = [card for card in response.context['reviews'] if card.id == review.id]
+    assert card.likes_num == likes
+
+
+# a change by another client makes the pages read their data from the primary, as the replica may lag behind it,
+# so a page cached for every client isn't read from the replica under the versions after the change
+@replica_db
+def test_cached_pages_are_read_from_the_primary_after_a_change(replica):
+    course = Course.objects.get(pk=10221)
+    course.name = 'Renamed Arithmancy'
+    course.save()
+
+    assert 'Renamed Arithmancy' in course_names(Client().get('/courses/'))
+    assert Client().get('/course/10221/').context['course'].name == 'Renamed Arithmancy'
+    # served from the cache from now on
+    rename_on_replica(replica, 10221, 'Replicated Arithmancy')
+    replica_caught_up()
+    assert Client().get('/course/10221/').context['course'].name == 'Renamed Arithmancy'
+
+
+@replica_db
+def test_pin_expires(client, replica):
+    rename_on_replica(replica, 10221, 'Replicated Arithmancy')
+
+    client.cookies[PIN_COOKIE] = f'{time.time() + 60}'
+    assert 'Replicated Arithmancy' not in course_names(client.get('/courses/'))
+
+    cache.clear()
+    replica_caught_up()
+    client.cookies[PIN_COOKIE] = f'{time.time() - 1}'
+    assert 'Replicated Arithmancy' in course_names(client.get('/courses/'))
+
+
+@pytest.mark.django_db
+def test_no_replicas_no_pin(client):
+    client.force_login(User.objects.get(username='testUser1'))
+    response = client.get('/like/1/1/', HTTP_REFERER='/reviews/')
+
+    assert PIN_COOKIE not in response.cookies
+    assert 'Grammatica in Arithmancy' in course_names(client.get('/courses/'))
+
+
+# --------The router-------- #
+@replica_db
+def test_router_reads_from_the_primary_outside_of_read_requests(replica):
+    router = ReplicaRouter()
+    assert router.db_for_read(Course) == 'default'  # outside of a request
+
+    routing = RequestRouting()
+    token = current_routing.set(routing)
+    try:
+        assert router.db_for_read(Course) == 'default'  # not a read view
+        routing.use_replica = True
+        assert router.db_for_read(Course) == 'replica'
+        assert router.db_for_read(User) == 'default'
+        with transaction.atomic():
+            assert router.db_for_read(Course) == 'default'
+        assert router.db_for_write(Course) == 'default'
+        assert routing.wrote
+        assert router.db_for_read(Course) == 'default'  # after a write
+    finally:
+        current_routing.reset(token)
+
+
+@replica_db
+def test_async_read_views_read_from_the_replica(replica):
+    rename_on_replica(replica, 10221, 'Replicated Arithmancy')
+
+    async def get():
+        return await AsyncClient().get('/course/10221/')
+    with override_settings(ROOT_URLCONF='ClassRater.asgi_urls'):
+        response = async_to_sync(get)()
+        response.resolver_match.func  # resolved lazily, against the current URLs
+    assert response.resolver_match.func.__module__ == 'homepage.async_views'
+    assert response.context['course'].name == 'Replicated Arithmancy'
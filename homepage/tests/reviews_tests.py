@@ -1,5 +1,12 @@
 import pytest
+from homepage.models import Review, Course, AppUser, UserLikes, User
+from homepage.prerequisites import prerequisite_graph
+from django.db import connection
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
 from pytest_django.asserts import assertTemplateUsed
+from datetime import datetime, timedelta
+import pytz
 
 
 @pytest.mark.django_db
@@ -8,3 +15,166 @@ def test_renders_reviews_template(client):
 
     assert response.status_code == 200
     assertTemplateUsed(response, 'homepage/reviews/reviews.html')
+
+
+# --------Keyset pagination testing-------- #
+@pytest.fixture
+def many_reviews():
+    course = Course.objects.get(pk=10341)
+    user = AppUser.objects.get(pk=1)
+    date = datetime(2020, 1, 1, 12, 0, 0, tzinfo=pytz.UTC)
+    # every pair of reviews shares the same date, so the id breaks the tie
+    reviews = [Review(course=course, user=user, rate=3, content=f'Review {ind}', course_load=3,
+                      date=date - timedelta(days=ind // 2)) for ind in range(35)]
+    Review.objects.bulk_create(reviews)
+    return course
+
+
+def get_all_pages(feed):
+    pages = [Review.get_feed_page(feed)]
+    while pages[-1]['next_cursor']:
+        pages.append(Review.get_feed_page(feed, pages[-1]['next_cursor']))
+    return pages
+
+
+@pytest.mark.django_db
+def test_feed_pages_cover_feed_in_order(many_reviews):
+    pages = get_all_pages(Review.main_feed())
+    paged_reviews = [review for page in pages for review in page['reviews']]
+
+    assert paged_reviews == list(Review.main_feed())
+    assert all(len(page['reviews']) == 10 for page in pages[:-1])
+
+
+@pytest.mark.django_db
+def test_course_feed_pages(many_reviews):
+    pages = get_all_pages(Review.course_feed(many_reviews))
+    paged_reviews = [review for page in pages for review in page['reviews']]
+
+    assert len(paged_reviews) == 35
+    assert all(review.course == many_reviews for review in paged_reviews)
+
+
+@pytest.mark.parametrize("invalid_cursor", ['', 'not-a-cursor', 'bm90LWEtY3Vyc29y'])
+@pytest.mark.django_db
+def test_invalid_cursor_returns_first_page(many_reviews, invalid_cursor):
+    first_page = Review.get_feed_page(Review.main_feed())
+    assert Review.get_feed_page(Review.main_feed(), invalid_cursor) == first_page
+
+
+@pytest.mark.django_db
+def test_deep_page_does_not_use_offset(many_reviews):
+    pages = get_all_pages(Review.main_feed())
+    with CaptureQueriesContext(connection) as queries:
+        Review.get_feed_page(Review.main_feed(), pages[-2]['next_cursor'])
+
+    assert len(queries) == 1
+    assert 'OFFSET' not in queries[0]['sql'].upper()
+
+
+@pytest.mark.django_db
+def test_reviews_page_shows_single_page(client, many_reviews):
+    response = client.get('/reviews/')
+
+    assert response.status_code == 200
+    assert len(response.context['reviews']) == 10
+    assert response.context['next_cursor'] is not None
+
+
+@pytest.mark.django_db
+def test_more_reviews_fragment(client, many_reviews):
+    first_page = Review.get_feed_page(Review.main_feed())
+    response = client.get('/reviews/more/', data={'cursor': first_page['next_cursor']})
+
+    assert response.status_code == 200
+    assertTemplateUsed(response, 'homepage/reviews/reviews_page.html')
+    assert response.context['reviews'] == Review.get_feed_page(Review.main_feed(), first_page['next_cursor'])['reviews']
+
+
+@pytest.mark.django_db
+def test_more_reviews_fragment_for_course(client, many_reviews):
+    response = client.get('/reviews/more/', data={'course': many_reviews.course_id})
+
+    assert response.status_code == 200
+    assert all(review.course == many_reviews for review in response.context['reviews'])
+
+
+@pytest.mark.parametrize("invalid_course_id", ['11111', 'abc'])
+@pytest.mark.django_db
+def test_more_reviews_fragment_invalid_course(client, invalid_course_id):
+    response = client.get('/reviews/more/', data={'course': invalid_course_id})
+    assert response.status_code == 404
+
+
+# --------Review cards hydration testing-------- #
+@pytest.fixture
+def sign_in(client):
+    client.post('/users/sign_in/', data={'username': 'testUser1', 'password': 'password123'})
+
+
+@pytest.fixture
+def liked_many_reviews(many_reviews):
+    user = User.objects.get(pk=1)
+    reviews = Review.objects.filter(course=many_reviews)
+    UserLikes.objects.bulk_create([UserLikes(user_id=user, review_id=review) for review in reviews[::2]])
+    return many_reviews
+
+
+@pytest.mark.django_db
+def test_load_feed_marks_liked_reviews():
+    user = User.objects.get(pk=1)
+    liked_ids = {review.id for review in UserLikes.get_liked_reviews_by_user(user)}
+    reviews = Review.load_feed(Review.main_feed(), user)
+
+    assert all(review.is_liked == (review.id in liked_ids) for review in reviews)
+
+
+@pytest.mark.django_db
+def test_load_feed_anonymous_user_likes_nothing(django_assert_num_queries):
+    feed = list(Review.main_feed())
+    with django_assert_num_queries(0):
+        reviews = Review.load_feed(feed)
+
+    assert not any(review.is_liked for review in reviews)
+
+
+@pytest.mark.django_db
+def test_load_feed_constant_queries(django_assert_num_queries):
+    user = User.objects.get(pk=1)
+    with django_assert_num_queries(2):
+        reviews = Review.load_feed(Review.main_feed(), user)
+        for review in reviews:
+            str(review.user), review.course.name, review.professor
+
+
+@pytest.mark.parametrize("url", ['/', '/reviews/', '/course/10111/', '/users/my_profile/'])
+@pytest.mark.django_db
+@pytest.mark.usefixtures("sign_in")
+def test_review_cards_queries_do_not_depend_on_feed_size(client, url):
+    cache.clear()  # the session and the user are loaded like in the request below
+    with CaptureQueriesContext(connection) as few_reviews_queries:
+        client.get(url)
+
+    course = Course.objects.get(pk=10111)
+    user = AppUser.objects.get(pk=1)
+    Review.objects.bulk_create([Review(course=course, user=user, rate=4, content=f'Review {ind}', course_load=2)
+                                for ind in range(20)])
+    not_liked = Review.objects.filter(course=course).exclude(userlikes__user_id=user.user)
+    UserLikes.objects.bulk_create([UserLikes(user_id=user.user, review_id=review) for review in not_liked[::2]])
+    cache.clear()  # bulk_create doesn't send the signals invalidating the cached pages
+    prerequisite_graph.reset()
+    with CaptureQueriesContext(connection) as many_reviews_queries:
+        response = client.get(url)
+
+    assert response.status_code == 200
+    assert len(many_reviews_queries) == len(few_reviews_queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("sign_in")
+def test_reviews_page_liked_state(client, liked_many_reviews):
+    user = User.objects.get(pk=1)
+    response = client.get('/reviews/')
+    liked_ids = {review.id for review in UserLikes.get_liked_reviews_by_user(user)}
+
+    assert all(review.is_liked == (review.id in liked_ids) for review in response.context['reviews'])
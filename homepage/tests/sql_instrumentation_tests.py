@@ -0,0 +1,149 @@
+import json
+import logging
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from homepage import instrumentation
+from homepage.instrumentation import QueryRecorder, RequestStats, query_shape, request_stats
+from homepage.models import Course, User
+
+
+@pytest.fixture(autouse=True)
+def clear_request_stats():
+    request_stats.reset()
+    yield
+    request_stats.reset()
+
+
+@pytest.fixture
+def staff_client(client):
+    User.objects.create_user('staffUser', 'staff@example.com', 'password123', is_staff=True)
+    client.login(username='staffUser', password='password123')
+    return client
+
+
+def test_query_shape_collapses_in_lists():
+    assert query_shape('SELECT * FROM a WHERE id IN (%s, %s, %s)') == query_shape('SELECT * FROM a WHERE id IN (%s)')
+    assert query_shape('SELECT * FROM a WHERE id = %s') == 'SELECT * FROM a WHERE id = %s'
+
+
+@pytest.mark.django_db
+def test_recorder_counts_queries_and_duplicates():
+    recorder = QueryRecorder()
+    with recorder.record():
+        for course_id in [10111, 10221, 10231]:
+            Course.objects.get(pk=course_id)
+        Course.objects.count()
+
+    assert recorder.queries == 4
+    assert recorder.duplicates() == 2
+    assert len(recorder.duplicated_shapes()) == 1
+    assert recorder.duplicated_shapes()[0][1] == 3
+    assert recorder.db_time > 0
+
+
+@pytest.mark.parametrize("url", ['/', '/courses/', '/course/10111/', '/reviews/'])
+@pytest.mark.django_db
+def test_debug_headers_match_queries(client, settings, url):
+    settings.DEBUG = True
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+
+    assert int(response['X-DB-Queries']) == len(queries)
+    assert float(response['X-DB-Time-Ms']) >= 0
+    assert int(response['X-DB-Duplicate-Queries']) >= 0
+
+
+@pytest.mark.django_db
+def test_no_headers_without_debug(client, settings):
+    settings.DEBUG = False
+    assert 'X-DB-Queries' not in client.get('/courses/')
+
+
+@pytest.mark.django_db
+def test_requests_grouped_by_view_name(client):
+    client.get('/course/10111/')
+    client.get('/course/10221/')
+    client.get('/courses/')
+    client.get('/no/such/page/')
+
+    summary = {stats['view']: stats for stats in request_stats.summary()}
+    assert summary['course']['requests'] == 2
+    assert summary['courses']['requests'] == 1
+    assert summary[instrumentation.UNRESOLVED_VIEW]['requests'] == 1
+
+
+@pytest.mark.django_db
+def test_slow_request_logged(client, caplog, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'SLOW_REQUEST_QUERIES', 0)
+    with caplog.at_level(logging.WARNING, logger='homepage.sql'):
+        client.get('/course/10111/')
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['event'] == 'slow_request'
+    assert record['view'] == 'course'
+    assert record['path'] == '/course/10111/'
+    assert record['status'] == 200
+    assert record['queries'] > 0
+    assert request_stats.summary()[0]['slow'] == 1
+
+
+@pytest.mark.django_db
+def test_fast_request_not_logged(client, caplog):
+    with caplog.at_level(logging.WARNING, logger='homepage.sql'):
+        client.get('/courses/')
+    assert not caplog.records
+
+
+def test_rolling_window():
+    stats = RequestStats(window=3)
+    for queries in [10, 1, 2, 3]:
+        stats.record('view', queries, queries * 2, queries * 3, 0, False)
+    summary = stats.summary()[0]
+
+    assert summary['requests'] == 4
+    assert summary['window'] == 3
+    assert summary['max_queries'] == 3
+    assert summary['avg_queries'] == 2
+    assert summary['total_db_ms'] == 12
+    assert summary['p50_ms'] == 6
+
+
+def test_summary_sorted_by_db_time():
+    stats = RequestStats()
+    stats.record('light', 1, 1, 5, 0, False)
+    stats.record('heavy', 5, 50, 60, 4, True)
+    assert [view_stats['view'] for view_stats in stats.summary()] == ['heavy', 'light']
+
+
+@pytest.mark.django_db
+def test_stats_page_staff_only(client):
+    response = client.get('/staff/sql/')
+    assert response.status_code == 302
+    client.post('/users/sign_in/', data={'username': 'testUser1', 'password': 'password123'})
+    assert client.get('/staff/sql/').status_code == 302
+
+
+@pytest.mark.django_db
+def test_stats_page(staff_client):
+    staff_client.get('/courses/')
+    response = staff_client.get('/staff/sql/')
+
+    assert response.status_code == 200
+    assert 'courses' in [view_stats['view'] for view_stats in response.context['stats']]
+    assert '<td>courses</td>' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_streaming_queries_recorded(staff_client, settings):
+    settings.DEBUG = True
+    response = staff_client.get('/staff/export/reviews.csv')
+    assert 'export' not in [view_stats['view'] for view_stats in request_stats.summary()]
+
+    with CaptureQueriesContext(connection) as queries:
+        b''.join(response.streaming_content)
+
+    summary = {stats['view']: stats for stats in request_stats.summary()}
+    assert summary['export']['requests'] == 1
+    assert summary['export']['max_queries'] >= len(queries) > 0
+    assert 'X-DB-Queries' not in response
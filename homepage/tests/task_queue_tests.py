@@ -0,0 +1,252 @@
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from homepage import caching, notifications, tasks
+from homepage.models import AppUser, Course, FollowedUserCourses, Notification, Review, Task, UserLikes
+from homepage.tasks import enqueue, purge_done_tasks, run_due_tasks, task
+
+
+CALLS = []
+
+
+@task
+def record_call(value):
+    CALLS.append(value)
+
+
+@task
+def fail_always(value):
+    raise RuntimeError(f'failed {value}')
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    CALLS.clear()
+    yield
+    CALLS.clear()
+
+
+@pytest.mark.django_db
+def test_enqueue_and_run():
+    enqueue('record_call', value=1)
+    enqueue('record_call', value=2)
+
+    assert Task.objects.filter(status=Task.Status.QUEUED).count() == 2
+    assert run_due_tasks() == 2
+    assert CALLS == [1, 2]
+    assert Task.objects.filter(status=Task.Status.DONE, attempts=1).count() == 2
+    assert run_due_tasks() == 0
+
+
+@pytest.mark.django_db
+def test_enqueue_unknown_task():
+    with pytest.raises(ValueError):
+        enqueue('no_such_task')
+
+
+@pytest.mark.django_db
+def test_idempotency_key_adds_a_single_task():
+    enqueue('record_call', key='once', value=1)
+    enqueue('record_call', key='once', value=2)
+    run_due_tasks()
+    enqueue('record_call', key='once', value=3)
+
+    assert Task.objects.count() == 1
+    assert run_due_tasks() == 0
+    assert CALLS == [1]
+
+
+@pytest.mark.django_db
+def test_delayed_task_waits():
+    enqueue('record_call', delay=60, value=1)
+
+    assert run_due_tasks() == 0
+    Task.objects.update(run_at=timezone.now())
+    assert run_due_tasks() == 1
+
+
+@pytest.mark.django_db
+def test_failed_task_is_retried_with_backoff():
+    enqueue('fail_always', value=1)
+
+    before = timezone.now()
+    assert run_due_tasks() == 1
+    failed = Task.objects.get()
+    assert failed.status == Task.Status.QUEUED
+    assert 'RuntimeError: failed 1' in failed.last_error
+    assert failed.run_at >= before + timedelta(seconds=tasks.TASK_RETRY_DELAY)
+
+    for _ in range(2, tasks.TASK_MAX_ATTEMPTS + 1):
+        Task.objects.update(run_at=timezone.now())
+        run_due_tasks()
+    failed.refresh_from_db()
+    assert failed.attempts == tasks.TASK_MAX_ATTEMPTS
+    assert failed.status == Task.Status.FAILED
+    assert failed.finished_at is not None
+
+
+def test_retry_delay_doubles():
+    assert [tasks.retry_delay(attempts).total_seconds() for attempts in (1, 2, 3)] == \
+        [tasks.TASK_RETRY_DELAY, 2 * tasks.TASK_RETRY_DELAY, 4 * tasks.TASK_RETRY_DELAY]
+
+
+@pytest.mark.django_db
+def test_task_of_unknown_function_fails_without_retry():
+    Task.objects.create(name='removed_task')
+
+    run_due_tasks()
+    assert Task.objects.get().status == Task.Status.FAILED
+
+
+@pytest.mark.django_db
+def test_claimed_task_is_run_once():
+    enqueue('record_call', value=1)
+    # another worker claimed it first
+    Task.objects.update(status=Task.Status.RUNNING, locked_at=timezone.now())
+
+    assert run_due_tasks() == 0
+    assert CALLS == []
+
+
+@pytest.mark.django_db
+def test_task_of_stopped_worker_is_requeued():
+    enqueue('record_call', value=1)
+    Task.objects.update(status=Task.Status.RUNNING, attempts=1,
+                        locked_at=timezone.now() - timedelta(seconds=tasks.TASK_LOCK_TIMEOUT + 1))
+
+    assert run_due_tasks() == 1
+    assert CALLS == [1]
+    assert Task.objects.get().attempts == 2
+
+
+@pytest.mark.django_db
+def test_purge_done_tasks():
+    enqueue('record_call', value=1)
+    enqueue('fail_always', value=2)
+    Task.objects.update(max_attempts=1)
+    run_due_tasks()
+    Task.objects.update(finished_at=timezone.now() - timedelta(days=8))
+
+    assert purge_done_tasks(7) == 1
+    assert list(Task.objects.values_list('status', flat=True)) == [Task.Status.FAILED]
+
+
+@pytest.mark.django_db
+def test_run_tasks_command():
+    enqueue('record_call', value=1)
+    out = StringIO()
+    call_command('run_tasks', '--burst', stdout=out)
+
+    assert 'Ran 1 tasks' in out.getvalue()
+    assert CALLS == [1]
+
+
+# --------Tasks of the views-------- #
+@pytest.mark.django_db
+def test_add_review_queues_the_follow_up_work(client):
+    course = Course.objects.get(pk=10341)
+    app_user = AppUser.create_app_user('reviewer', 'reviewer@example.com', 'password123')
+    client.login(username='reviewer', password='password123')
+    client.post('/add_review/10341', {'course': 10341, 'user': app_user.user.id, 'rate': 4, 'course_load': 2,
+                                      'content': 'Queued'})
+    review = Review.objects.get(content='Queued')
+
+    # the figures are updated with the review, the rest is queued
+    updated = Course.objects.get(pk=10341)
+    assert updated.num_of_raters == course.num_of_raters + 1
+    assert updated.rating_sum == course.rating_sum + 4
+    assert set(Task.objects.values_list('name', flat=True)) == {'notify_followers', 'warm_course_page'}
+    assert Task.objects.get(name='notify_followers').payload == {'review_id': review.id}
+    assert Task.objects.get(name='warm_course_page').payload == {'course_id': 10341}
+
+
+@task
+def requeued_while_running(course_id):
+    Course.objects.filter(pk=course_id).update(name='Renamed')
+    # another worker requeued the task as stale, and claimed it again
+    Task.objects.filter(name='requeued_while_running').update(locked_at=timezone.now() + timedelta(seconds=1))
+
+
+@pytest.mark.django_db
+def test_work_of_a_requeued_task_is_rolled_back():
+    name = Course.objects.get(pk=10341).name
+    enqueue('requeued_while_running', course_id=10341)
+
+    assert run_due_tasks() == 1
+    assert Task.objects.get().status == Task.Status.RUNNING  # left to the worker which claimed it again
+    assert Course.objects.get(pk=10341).name == name
+
+
+@pytest.mark.django_db
+def test_like_queues_course_page_warming_once_per_change(client):
+    review = Review.objects.get(pk=1)
+    client.get(f'/like/1/{review.id}/', HTTP_REFERER='/reviews/')
+    client.get(f'/like/1/{review.id}/', HTTP_REFERER='/reviews/')
+
+    queued = Task.objects.filter(name='warm_course_page')
+    assert [task.payload for task in queued] == [{'course_id': review.course_id}] * 2
+    assert len({task.idempotency_key for task in queued}) == 2
+
+
+@pytest.mark.django_db
+def test_failed_like_queues_nothing(client, monkeypatch):
+    def fail(user, review):
+        raise RuntimeError('failed')
+    monkeypatch.setattr(UserLikes, 'toggle_like', fail)
+
+    with pytest.raises(RuntimeError):
+        client.get('/like/1/1/', HTTP_REFERER='/reviews/')
+    assert not Task.objects.exists()
+
+
+@pytest.mark.django_db
+def test_no_warming_with_a_cache_of_each_process(client):
+    with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+        client.get('/like/1/1/', HTTP_REFERER='/reviews/')
+
+    assert not Task.objects.exists()
+
+
+@pytest.mark.django_db
+def test_unfollow_queues_forgetting_the_course_notifications(client, django_capture_on_commit_callbacks):
+    course = Course.objects.get(pk=10341)
+    author = AppUser.create_app_user('author', 'author@example.com', 'password123')
+    follower = AppUser.create_app_user('follower', 'follower@example.com', 'password123')
+    FollowedUserCourses.objects.create(user=follower, course=course)
+    Review.objects.create(course=course, user=author, rate=4, course_load=2, content='Followed')
+    run_due_tasks()
+    client.login(username='follower', password='password123')
+    assert notifications.get_unread_count(follower.pk) == 1
+
+    client.get(f'/course/{course.course_id}/follow_course_action', {'action': 'unfollow'})
+    queued = Task.objects.get(name='forget_course_notifications')
+    assert queued.payload == {'user_id': follower.pk, 'course_id': course.course_id}
+    client.get(f'/course/{course.course_id}/follow_course_action', {'action': 'unfollow'})  # not followed any more
+    assert Task.objects.filter(name='forget_course_notifications').count() == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        run_due_tasks()
+    assert Notification.count_unread(follower.pk) == 0
+    assert notifications.get_unread_count(follower.pk) == 0
+
+
+@pytest.mark.django_db
+def test_warm_course_page_caches_the_first_page():
+    course = Course.objects.get(pk=10341)
+    enqueue('warm_course_page', course_id=course.course_id)
+    run_due_tasks()
+
+    key = caching.cache_key('course', caching.course_scopes(course.course_id), [course.course_id, None])
+    assert cache.get(key)['course'] == course
+
+
+@pytest.mark.django_db
+def test_warm_course_page_of_deleted_course():
+    enqueue('warm_course_page', course_id=1)
+    run_due_tasks()
+
+    assert Task.objects.get().status == Task.Status.DONE
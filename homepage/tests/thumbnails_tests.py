@@ -0,0 +1,175 @@
+import pytest
+from io import BytesIO, StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+from homepage import thumbnails
+from homepage.models import AppUser, Course, Review
+from homepage.thumbnails import process_review_image, thumbnail_pool
+
+
+ORIENTATION = 0x0112
+GPS_INFO = 0x8825
+ROTATED_90 = 6  # the EXIF orientation of a phone photo taken upright, stored sideways
+
+
+def jpeg_upload(name='photo.jpg', size=(2000, 1000), orientation=ROTATED_90):
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    exif[GPS_INFO] = {1: 'N'}
+    content = BytesIO()
+    Image.new('RGB', size, 'red').save(content, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, content.getvalue(), content_type='image/jpeg')
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def review_with_image(media_root):
+    return Review.objects.create(course=Course.objects.get(pk=10341), user=AppUser.objects.get(pk=1), rate=4,
+                                 course_load=3, content='With a photo', image=jpeg_upload())
+
+
+@pytest.mark.django_db
+def test_variants_are_upright_and_fitted(review_with_image):
+    image_variants = process_review_image(review_with_image.id)
+    variants = image_variants['variants']
+
+    assert (image_variants['width'], image_variants['height']) == (1000, 2000)
+    assert (variants['small']['width'], variants['small']['height']) == (240, 480)
+    assert (variants['large']['width'], variants['large']['height']) == (800, 1600)
+    review_with_image.refresh_from_db()
+    assert review_with_image.image_variants == image_variants
+
+
+@pytest.mark.django_db
+def test_variants_are_webp_and_jpeg_without_exif(review_with_image, media_root):
+    variants = process_review_image(review_with_image.id)['variants']
+
+    for variant in variants.values():
+        with Image.open(media_root / variant['webp']) as webp, Image.open(media_root / variant['jpeg']) as jpeg:
+            assert webp.format == 'WEBP'
+            assert jpeg.format == 'JPEG'
+            assert (jpeg.width, jpeg.height) == (variant['width'], variant['height'])
+            assert not webp.getexif()
+            assert not jpeg.getexif()
+
+
+@pytest.mark.django_db
+def test_transparent_png_is_flattened(media_root):
+    content = BytesIO()
+    Image.new('RGBA', (600, 300), (0, 0, 0, 0)).save(content, 'PNG')
+    review = Review.objects.create(course=Course.objects.get(pk=10341), user=AppUser.objects.get(pk=1), rate=4,
+                                   course_load=3, image=SimpleUploadedFile('drawing.png', content.getvalue()))
+
+    variants = process_review_image(review.id)['variants']
+
+    assert (variants['small']['width'], variants['small']['height']) == (480, 240)
+    with Image.open(media_root / variants['small']['jpeg']) as jpeg:
+        assert jpeg.getpixel((0, 0)) == (255, 255, 255)
+
+
+@pytest.mark.django_db
+def test_unreadable_image_has_no_variants(media_root):
+    review = Review.objects.create(course=Course.objects.get(pk=10341), user=AppUser.objects.get(pk=1), rate=4,
+                                   course_load=3, image=SimpleUploadedFile('broken.jpg', b'not an image'))
+
+    assert process_review_image(review.id) is None
+    review.refresh_from_db()
+    assert review.image_variants == {}
+    assert review.thumbnails == {}
+
+
+@pytest.mark.django_db
+def test_replaced_image_is_not_overwritten(review_with_image, media_root, monkeypatch):
+    render_variants = thumbnails.render_variants
+
+    # the image is replaced while the variants of the previous one are made
+    def replace_then_render(image_file):
+        Review.objects.filter(pk=review_with_image.id).update(image='images/other.jpg')
+        return render_variants(image_file)
+
+    monkeypatch.setattr(thumbnails, 'render_variants', replace_then_render)
+    assert process_review_image(review_with_image.id) is None
+    review_with_image.refresh_from_db()
+    assert review_with_image.image_variants == {}
+    assert not (media_root / 'images' / 'variants').exists() or not any((media_root / 'images' / 'variants').iterdir())
+
+
+@pytest.mark.django_db
+def test_new_image_replaces_the_variants(review_with_image, media_root):
+    old_variants = process_review_image(review_with_image.id)['variants']
+    review_with_image.refresh_from_db()
+    review_with_image.image = jpeg_upload('new_photo.jpg', size=(900, 600), orientation=1)
+    review_with_image.save()
+
+    assert review_with_image.thumbnails == {}
+    new_variants = process_review_image(review_with_image.id)['variants']
+    assert (new_variants['small']['width'], new_variants['small']['height']) == (480, 320)
+    assert not (media_root / old_variants['small']['webp']).exists()
+    assert (media_root / new_variants['small']['webp']).exists()
+
+
+@pytest.mark.django_db
+def test_saved_image_is_scheduled_on_commit(media_root, monkeypatch, django_capture_on_commit_callbacks):
+    submitted = []
+    monkeypatch.setattr(thumbnail_pool, 'submit', submitted.append)
+    with django_capture_on_commit_callbacks(execute=True):
+        review = Review.objects.create(course=Course.objects.get(pk=10341), user=AppUser.objects.get(pk=1), rate=4,
+                                       course_load=3, image=jpeg_upload())
+    assert submitted == [review.id]
+
+    # saving the review again doesn't remake the variants of the same image
+    process_review_image(review.id)
+    review.refresh_from_db()
+    with django_capture_on_commit_callbacks(execute=True):
+        review.save()
+    assert submitted == [review.id]
+
+
+@pytest.mark.django_db
+def test_pool_without_workers_resizes_right_away(review_with_image, monkeypatch):
+    monkeypatch.setattr(thumbnail_pool, 'workers', 0)
+    thumbnail_pool.submit(review_with_image.id)
+
+    review_with_image.refresh_from_db()
+    assert review_with_image.thumbnails['small']['width'] == 240
+
+
+@pytest.mark.django_db
+def test_feed_shows_small_variant_lazily(client, review_with_image):
+    process_review_image(review_with_image.id)
+    review_with_image.refresh_from_db()
+    small = review_with_image.thumbnails['small']
+
+    response = client.get('/reviews/').content.decode()
+
+    assert f'srcset="{small["webp"]}"' in response
+    assert f'src="{small["jpeg"]}" width="240"' in response
+    assert 'height="480" loading="lazy"' in response
+    assert review_with_image.image.url not in response
+
+
+@pytest.mark.django_db
+def test_feed_hides_image_without_variants(client, review_with_image):
+    response = client.get('/reviews/').content.decode()
+
+    assert 'review-image' not in response
+    assert review_with_image.image.url not in response
+
+
+@pytest.mark.django_db
+def test_generate_thumbnails_command(review_with_image):
+    out = StringIO()
+    call_command('generate_thumbnails', stdout=out)
+    assert 'Made the variants of 1 images' in out.getvalue()
+    review_with_image.refresh_from_db()
+    assert review_with_image.thumbnails['small']['height'] == 480
+
+    out = StringIO()
+    call_command('generate_thumbnails', stdout=out)
+    assert 'Made the variants of 0 images' in out.getvalue()
@@ -1,5 +1,9 @@
 import pytest
 from homepage.models import User, Review, UserLikes, Course
+from django.db import connection, IntegrityError, OperationalError
+from homepage.database import is_locked_error, retry_on_locked
+from threading import Thread
+import time
 
 
 @pytest.fixture
@@ -65,3 +69,72 @@ def test_get_reviews_liked_by_user_for_course():
 def test_get_users_who_liked_review():
     users = UserLikes.get_users_who_liked_review(Review.objects.get(pk=3))
     assert (len(users) == 1) and users[0].id == 2
+
+
+@pytest.mark.django_db
+def test_duplicate_user_like_rejected():
+    with pytest.raises(IntegrityError):
+        UserLikes(user_id=User.objects.get(pk=1), review_id=Review.objects.get(pk=1)).save()
+
+
+@pytest.mark.django_db
+def test_toggle_like_twice_restores_state():
+    user = User.objects.get(pk=2)
+    review = Review.objects.get(pk=5)
+    likes_num_before = review.likes_num
+    UserLikes.toggle_like(user, review)
+    UserLikes.toggle_like(user, review)
+
+    assert not UserLikes.objects.filter(user_id=user, review_id=review).exists()
+    assert review.likes_num == likes_num_before
+    assert Review.objects.get(pk=5).likes_num == likes_num_before
+
+
+# --------Concurrent toggling stress test-------- #
+STRESS_USERS = 4
+THREADS_PER_USER = 3  # several threads per user simulate double clicks
+TOGGLES_PER_THREAD = 20
+
+
+TOGGLE_ATTEMPTS = 100  # a few are needed under contention, a toggle still locked after these is stuck
+
+
+# the test database doesn't wait for locks, so a toggle that hits a locked table is retried as the views retry it
+# (retry_on_locked), and then as a whole a bounded number of times, and any other error fails the toggle at once
+def toggle_like_until_done(user_id, review_id):
+    for attempt in range(1, TOGGLE_ATTEMPTS + 1):
+        try:
+            retry_on_locked(UserLikes.toggle_like)(User.objects.get(pk=user_id), Review.objects.get(pk=review_id))
+            return attempt
+        except OperationalError as error:
+            if not is_locked_error(error) or attempt == TOGGLE_ATTEMPTS:
+                raise
+            time.sleep(0.001)
+
+
+def toggle_like_many_times(user_id, review_id, errors):
+    try:
+        for _ in range(TOGGLES_PER_THREAD):
+            toggle_like_until_done(user_id, review_id)
+    except Exception as error:
+        errors.append(error)
+    finally:
+        connection.close()
+
+
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+def test_concurrent_toggle_like_keeps_counts():
+    review = Review.objects.get(pk=5)
+    users = [User.objects.create(username=f'stressUser{ind}') for ind in range(STRESS_USERS)]
+    errors = []
+    threads = [Thread(target=toggle_like_many_times, args=(user.id, review.id, errors))
+               for user in users for _ in range(THREADS_PER_USER)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stress_likes = UserLikes.objects.filter(review_id=review, user_id__in=users)
+    assert not errors
+    assert stress_likes.count() == len(set(stress_likes.values_list('user_id', flat=True)))
+    assert Review.objects.get(pk=review.id).likes_num == review.likes_num + stress_likes.count()
@@ -0,0 +1,120 @@
+import pytest
+from homepage.models import Course, Prerequisites, Review, AppUser, User, UserLikes, FollowedUserCourses
+from homepage import caching
+from pytest_django.asserts import assertContains, assertNotContains
+
+
+@pytest.fixture
+def sign_in(client):
+    client.post('/users/sign_in/', data={'username': 'testUser1', 'password': 'password123'})
+
+
+# --------Versions testing-------- #
+def test_versions_are_stable_until_bumped():
+    versions = caching.get_versions(['catalog', 'reviews'])
+    assert caching.get_versions(['catalog', 'reviews']) == versions
+
+    caching.bump_versions(['reviews'])
+    bumped = caching.get_versions(['catalog', 'reviews'])
+    assert bumped != versions
+    assert bumped.split('.')[0] == versions.split('.')[0]
+
+
+def test_get_or_compute_caches_until_invalidated():
+    computed = []
+
+    def compute():
+        computed.append(True)
+        return len(computed)
+
+    assert caching.get_or_compute('test', ['catalog'], [1], compute) == 1
+    assert caching.get_or_compute('test', ['catalog'], [1], compute) == 1
+    assert caching.get_or_compute('test', ['catalog'], [2], compute) == 2
+
+    caching.bump_versions(['catalog'])
+    assert caching.get_or_compute('test', ['catalog'], [1], compute) == 3
+
+
+# --------Cached views testing-------- #
+@pytest.mark.parametrize("url", ['/', '/courses/', '/courses/?filter_by=has_preqs&sort_by=name', '/course/10111/'])
+@pytest.mark.django_db
+def test_cached_views_skip_shared_queries(client, url, django_assert_num_queries):
+    client.get(url)
+    with django_assert_num_queries(0):
+        response = client.get(url)
+
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_courses_cache_keyed_by_filters(client):
+    client.get('/courses/', data={'filter_by': 'mand', 'sort_by': 'id'})
+    response = client.get('/courses/', data={'filter_by': 'elect', 'sort_by': 'id'})
+
+    assertContains(response, 'Grammatica in Arithmancy')
+    assertNotContains(response, 'UnFogging the Future')
+
+
+@pytest.mark.django_db
+def test_course_save_invalidates_courses(client):
+    client.get('/courses/')
+    Course(1, 'Linear Algebra 1', True, 4).save()
+
+    assertContains(client.get('/courses/'), 'Linear Algebra 1')
+
+
+@pytest.mark.django_db
+def test_prerequisites_save_invalidates_courses_and_course(client):
+    query = {'filter_by': 'has_preqs', 'sort_by': 'id'}
+    client.get('/courses/', data=query)
+    client.get('/course/10340/')
+    Prerequisites(course_id=Course.objects.get(pk=10340), req_course_id=Course.objects.get(pk=10341),
+                  req_code=Prerequisites.Req_Code.BEFORE).save()
+
+    assertContains(client.get('/courses/', data=query), 'No Return - through the Lense')
+    assertContains(client.get('/course/10340/'), 'Open Source 101')
+
+
+@pytest.mark.django_db
+def test_review_save_invalidates_landing_and_course(client):
+    client.get('/')
+    client.get('/course/10341/')
+    Review(course=Course.objects.get(pk=10341), user=AppUser.objects.get(pk=1), rate=5,
+           content='A brand new review', course_load=2).save()
+
+    assertContains(client.get('/'), 'A brand new review')
+    assertContains(client.get('/course/10341/'), 'A brand new review')
+
+
+@pytest.mark.django_db
+def test_like_invalidates_only_its_course(client, django_assert_max_num_queries):
+    client.get('/course/10111/')
+    client.get('/course/10221/')
+    UserLikes.toggle_like(User.objects.get(pk=2), Review.objects.get(pk=1))
+
+    response = client.get('/course/10111/')
+    liked_review = [review for review in response.context['reviews'] if review.id == 1][0]
+    assert liked_review.likes_num == Review.objects.get(pk=1).likes_num
+    with django_assert_max_num_queries(0):
+        client.get('/course/10221/')
+
+
+@pytest.mark.django_db
+def test_course_per_user_state_not_shared(client):
+    client.get('/course/10221/')  # cached by an anonymous user
+    client.post('/users/sign_in/', data={'username': 'testUser2', 'password': 'Password456'})
+    response = client.get('/course/10221/')
+
+    user = User.objects.get(username='testUser2')
+    liked_ids = {review.id for review in UserLikes.get_liked_reviews_by_user(user)}
+    assert liked_ids
+    assert all(review.is_liked == (review.id in liked_ids) for review in response.context['reviews'])
+    course = Course.objects.get(pk=10221)
+    assert response.context['is_following'] == FollowedUserCourses.is_following_course(user, course)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("sign_in")
+def test_invalid_course_not_cached(client):
+    assert client.get('/course/11111/').status_code == 302
+    assert client.get('/course/11111/').status_code == 302
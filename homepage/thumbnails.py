@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from os import path
+from threading import Lock
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+
+from homepage import caching
+from homepage.models import Review
+
+
+logger = logging.getLogger('homepage.thumbnails')
+
+# the variants made of every review image, by the longest side they are fitted into
+# 'small' is shown in the review feeds, 'large' is linked from them instead of the original upload
+THUMBNAIL_VARIANTS = getattr(settings, 'THUMBNAIL_VARIANTS', {'small': 480, 'large': 1600})
+THUMBNAIL_WORKERS = getattr(settings, 'THUMBNAIL_WORKERS', 2)  # threads resizing images, 0 resizes in the request
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+VARIANTS_DIR = 'images/variants'
+
+
+# --- returns the (width, height) of the upright image and the encoded variants of it, by variant name,
+# as {'width', 'height', 'jpeg': <bytes>, 'webp': <bytes>}
+# the variants are saved without the EXIF data of the upload (camera, location), after applying its orientation
+def render_variants(image_file):
+    with Image.open(image_file) as image:
+        # a JPEG is decoded straight at a reduced scale when the largest variant is much smaller than the upload
+        largest = max(THUMBNAIL_VARIANTS.values())
+        image.draft('RGB', (largest, largest))
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        variants = {}
+        for name, size in sorted(THUMBNAIL_VARIANTS.items(), key=lambda variant: -variant[1]):
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            jpeg = BytesIO()
+            variant.save(jpeg, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True, icc_profile=icc_profile)
+            webp = BytesIO()
+            variant.save(webp, 'WEBP', quality=WEBP_QUALITY, method=4, icc_profile=icc_profile)
+            variants[name] = {'width': variant.width, 'height': variant.height,
+                              'jpeg': jpeg.getvalue(), 'webp': webp.getvalue()}
+        return image.size, variants
+
+
+# --- makes and records the variants of the image of a review, removing the variants of a previous image
+# the variants are recorded only if the review still has the same image, so a replaced image is never overwritten
+# by the variants of the one it replaced; an unreadable image is logged and left without variants
+def process_review_image(review_id):
+    review = Review.objects.filter(pk=review_id).first()
+    if review is None or not review.image:
+        return None
+    source = review.image.name
+    storage = review.image.storage
+    try:
+        with storage.open(source, 'rb') as image_file:
+            (width, height), variants = render_variants(image_file)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning('Cannot make the variants of %s (review %s): %s', source, review_id, error)
+        return None
+
+    stem = path.splitext(path.basename(source))[0]
+    recorded = {}
+    for name, variant in variants.items():
+        recorded[name] = {'width': variant['width'], 'height': variant['height']}
+        for image_format in ('jpeg', 'webp'):
+            extension = 'jpg' if image_format == 'jpeg' else image_format
+            recorded[name][image_format] = storage.save(f'{VARIANTS_DIR}/{stem}_{name}.{extension}',
+                                                        ContentFile(variant[image_format]))
+    image_variants = {'source': source, 'width': width, 'height': height, 'variants': recorded}
+
+    updated = Review.objects.filter(pk=review_id, image=source).update(image_variants=image_variants)
+    stale = image_variants if not updated else review.image_variants
+    for variant in stale.get('variants', {}).values():
+        storage.delete(variant['jpeg'])
+        storage.delete(variant['webp'])
+    if updated:
+        # the variants were written by an update, which sends no signal to the view cache
+        caching.bump_versions(['reviews', f'course:{review.course_id}'])
+    return image_variants if updated else None
+
+
+# the bounded pool resizing the uploaded images in the background, created on its first use
+class ThumbnailPool:
+
+    def __init__(self, workers=THUMBNAIL_WORKERS):
+        self.workers = workers
+        self.lock = Lock()
+        self.executor = None
+
+    def submit(self, review_id):
+        if self.workers == 0:
+            process_review_image(review_id)
+            return
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='thumbnails')
+        self.executor.submit(self.run, review_id)
+
+    # a worker thread has its own database connection, closed when it is no longer usable
+    @staticmethod
+    def run(review_id):
+        close_old_connections()
+        try:
+            process_review_image(review_id)
+        except Exception:
+            logger.exception('Making the variants of the image of review %s failed', review_id)
+        finally:
+            close_old_connections()
+
+
+thumbnail_pool = ThumbnailPool()
+
+
+# the variants are made once the transaction saving a new image commits, so the worker reads the saved review
+# rows loaded as they are (fixtures) are left to the generate_thumbnails command
+@receiver(post_save, sender=Review)
+def schedule_review_image(sender, instance, raw=False, **kwargs):
+    if not raw and instance.image and instance.image_variants.get('source') != instance.image.name:
+        review_id = instance.pk
+        transaction.on_commit(lambda: thumbnail_pool.submit(review_id))
@@ -1,51 +1,117 @@
 from django.shortcuts import render, redirect
-from homepage.models import Course, Review, AppUser, UserLikes, User, FollowedUserCourses, Prerequisites
+from homepage.models import Course, Review, AppUser, UserLikes, User, FollowedUserCourses, Notification
 from homepage.forms import FilterAndSortForm, ReviewForm, SignUpForm
-from django.contrib.auth import login, logout, authenticate
+from homepage.search import course_index, SEARCH_RESULTS_LIMIT
+from homepage.prerequisites import prerequisite_graph
+from homepage.eligibility import eligibility_index
+from homepage.instrumentation import request_stats
+from homepage.exports import EXPORTS, EXPORT_FORMATS, export_lines, parse_since
+from homepage import caching
+from homepage.tasks import enqueue, enqueue_course_page_warming
+from homepage.database import retry_on_locked
+from homepage.notifications import mark_all_read
+from django.contrib.auth import login, logout
 from django.contrib import messages
 from django.contrib.auth.forms import AuthenticationForm
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, HttpResponseNotFound, HttpResponseBadRequest, JsonResponse, \
+    StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
 
 
 def app_layout(request):
     return render(request, 'homepage/app_layout.html')
 
 
+# the previews are rendered into a cached fragment, so the feed is only queried on a cache miss
 def landing(request):
-    last_reviews = Review.landing_page_feed()
-    return render(request, 'homepage/landing/landing.html', {'reviews': last_reviews})
+    return render(request, 'homepage/landing/landing.html', {
+        'reviews': Review.landing_page_feed(),
+        'cache_version': caching.get_shared_versions(caching.LANDING_SCOPES),
+        'cache_timeout': caching.VIEW_CACHE_TIMEOUT
+    })
 
 
+# --- the ids of the courses followed by 'user', for the follow toggles of the courses table, or None if signed out
+# the table is a fragment shared by all users, so the toggles are set from these ids in the page (follow_toggles.js),
+# and all the followed ids are fetched in a single query, without knowing which courses a cached table shows
+def get_followed_course_ids(user):
+    if not user.is_authenticated:
+        return None
+    return sorted(FollowedUserCourses.get_followed_course_ids(user))
+
+
+# the courses table is rendered into a cached fragment keyed by the filters and sorting,
+# so the courses queryset is only evaluated on a cache miss
 def courses(request):
     all_courses = Course.get_courses()
     filters_active = []
     sort_active = ''
+    cache_parts = 'all'
     if request.method == "GET":
         form = FilterAndSortForm(request.GET)
         if form.is_valid():
             filters = form.cleaned_data.get('filter_by')
             sort_val = form.cleaned_data.get('sort_by')
-            sort_result = Course.get_sorted_courses(all_courses, sort_val)
-            filter_result = Course.get_filtered_courses(sort_result['result'], filters)
-            all_courses = filter_result['result']
-            filters_active = filter_result['active']
-            sort_active = sort_result['active']
+            result = Course.get_filtered_and_sorted_courses(filters, sort_val)
+            all_courses = result['result']
+            filters_active = result['filters']
+            sort_active = result['sort']
+            cache_parts = f"{','.join(filters)}:{sort_val}"
     else:
         form = FilterAndSortForm()
 
     context = {'all_courses': all_courses, 'filters': filters_active, 'sort': sort_active}
     context['form'] = form
+    context['followed_course_ids'] = get_followed_course_ids(request.user)
+    context['cache_version'] = caching.get_shared_versions(caching.COURSES_SCOPES)
+    context['cache_parts'] = cache_parts
+    context['cache_timeout'] = caching.VIEW_CACHE_TIMEOUT
     return render(request, 'homepage/courses/courses.html', context)
 
 
 def reviews(request):
-    reviews = Review.main_feed()
-    liked_reviews = []
-    if not request.user.is_anonymous:
-        liked_reviews = UserLikes.get_liked_reviews_by_user(request.user)
-    return render(request, 'homepage/reviews/reviews.html', {'reviews': reviews, 'liked_reviews': liked_reviews})
+    page = Review.get_feed_page(Review.main_feed(), request.GET.get('cursor'))
+    return render(request, 'homepage/reviews/reviews.html', {
+        'reviews': Review.load_feed(page['reviews'], request.user),
+        'next_cursor': page['next_cursor']
+    })
+
+
+# --- returns the next page of review cards, to be appended by the 'load more' button
+# the feed is the main feed, or the feed of a single course if 'course' is given
+def more_reviews(request):
+    course_id = request.GET.get('course')
+    course = None
+    if course_id:
+        try:
+            course = Course.objects.get(pk=course_id)
+        except (ObjectDoesNotExist, ValueError):
+            return HttpResponseNotFound()
+    feed = Review.course_feed(course) if course else Review.main_feed()
+    page = Review.get_feed_page(feed, request.GET.get('cursor'))
+    return render(request, 'homepage/reviews/reviews_page.html', {
+        'reviews': Review.load_feed(page['reviews'], request.user),
+        'next_cursor': page['next_cursor'],
+        'course': course
+    })
+
+
+# --- saves the review of a valid review form and adds it to the figures of its course, in a single transaction,
+# which also queues the work that can wait: the warming of the course page (the notifications of the followers are
+# queued as the review is saved)
+@retry_on_locked
+def post_review(form, course):
+    with transaction.atomic():
+        form.instance.pk = None  # set by an attempt which was rolled back
+        review = form.save()
+        course.update_course_per_review(review.rate, review.course_load, review.content)
+        enqueue_course_page_warming(course.course_id)
+    return review
 
 
 @login_required(login_url='/users/sign_in/')
@@ -62,36 +128,68 @@ def add_review(request, course_id):
     if request.method == "POST":
         form = ReviewForm(request.POST, user=request.user.id, course=course_id)
         if form.is_valid():
-            review = form.save()
-            course = Course.objects.get(pk=review.course.course_id)
-            course.update_course_per_review(review.rate, review.course_load, review.content)
+            post_review(form, course)
             return redirect(f'/course/{course_id}/')
     else:
         form = ReviewForm(user=request.user.id, course=course_id)
     return render(request, 'homepage/add_review.html', {'form': form, 'course_name': course.name})
 
 
+# --- returns the direct prerequisites, the prerequisite chain and the courses unlocked by the course 'id'
+# they come from the prerequisite graph, so all the related courses are fetched in a single query
+def get_course_prerequisites(id):
+    preqs = prerequisite_graph.direct_prerequisites(id)
+    chain = prerequisite_graph.sort_topologically(prerequisite_graph.prerequisite_chain(id))
+    unlocks = prerequisite_graph.unlocks(id)
+    related = Course.objects.in_bulk({req_course_id for req_course_id, req_code in preqs} | set(chain) | unlocks)
+    return {
+        'preq': [{'req_course_id': related[req_course_id], 'req_code': req_code}
+                 for req_course_id, req_code in preqs],
+        'preq_chain': [related[course_id] for course_id in chain],
+        'unlocks': sorted((related[course_id] for course_id in unlocks), key=lambda course: course.name)
+    }
+
+
+# --- the part of the course page shared by all users: the course, a page of its reviews and its prerequisites
+def compute_course_page(id, cursor=None):
+    course = Course.objects.get(pk=id)
+    return {
+        'course': course,
+        'page': Review.get_feed_page(Review.course_feed(course), cursor),
+        'reviews_count': Review.objects.filter(course=course).count(),
+        **get_course_prerequisites(id)
+    }
+
+
+# the course, its prerequisites and the page of reviews are shared by all users and cached per cursor,
+# the liked reviews and the follow state are per-user and computed on every request
 def course(request, id):
+    cursor = request.GET.get('cursor')
+    if Review.decode_cursor(cursor) is None:
+        cursor = None
+
     try:
-        course = Course.objects.get(pk=id)
-        reviews = Review.objects.filter(course=id).order_by('-likes_num')
-        preq = Prerequisites.get_prerequisites_for_course(course)
-        liked_reviews = []
-        is_following = False
-        if not request.user.is_anonymous:
-            liked_reviews = UserLikes.get_liked_reviews_by_user_for_course(request.user, course)
-            is_following = FollowedUserCourses.is_following_course(request.user, course)
-        return render(request, 'homepage/courses/course.html', {
-            'id': id,
-            'course': course,
-            'reviews': reviews,
-            'liked_reviews': liked_reviews,
-            'is_following': is_following,
-            'preq': preq
-        })
+        course_page = caching.get_or_compute('course', caching.course_scopes(id), [id, cursor],
+                                             lambda: compute_course_page(id, cursor))
     except ObjectDoesNotExist:
         return redirect('courses')
 
+    course = course_page['course']
+    is_following = False
+    if not request.user.is_anonymous:
+        is_following = FollowedUserCourses.is_following_course(request.user, course)
+    return render(request, 'homepage/courses/course.html', {
+        'id': id,
+        'course': course,
+        'reviews': Review.load_feed(course_page['page']['reviews'], request.user),
+        'next_cursor': course_page['page']['next_cursor'],
+        'reviews_count': course_page['reviews_count'],
+        'is_following': is_following,
+        'preq': course_page['preq'],
+        'preq_chain': course_page['preq_chain'],
+        'unlocks': course_page['unlocks']
+    })
+
 
 @login_required(login_url='/users/sign_in/')
 def add_review_search(request):
@@ -99,10 +197,35 @@ def add_review_search(request):
         course_name = request.GET.get('course')
         if not course_name:
             course_name = ''
-        courses = Course.get_courses_ordered_by_name(course_name)
+        if course_name.strip():
+            courses = course_index.search_courses(course_name)
+        else:
+            courses = Course.get_courses_ordered_by_name('')[:SEARCH_RESULTS_LIMIT]
         return render(request, 'homepage/add_review_search.html', {'course_name': course_name, 'courses': courses})
 
 
+# --- returns the best matches of the 'q' parameter as JSON, for suggestions while typing a course name
+def courses_autocomplete(request):
+    query = request.GET.get('q', '')
+    results = [{'course_id': course_id, 'name': name, 'url': reverse('add_review', args=[course_id])}
+               for course_id, name in course_index.search(query)]
+    return JsonResponse({'results': results})
+
+
+# --- returns the courses that can be taken after the 'completed' courses as JSON
+# without 'completed', the courses the signed in user reviewed count as the completed ones
+def eligible_courses(request):
+    try:
+        completed = [int(course_id) for course_id in request.GET.getlist('completed')]
+    except ValueError:
+        return HttpResponseBadRequest()
+    if not completed and not request.user.is_anonymous:
+        completed = list(Review.objects.filter(user_id=request.user.id).values_list('course_id', flat=True))
+    results = [{'course_id': course_id, 'name': name, 'url': reverse('course', args=[course_id])}
+               for course_id, name in eligibility_index.eligible_courses(completed)]
+    return JsonResponse({'completed': sorted(completed), 'results': results})
+
+
 def sign_up(request):
     if request.method == "POST":
         form = SignUpForm(request.POST)
@@ -122,26 +245,19 @@ def sign_up(request):
     return render(request=request, template_name="homepage/users/sign_up.html", context={"sign_up_form": form})
 
 
+# the form authenticates the user while it is validated, so the password is hashed once per sign in
 def sign_in(request):
-    sign_in_successful = False
-
     if request.method == "POST":
         form = AuthenticationForm(request, data=request.POST)
 
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
+            user = form.get_user()
+            login(request, user)
+            messages.info(request, f'You are now logged in as {user.username}.')
+            return redirect('landing')
 
-            if user:
-                login(request, user)
-                sign_in_successful = True
-                messages.info(request, f'You are now logged in as {username}.')
-                return redirect('landing')
-
-        if not sign_in_successful:
-            messages.error(request, 'Invalid username or password.')
-            return redirect('sign_in')
+        messages.error(request, 'Invalid username or password.')
+        return redirect('sign_in')
 
     form = AuthenticationForm()
     return render(request=request, template_name='homepage/users/sign_in.html', context={'sign_in_form': form})
@@ -153,18 +269,42 @@ def sign_out(request):
     return redirect('landing')
 
 
+# --- toggles the like of 'user' on 'review', and queues the warming of the page of its course in the same transaction
+@retry_on_locked
+def toggle_review_like(user, review):
+    with transaction.atomic():
+        UserLikes.toggle_like(user, review)
+        enqueue_course_page_warming(review.course_id)
+
+
 def like_review(request, user_id, review_id):
     if request.META.get('HTTP_REFERER') is None:
         return redirect('landing')
     try:
         user = User.objects.get(pk=user_id)
         review = Review.objects.get(pk=review_id)
-        UserLikes.toggle_like(user, review)
+        toggle_review_like(user, review)
         return HttpResponseRedirect(request.META.get('HTTP_REFERER'))  # stay in referring page
     except ObjectDoesNotExist:
         return redirect('landing')
 
 
+# --- follows the course, a single insert with nothing to queue
+@retry_on_locked
+def follow_course(user, course):
+    FollowedUserCourses.follow_course(user, course)
+
+
+# --- unfollows the course, and queues taking its unread notifications off the badge of the user in the same
+# transaction
+@retry_on_locked
+def unfollow_course(user, course):
+    with transaction.atomic():
+        for follow_id in FollowedUserCourses.unfollow_course(user, course):
+            enqueue('forget_course_notifications', key=f'forget_course_notifications:{follow_id}', user_id=user.pk,
+                    course_id=course.course_id)
+
+
 @login_required(login_url='/users/sign_in/')
 def follow_course_action(request, course_id):
     try:
@@ -172,14 +312,21 @@ def follow_course_action(request, course_id):
     except ObjectDoesNotExist:
         return redirect('/courses/')
 
-    is_following_course = FollowedUserCourses.is_following_course(request.user, course)
-    if (is_following_course):
-        FollowedUserCourses.unfollow_course(request.user, course)
+    # the toggles of the courses table name the action, so a repeated click doesn't undo it
+    action = request.GET.get('action')
+    if action not in ('follow', 'unfollow'):
+        action = 'unfollow' if FollowedUserCourses.is_following_course(request.user, course) else 'follow'
+    if action == 'unfollow':
+        unfollow_course(request.user, course)
         messages.success(request, 'Successfully unfollowed this course')
     else:
-        FollowedUserCourses.follow_course(request.user, course)
+        follow_course(request.user, course)
         messages.success(request, 'Successfully followed this course')
 
+    next_url = request.GET.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()},
+                                                    require_https=request.is_secure()):
+        return redirect(next_url)
     return redirect(f'/course/{course_id}/')
 
 
@@ -188,9 +335,48 @@ def my_profile(request):
     try:
         followed_user_courses = FollowedUserCourses.get_courses_followed_by_app_user(request.user.appuser)
         last_user_reviews = Review.profile_page_feed(request.user)
+        if last_user_reviews is not None:
+            last_user_reviews = Review.load_feed(last_user_reviews)
         return render(request, 'homepage/users/my_profile.html', {'user_reviews': last_user_reviews,
                       'user_followed_courses': followed_user_courses})
 
     except AppUser.DoesNotExist:
         return render(request, 'homepage/users/my_profile.html', {'user_reviews': None,
                       'user_followed_courses': None})
+
+
+# --- a page of the notifications of the user, newest first; opening the inbox marks all of them as read,
+# the page still shows which of them were unread
+@login_required(login_url='/users/sign_in/')
+def notifications(request):
+    page = Notification.get_inbox_page(request.user.id, request.GET.get('cursor'))
+    mark_all_read(request.user.id)
+    return render(request, 'homepage/users/notifications.html', {
+        'notifications': page['reviews'],
+        'next_cursor': page['next_cursor']
+    })
+
+
+# --- the rolling per-view query figures recorded by the SQL instrumentation middleware
+@staff_member_required(login_url='/users/sign_in/')
+def sql_stats(request):
+    return render(request, 'homepage/staff/sql_stats.html', {'stats': request_stats.summary()})
+
+
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+# --- streams an export of the reviews, likes or course aggregates, of the rows from 'since' if given
+@staff_member_required(login_url='/users/sign_in/')
+def export(request, name, export_format):
+    if name not in EXPORTS or export_format not in EXPORT_FORMATS:
+        return HttpResponseNotFound()
+    since = None
+    if request.GET.get('since'):
+        since = parse_since(request.GET['since'])
+        if since is None:
+            return HttpResponseBadRequest('Invalid since, use an ISO date or time')
+    response = StreamingHttpResponse(export_lines(name, export_format, since),
+                                     content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
+    return response